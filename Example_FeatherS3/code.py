@@ -59,6 +59,7 @@ import neopixel
 import feathers3
 import rtc
 import mcp7940
+from datemath import from_epoch
 import digitalio
 # Global flags
 
@@ -1399,21 +1400,15 @@ def setup(state):
 
         if not my_debug:
             print(TAG+f"Checking for {s_mcp} power failure.")
-        s_pf_yn = "Yes" if mcp.has_power_failed() else "No"
+        # One I2C read for PWRFAIL and both time-stamps; the stamps are read before PWRFAIL is cleared
+        pwr = mcp.power_events(clear=True)
+        s_pf_yn = "Yes" if pwr is not None and pwr.pwrfail else "No"
         if my_debug:
             print(TAG+f"{s_pf1}? {s_pf_yn}") # Check if the power failed bit is set
         if s_pf_yn == "Yes":
-            mcp.clr_pwr_fail_bit()
-            if not mcp.has_power_failed():
-                if my_debug:
-                    print(TAG+"{s_pf1} bit cleared")
-
-            pwrud_dt = mcp.pwr_updn_dt(False)
-            if not my_debug:
-                print(TAG+f"{s_mcp} power down timestamp: {pwrud_dt}")
-            pwrud_dt = mcp.pwr_updn_dt(True)
-            if not my_debug:
-                print(TAG+f"{s_mcp} power up timestamp: {pwrud_dt}")
+            for s_ud, secs in (("down", pwr.down), ("up", pwr.up)):
+                if not my_debug:
+                    print(TAG+f"{s_mcp} power {s_ud} timestamp: {None if secs is None else from_epoch(secs)}")
     
     if my_debug:
         print(TAG+f"Checking if {s_en1} has been enabled.")
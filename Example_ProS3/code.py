@@ -52,6 +52,9 @@ import rtc
 import displayio
 import rtc
 import mcp7940
+from mcp7940_events import AlarmWatcher, LevelEdges
+from datemath import from_epoch
+from mcp7940_sram import SRAMStore, SRAMJournal, EV_BOOT, EV_ALARM1, EV_NTP_OK, EV_PWRFAIL
 import digitalio
 import json
 from dst import dst
@@ -113,7 +116,7 @@ class State:
         self.loop_nr = -1
         self.max_loop_nr = 30
         self.tag_le_max = 26  # see tag_adj()
-        self.use_clr_SRAM = True
+        self.use_clr_SRAM = False  # write_to_SRAM() does not need a cleared SRAM. Clearing also erases sram_store
         self.set_SYS_RTC = True
         self.NTP_dt_is_set = False
         self.SYS_RTC_is_set = False
@@ -296,7 +299,14 @@ if use_sh1107:
     ROTATION = None
     BORDER = None
 
-mcp = mcp7940.MCP7940(i2c)
+mcp = mcp7940.MCP7940(i2c, use_shadow=True)
+# The alarm watcher samples rtc_mfp_int; the MCP7940 is only read after a rising edge
+# (ALMPOL is set, so MFP goes high when alarm1 fires). See lib/mcp7940_events.py
+alarm_watcher = AlarmWatcher(mcp, LevelEdges(rtc_mfp_int))
+# Battery-backed values in SRAM bytes 0x10.. (write_to_SRAM() uses the bytes 0x00-0x09)
+sram_store = SRAMStore(mcp, (("boots", "var"), ("last_sync", "u32")), offset=0x10)  # 0x10-0x1B
+# Event journal in SRAM bytes 0x1C-0x3F (6 records)
+sram_journal = SRAMJournal(mcp, offset=0x1C)
 
 # Adjust the values of the state.dt_dict to the actual date and time
 # Don't forget to enable the state.set_EXT_RTC flag (above)
@@ -969,11 +979,6 @@ def upd_SRAM(state):
     msg = ["Write to SRAM:", dt1, dt2, dt3, dt6, dt7]
     pr_msg(state, msg)
 
-    mcp.clr_SRAM()  # Empty the total SRAM
-
-    if my_debug:
-        mcp.show_SRAM() # Show the values in the cleared SRAM space
-
     if my_debug:
         print(TAG+f"type({s_tm}): {type(tm)},")
         print(TAG+f"{s_tm2}ernal_dt: {tm}")
@@ -1207,8 +1212,7 @@ def set_alarm(state, alarm_nr = 1, mins_fm_now=10):
     alarm1en = mcp.alarm_is_enabled(1)
     alarm2en = mcp.alarm_is_enabled(2)
 
-    t1 = time.time()  # get seconds since epoch
-    dt = time.localtime(t1+(mins_fm_now*60)) # convert mins_fm_now to seconds
+    dt = from_epoch(mcp.epoch + mins_fm_now*60)  # MCP7940 time + mins_fm_now, weekday computed from the date
 
     month   = dt[state.tm_mon]
     date    = dt[state.tm_mday]
@@ -1227,36 +1231,38 @@ def set_alarm(state, alarm_nr = 1, mins_fm_now=10):
                     # ---------------------------------------------------------------
         # SET ALARM1
         # ---------------------------------------------------------------
-        mcp.alarm1 = t  # Set alarm1
+        # The edits below are sent to the MCP7940 in one burst write (+ one verification read)
+        with mcp.transaction() as txn:
+            mcp.alarm1 = t  # Set alarm1
+            mcp._clr_ALMxIF_bit(alarm_nr)     # Clear the interrupt of alarm1
+            mcp._set_ALMxMSK_bits(alarm_nr,1) # Set the alarm1 mask bits for a minutes match
+            # IMPORTANT NOTE:
+            # ===============
+            # I experienced that if mcp.alarm1 (or mcp.alarm2) is called earlier, the setting of the ALMPOL bit is reset,
+            # that is why we set the ALMPOL bit again (below)
+            # ===============
+            mcp._set_ALMPOL_bit(alarm_nr) # Set ALMPOL bit of Alarm1 (so the MFP follows the ALM1IF)
         # ---------------------------------------------------------------
-        t_ck = mcp.alarm1[:6]  # check result
+        # The verification read of the transaction checked the result
+        t_ck = t if txn.result != -1 else mcp.alarm1[:6]
         if my_debug:
             print(TAG+f"check: alarm{alarm_nr} is set for: {t_ck}")
         state.alarm1 = t_ck
         state.alarm1_set = True
-        mcp._clr_ALMxIF_bit(alarm_nr)     # Clear the interrupt of alarm1
-        mcp._set_ALMxMSK_bits(alarm_nr,1) # Set the alarm1 mask bits for a minutes match
-        # IMPORTANT NOTE:
-        # ===============
-        # I experienced that if mcp.alarm1 (or mcp.alarm2) is called earlier, the setting of the ALMPOL bit is reset,
-        # that is why we set the ALMPOL bit again (below)
-        # ===============
-        if not mcp._read_ALM_POL_IF_MSK_bits(1, state.POL):
-            mcp._set_ALMPOL_bit(alarm_nr) # Set ALMPOL bit of Alarm1 (so the MFP follows the ALM1IF)
 
     if alarm2en and alarm_nr == 2:
         if my_debug:
             print(TAG+f"setting alarm2 for: {t[:5]}, {dow}")
-        mcp.alarm2 = t  # Set alarm2
-        t_ck = mcp.alarm2[:6]  # check result
+        with mcp.transaction() as txn:
+            mcp.alarm2 = t  # Set alarm2
+            mcp._clr_ALMxIF_bit(alarm_nr)     # Clear the interrupt of alarm2
+            mcp._set_ALMxMSK_bits(alarm_nr,1) # Set the alarm2 mask bits for a minutes match
+            mcp._set_ALMPOL_bit(alarm_nr) # Set ALMPOL bit (so the MFP follows the ALM2IF)
+        t_ck = t if txn.result != -1 else mcp.alarm2[:6]  # check result
         if my_debug:
             print(TAG+f"check: alarm2 is set for: {t_ck}")
         state.alarm2 = t_ck
         state.alarm2_set = True
-        mcp._clr_ALMxIF_bit(alarm_nr)     # Clear the interrupt of alarm1
-        mcp._set_ALMxMSK_bits(alarm_nr,1) # Set the alarm1 mask bits for a minutes match
-        if not mcp._read_ALM_POL_IF_MSK_bits(alarm_nr, state.POL):
-            mcp._set_ALMPOL_bit(alarm_nr) # Set ALMPOL bit of alarm1 (so the MFP follows the ALM1IF)
 
 def clr_alarm(state, alarm_nr=None):
     TAG = tag_adj(state, "clr_alarm(): ")
@@ -1297,11 +1303,13 @@ def pol_alarm_int(state):
     alm1msk_bits = None
     alm2msk_bits = None
 
-    for _ in range(2):
-        if _ == 0:
-            alarm1en = True if mcp.alarm_is_enabled(1) else False
-        if _ == 1:
-            alarm2en = True if mcp.alarm_is_enabled(2) else False
+    status = mcp.alarm_status()  # All alarm enable, IF and MSK bits in one I2C read
+    if status == -1:
+        return
+    alm1en, _, alm1if, alm1msk = mcp.alarm_fields(status, 1)
+    alm2en, _, alm2if, alm2msk = mcp.alarm_fields(status, 2)
+    alarm1en = True if alm1en else False
+    alarm2en = True if alm2en else False
 
     if alarm1en:
         if my_debug:
@@ -1310,13 +1318,13 @@ def pol_alarm_int(state):
         t_ck = state.alarm1[:6]
         if my_debug:
             print(TAG+f"alarm1 is set for: {t_ck}")
-        state.alarm1_int = True if mcp._read_ALM_POL_IF_MSK_bits(1,state.IF) else False
+        state.alarm1_int = True if alm1if else False
         if state.alarm1_int:
-            alm1if_bit = mcp._read_ALM_POL_IF_MSK_bits(1,state.IF)
+            alm1if_bit = alm1if
             if my_debug:
                 print(TAG+"we have an interrupt from alarm1")
                 print(TAG+"alarm1 IF bit: {:b}".format(alm1if_bit))
-                alm1msk_bits = mcp._read_ALM_POL_IF_MSK_bits(1,state.MSK)
+                alm1msk_bits = alm1msk
                 show_alm_match_type(alm1msk_bits)
             ck_rtc_mfp_int(state)
 
@@ -1327,13 +1335,13 @@ def pol_alarm_int(state):
         t_ck = state.alarm2[:6]
         if my_debug:
             print(TAG+f"alarm2 is set for: {t_ck}")
-        state.alarm2_int = True if mcp._read_ALM_POL_IF_MSK_bits(2,state.IF) else False
+        state.alarm2_int = True if alm2if else False
         if state.alarm2_int:
-            alm2if_bit = mcp._read_ALM_POL_IF_MSK_bits(2,state.IF)
+            alm2if_bit = alm2if
             if my_debug:
                 print(TAG+"we have an interrupt from alarm2")
                 print(TAG+"alarm2 IF bit: {:b}".format(alm2if_bit))
-                alm2msk_bits = mcp._read_ALM_POL_IF_MSK_bits(2,state.MSK)
+                alm2msk_bits = alm2msk
                 show_alm_match_type(alm2msk_bits)
             ck_rtc_mfp_int(state)
 
@@ -1366,9 +1374,12 @@ def show_mfp_output_mode_status(stete):
     s1 = "+--------+--------+--------+--------------------------+"
     s2 = "| SQWEN  | ALM0EN | ALM1EN |          Mode            |"
     aio = "Alarm Interruput output "
-    sqwen =  mcp._read_SQWEN_bit()
-    alm1en = mcp.alarm_is_enabled(1)
-    alm2en = mcp.alarm_is_enabled(2)
+    status = mcp.alarm_status()  # SQWEN, ALM0EN and ALM1EN in one I2C read
+    if status == -1:
+        return
+    sqwen = 1 if status & mcp.ALM_STATUS_SQWEN else 0
+    alm1en = status & mcp.ALM_STATUS_EN
+    alm2en = (status >> 8) & mcp.ALM_STATUS_EN
 
     if not sqwen:
         if not alm1en:
@@ -1410,17 +1421,10 @@ def show_alarm_output_truth_table(state, alarm_nr=None):
     s1 = "+--------+---------+-------+----------------------------------+"
     s2 = "| ALMPOL |  {:6s} |  MFP  |            Match type            |".format(s_ALMxIF)
 
-    alarm_POL = 0
-    alarm_IF = 0
-    alarm_MSK = 0
-    for _ in range(3):
-        itm = mcp._read_ALM_POL_IF_MSK_bits(alarm_nr, _)
-        if _ == 0:
-            alarm_POL = itm # Read alarm1 or alarm2 ALMPOL bit
-        elif _ == 1:
-            alarm_IF = itm # Read alarm1 or alarm2 interrupt flag
-        elif _ == 2:
-            alarm_MSK = itm # Read ALMxMSK bits of alarm1 or alarm2
+    status = mcp.alarm_status()  # ALMPOL, ALMxIF and ALMxMSK bits of both alarms in one I2C read
+    if status == -1:
+        return
+    _, alarm_POL, alarm_IF, alarm_MSK = mcp.alarm_fields(status, alarm_nr)
     if my_debug:
         print(TAG+"ALM{:d}MSK_bits: b\'{:03b}\'".format(alarm_nr, alarm_MSK))
     msk_match = mcp._match_lst_long[alarm_MSK] # get the match long text equivalent
@@ -1456,8 +1460,11 @@ def show_alm_int_status(state):
     s1 = "+-------------+----------+-------+-----+------+--------+--------+---------+---------------------+--------------------+"
     s2 = "|  ALARM  Nr  | ENABLED? | MONTH | DAY | HOUR | MINUTE | {:6s} | WEEKDAY | INTERRUPT OCCURRED? | NOTES:             |".format(s_sec)
 
-    ae1=mcp.alarm_is_enabled(1)
-    ae2=mcp.alarm_is_enabled(2)
+    snap = mcp.snapshot()  # Time, alarm enable and MSK bits in one I2C read
+    if snap is None:
+        return
+    ae1=snap.alarm1_enabled
+    ae2=snap.alarm2_enabled
     is_12hr = mcp._is_12hr
 
     if my_debug:
@@ -1477,7 +1484,7 @@ def show_alm_int_status(state):
             if hh1 > 12:
                 hh1 -= 12
 
-        match1 = mcp._match_lst[mcp._read_ALM_POL_IF_MSK_bits(1, state.MSK)]
+        match1 = mcp._match_lst[snap.alarm1_msk]
         if match1 == "mm" and not state.dt_str_usa:
             ss1 = None
     if ae2:
@@ -1494,11 +1501,11 @@ def show_alm_int_status(state):
             if hh2 > 12:
                 hh2 -= 12
 
-        match2 = mcp._match_lst[mcp._read_ALM_POL_IF_MSK_bits(2, state.MSK)]
+        match2 = mcp._match_lst[snap.alarm2_msk]
         if match2 == "mm" and not state.dt_str_usa:
             ss2 = None
 
-    tm_current = mcp.mcptime # Get current datetime stamp from the External UM MCP7940 RTC shield
+    tm_current = snap.time # Current datetime stamp from the External UM MCP7940 RTC shield
     if not my_debug:
         print(TAG+f"mcp.mcptime: {tm_current}")
 
@@ -1765,6 +1772,13 @@ def setup(state):
     
     read_fm_config(state)
 
+    if sram_store.load() == 0 and not sram_store.valid:
+        sram_journal.clear()  # SRAM not initialized yet
+    sram_store["boots"] += 1  # writes only the changed byte(s) of the boot counter
+    sram_journal.append(EV_BOOT)
+    if not my_debug:
+        print(TAG+f"boot nr: {sram_store['boots']} (counted in the SRAM of the {s_mcp})")
+
     wifi.AuthMode.WPA2   # set only once
     do_connect(state)
 
@@ -1799,6 +1813,8 @@ def setup(state):
     # to set the internal RTC
     ntp = adafruit_ntp.NTP(pool, tz_offset = 0)  # tz_offset e.g.: -4, 0, 1, 12
     mRTC.datetime = ntp.datetime 
+    sram_store["last_sync"] = time.time()
+    sram_journal.append(EV_NTP_OK)
     
     if ntp and my_debug:
         print(TAG+f"ntp object {type(ntp)} created")
@@ -1886,21 +1902,19 @@ def setup(state):
 
         if not my_debug:
             print(TAG+f"Checking for {s_mcp} power failure.")
-        s_pf_yn = "Yes" if mcp.has_power_failed() else "No"
+        # One I2C read for PWRFAIL and both time-stamps; the stamps are read before PWRFAIL is cleared
+        pwr = mcp.power_events(clear=True)
+        s_pf_yn = "Yes" if pwr is not None and pwr.pwrfail else "No"
         if my_debug:
             print(TAG+f"{s_pf1}? {s_pf_yn}") # Check if the power failed bit is set
         if s_pf_yn == "Yes":
-            mcp.clr_pwr_fail_bit()
-            if not mcp.has_power_failed():
-                if my_debug:
-                    print(TAG+"{s_pf1} bit cleared")
-
-            pwrud_dt = mcp.pwr_updn_dt(False)
-            if not my_debug:
-                print(TAG+f"{s_mcp} power down timestamp: {pwrud_dt}")
-            pwrud_dt = mcp.pwr_updn_dt(True)
-            if not my_debug:
-                print(TAG+f"{s_mcp} power up timestamp: {pwrud_dt}")
+            # Date the event by the power-down time-stamp, or by the power-up one if that is all there is
+            secs = pwr.down if pwr.down is not None else pwr.up
+            if secs is not None:
+                sram_journal.append(EV_PWRFAIL, secs)
+            for s_ud, secs in (("down", pwr.down), ("up", pwr.up)):
+                if not my_debug:
+                    print(TAG+f"{s_mcp} power {s_ud} timestamp: {None if secs is None else from_epoch(secs)}")
 
     if my_debug:
         print(TAG+f"Checking if {s_en1} has been enabled.")
@@ -2083,8 +2097,12 @@ def main():
                 if state.loop_nr >= 3:  # Only perform this
                     show_alarm_output_truth_table(state, alarm_nr) # Show alarm output truth table for alarm1
                     show_alm_int_status(state)
-                pol_alarm_int(state)  # Check alarm interrupt
-                if state.alarm1_int:
+                # Check alarm interrupt. Only reads the MCP7940 after a rising edge of the MFP line
+                fired = alarm_watcher.poll()  # -1 on an I2C error
+                if fired > 0 and fired & 1:
+                    sram_journal.append(EV_ALARM1)
+                    state.alarm1_int = True
+                    state.mfp = True
                     if interrupt_handler(state):
                         raise KeyboardInterrupt
                 # pol_alarm_int(state)  # Check alarm interrupt
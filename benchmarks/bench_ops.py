@@ -0,0 +1,294 @@
+#
+# Bus cost of each MCP7940 driver operation (lib/mcp7940.py)
+#
+# For every operation: I2C transactions, bytes written and read, time on the wire,
+# heap allocated and wall time, per call (mean over N calls).
+#
+# On a PC it runs against the simulated MCP7940 (lib/mcp7940_sim.py), at 100 kHz and 400 kHz,
+# with and without the register shadow (use_shadow=True):
+#   $ PYTHONPATH=lib python3 benchmarks/bench_ops.py                   # print the tables
+#   $ PYTHONPATH=lib python3 benchmarks/bench_ops.py --check           # compare with benchmarks/baseline.txt
+#   $ PYTHONPATH=lib python3 benchmarks/bench_ops.py --write-baseline  # after an intended change
+#   $ PYTHONPATH=lib python3 benchmarks/bench_ops.py --freq 400000 --shadow 1
+# The baseline holds only the deterministic columns (transactions, bytes, bus time), so a
+# change of the bus cost of an operation shows up in "git diff benchmarks/baseline.txt".
+#
+# On the board the real bus is wrapped in CountingI2C; bus time is then estimated from the counts:
+#   >>> import board, bench_ops
+#   >>> bench_ops.report(bench_ops.run(bench_ops.CountingI2C(board.STEMMA_I2C())))
+# Note: this writes the time, the alarms and the SRAM of the MCP7940.
+#
+import gc
+import time
+import mcp7940
+from mcp7940_events import AlarmWatcher, LevelEdges
+from mcp7940_clock import CachedClock
+
+N = 10
+BASELINE = "benchmarks/baseline.txt"
+COLUMNS = ("transactions", "bytes_written", "bytes_read", "bus_time_us")
+
+T = (2023, 11, 1, 15, 6, 0, 2)
+T_ALM = (11, 1, 15, 7, 0, 2)
+DT_SRAM = (2023, 11, 1, 15, 6, 0, 2, 0, 0)
+
+try:
+    _ns = time.monotonic_ns
+except AttributeError:
+    def _ns():
+        return int(time.monotonic() * 1_000_000_000)
+
+
+# Wraps a busio.I2C and counts its transactions like SimI2C.stats
+class CountingI2C:
+    def __init__(self, i2c, frequency=100_000):
+        self._i2c = i2c
+        self.frequency = frequency
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"transactions": 0, "bytes_written": 0, "bytes_read": 0, "bus_time_us": 0.0,
+                      "lock_failures": 0}
+
+    def try_lock(self):
+        if self._i2c.try_lock():
+            return True
+        self.stats["lock_failures"] += 1
+        return False
+
+    def unlock(self):
+        self._i2c.unlock()
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        self._i2c.writeto(address, buffer, start=start, end=end)
+        self._account(end - start, 0, 1)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        self._i2c.readfrom_into(address, buffer, start=start, end=end)
+        self._account(0, end - start, 1)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, **kwargs):
+        self._i2c.writeto_then_readfrom(address, buffer_out, buffer_in, **kwargs)
+        self._account(len(buffer_out), len(buffer_in), 2)
+
+    # Same bus time model as SimI2C: 9 clocks per byte, an address byte per (repeated) start
+    def _account(self, n_out, n_in, n_addr):
+        s = self.stats
+        s["transactions"] += 1
+        s["bytes_written"] += n_out
+        s["bytes_read"] += n_in
+        s["bus_time_us"] += (9 * (n_out + n_in + n_addr) + 2 * n_addr) * 1_000_000 / self.frequency
+
+
+# Heap in use: gc.mem_free() on the board, tracemalloc on CPython
+# On CPython the peak is used, which includes the buffers of the simulator.
+def _heap_mark():
+    try:
+        return -gc.mem_free()
+    except AttributeError:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _heap_used(mark):
+    try:
+        return -gc.mem_free() - mark
+    except AttributeError:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] - mark
+
+
+# (name, function, setup) for each operation; setup runs before each call and is not measured
+def operations(mcp):
+    buf = [0] * 7
+    sram_buf = bytearray(16)
+    watcher = AlarmWatcher(mcp, LevelEdges(_Low()))
+    watcher.poll()  # the first poll always reads the MCP7940
+    clock = CachedClock(mcp)
+    clock.sync()
+
+    def set_time():
+        mcp.mcptime = T
+
+    def set_alarm1():
+        mcp.alarm1 = T_ALM
+
+    def set_alarm2():
+        mcp.alarm2 = T_ALM
+
+    def arm_alarm1():
+        with mcp.transaction():
+            mcp.alarm1 = T_ALM
+            mcp._clr_ALMxIF_bit(1)
+            mcp._set_ALMxMSK_bits(1, 1)
+            mcp._set_ALMPOL_bit(1)
+            mcp.alarm_enable(1, True)
+
+    return (
+        ("mcptime get", lambda: mcp.mcptime, None),
+        ("mcptime set", set_time, None),
+        ("read_time_into", lambda: mcp.read_time_into(buf), None),
+        ("adjust_seconds +1", lambda: mcp.adjust_seconds(1), None),
+        ("adjust_seconds +1 unaligned", lambda: mcp.adjust_seconds(1, align=False), None),
+        ("epoch get", lambda: mcp.epoch, None),
+        ("snapshot", mcp.snapshot, None),
+        ("alarm1 get", lambda: mcp.alarm1, None),
+        ("alarm1 set", set_alarm1, None),
+        ("alarm2 get", lambda: mcp.alarm2, None),
+        ("alarm2 set", set_alarm2, None),
+        ("arm alarm1 (transaction)", arm_alarm1, None),
+        ("start", mcp.start, mcp.stop),
+        ("stop", mcp.stop, mcp.start),
+        ("clr_SRAM", mcp.clr_SRAM, None),
+        ("write_to_SRAM", lambda: mcp.write_to_SRAM(DT_SRAM), None),
+        ("read_fm_SRAM", mcp.read_fm_SRAM, None),
+        ("sram[0:16] get", lambda: mcp.sram[0:16], None),
+        ("sram[0:16] set", lambda: mcp.sram.__setitem__(slice(0, 16), sram_buf), None),
+        ("sram_readinto 16", lambda: mcp.sram_readinto(sram_buf), None),
+        ("sram_write 16", lambda: mcp.sram_write(sram_buf), None),
+        ("pwr_updn_dt down", lambda: mcp.pwr_updn_dt(False), None),
+        ("pwr_updn_dt up", lambda: mcp.pwr_updn_dt(True), None),
+        ("power_events", mcp.power_events, None),
+        ("has_power_failed", mcp.has_power_failed, None),
+        ("battery_backup_enable", lambda: mcp.battery_backup_enable(1), None),
+        ("alarm_enable", lambda: mcp.alarm_enable(1, True), None),
+        ("alarm_is_enabled", lambda: mcp.alarm_is_enabled(1), None),
+        ("_set_ALMPOL_bit", lambda: mcp._set_ALMPOL_bit(1), None),
+        ("_clr_ALMxIF_bit", lambda: mcp._clr_ALMxIF_bit(1), None),
+        ("_set_ALMxMSK_bits", lambda: mcp._set_ALMxMSK_bits(1, 1), None),
+        ("_read_ALM_POL_IF_MSK_bits", lambda: mcp._read_ALM_POL_IF_MSK_bits(1, 1), None),
+        ("alarm_status", mcp.alarm_status, None),
+        ("_read_SQWEN_bit", mcp._read_SQWEN_bit, None),
+        ("_clr_SQWEN_bit", mcp._clr_SQWEN_bit, None),
+        ("AlarmWatcher.poll idle", watcher.poll, None),
+        ("CachedClock.now", clock.now, None),
+    )
+
+
+# MFP line that stays inactive, for the idle AlarmWatcher
+class _Low:
+    value = False
+
+
+# Measure every operation N times on i2c (SimI2C or CountingI2C)
+# Returns a list of (name, {column: mean per call})
+def run(i2c, use_shadow=False, n=N):
+    mcp = mcp7940.MCP7940(i2c, use_shadow=use_shadow)
+    if hasattr(i2c, "sleep"):
+        mcp7940._sleep = i2c.sleep  # waits for the oscillator run on the virtual clock
+    if use_shadow:
+        mcp.refresh_shadow()
+    results = []
+    for name, fn, setup in operations(mcp):
+        fn()  # warm up: first call may fill the shadow or allocate interned strings
+        tot = {}
+        for col in COLUMNS + ("alloc_bytes", "wall_us"):
+            tot[col] = 0
+        for _ in range(n):
+            if setup is not None:
+                setup()
+            before = dict(i2c.stats)
+            gc.collect()
+            mark = _heap_mark()
+            t0 = _ns()
+            fn()
+            t1 = _ns()
+            tot["alloc_bytes"] += _heap_used(mark)
+            tot["wall_us"] += (t1 - t0) / 1000
+            for col in COLUMNS:
+                tot[col] += i2c.stats[col] - before[col]
+        for col in tot:
+            tot[col] /= n
+        results.append((name, tot))
+    return results
+
+
+def report(results, title=""):
+    if title:
+        print(title)
+    print("  {:28s} {:>6s} {:>7s} {:>7s} {:>9s} {:>8s} {:>9s}".format(
+        "operation", "txns", "wr B", "rd B", "bus us", "alloc B", "wall us"))
+    for name, r in results:
+        print("  {:28s} {:6.1f} {:7.1f} {:7.1f} {:9.1f} {:8.0f} {:9.1f}".format(
+            name, r["transactions"], r["bytes_written"], r["bytes_read"],
+            r["bus_time_us"], r["alloc_bytes"], r["wall_us"]))
+
+
+# Lines of the baseline file: "<freq> <shadow> <operation>: <transactions> <bytes written> <bytes read> <bus us>"
+def baseline_lines(runs):
+    lines = []
+    for (freq, shadow), results in runs:
+        for name, r in results:
+            lines.append("{:d} {:d} {}: {:.1f} {:.1f} {:.1f} {:.1f}".format(
+                freq, shadow, name, r["transactions"], r["bytes_written"], r["bytes_read"], r["bus_time_us"]))
+    return lines
+
+
+# Print the operations that cost more than in the baseline; returns their number
+def check(lines, path=BASELINE):
+    base = {}
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#") or ":" not in line:
+                continue
+            key, vals = line.rsplit(":", 1)
+            base[key] = [float(v) for v in vals.split()]
+    n = 0
+    for line in lines:
+        key, vals = line.rsplit(":", 1)
+        vals = [float(v) for v in vals.split()]
+        if key not in base:
+            print("new:        " + line)
+        elif any(v > b for v, b in zip(vals, base[key])):
+            print("regression: " + line + "   (baseline:" + (" {:.1f}" * len(base[key])).format(*base[key]) + ")")
+            n += 1
+    return n
+
+
+def main():
+    import argparse
+    import contextlib
+    import io
+    from mcp7940_sim import SimI2C
+    ap = argparse.ArgumentParser(description="I2C cost per MCP7940 driver operation, on the simulated bus")
+    ap.add_argument("--freq", type=int, action="append", help="bus frequency in Hz (default: 100000 and 400000)")
+    ap.add_argument("--shadow", type=int, choices=(0, 1), action="append", help="use_shadow (default: 0 and 1)")
+    ap.add_argument("-n", type=int, default=N, help="calls per operation")
+    ap.add_argument("--check", action="store_true", help="compare with the baseline; exit status 1 on a regression")
+    ap.add_argument("--write-baseline", action="store_true", help="write the baseline file")
+    ap.add_argument("--baseline", default=BASELINE, help="baseline file (default: %(default)s)")
+    args = ap.parse_args()
+
+    runs = []
+    for freq in args.freq or (100_000, 400_000):
+        for shadow in args.shadow or (0, 1):
+            i2c = SimI2C(frequency=freq)
+            i2c.rtc.set_datetime(*T[:6])
+            with contextlib.redirect_stdout(io.StringIO()):  # the mcptime setter prints the time set
+                results = run(i2c, bool(shadow), args.n)
+            if not (args.check or args.write_baseline):
+                report(results, "{:d} kHz, use_shadow={}".format(freq // 1000, bool(shadow)))
+            runs.append(((freq, shadow), results))
+
+    lines = baseline_lines(runs)
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            f.write("# Generated by benchmarks/bench_ops.py --write-baseline\n")
+            f.write("# <freq Hz> <use_shadow> <operation>: <transactions> <bytes written> <bytes read> <bus time us> per call\n")
+            for line in lines:
+                f.write(line + "\n")
+        print("written: " + args.baseline)
+    if args.check:
+        n = check(lines, args.baseline)
+        print("{:d} regression(s)".format(n))
+        if n:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
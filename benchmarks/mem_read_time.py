@@ -0,0 +1,79 @@
+#
+# Measure the heap memory allocated per call of reading the time from the MCP7940
+# with mcp.mcptime (returns a new tuple) and with mcp.read_time_into(buf) (fills buf),
+# and per call of reading the SRAM with mcp.read_fm_SRAM() and with mcp.sram_readinto(buf).
+#
+# On the board: copy lib/mcp7940.py to CIRCUITPY/lib and this file to CIRCUITPY, then in the REPL:
+#   >>> import mem_read_time
+#
+# The delta of gc.mem_free() is measured over N calls with the garbage collector disabled.
+# In steady state read_time_into() and sram_readinto() should report 0 bytes per call.
+#
+# On a PC it runs against the simulated MCP7940 (lib/mcp7940_sim.py):
+#   $ PYTHONPATH=lib python3 benchmarks/mem_read_time.py
+#
+import gc
+import mcp7940
+
+N = 100
+
+try:
+    import board
+    i2c = board.STEMMA_I2C()
+except ImportError:  # CPython: use the simulator
+    from mcp7940_sim import SimI2C
+    i2c = SimI2C()
+    i2c.rtc.set_datetime(2023, 11, 1, 15, 6, 0)
+
+
+def mem_free():
+    try:
+        return gc.mem_free()
+    except AttributeError:  # CPython
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return -tracemalloc.get_traced_memory()[0]
+
+
+def measure(fn, n=N):
+    fn()  # warm up: first call may allocate (e.g. interned strings)
+    gc.collect()
+    gc.disable()
+    try:
+        before = mem_free()
+        for _ in range(n):
+            fn()
+        after = mem_free()
+    finally:
+        gc.enable()
+    return (before - after) / n
+
+
+mcp = mcp7940.MCP7940(i2c)
+buf = [0] * 7
+sram_buf = bytearray(64)
+
+
+def get_mcptime():
+    return mcp.mcptime
+
+
+def get_into():
+    return mcp.read_time_into(buf)
+
+
+def get_sram():
+    return mcp.read_fm_SRAM()
+
+
+def get_sram_into():
+    return mcp.sram_readinto(sram_buf)
+
+
+print("mem_read_time: bytes allocated per call (mean over {:d} calls)".format(N))
+print("  mcp.mcptime            : {:6.1f}".format(measure(get_mcptime)))
+print("  mcp.read_time_into(buf): {:6.1f}".format(measure(get_into)))
+print("  mcp.read_fm_SRAM()     : {:6.1f}".format(measure(get_sram)))
+print("  mcp.sram_readinto(buf) : {:6.1f}".format(measure(get_sram_into)))
+print("  last time read         : {}".format(buf))
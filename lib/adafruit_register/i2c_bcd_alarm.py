@@ -29,20 +29,8 @@ except ImportError:
     pass
 
 
-def _bcd2bin(value: int) -> int:
-    """Convert binary coded decimal to Binary
-
-    :param value: the BCD value to convert to binary (required, no default)
-    """
-    return value - 6 * (value >> 4)
-
-
-def _bin2bcd(value: int) -> int:
-    """Convert a binary value to binary coded decimal.
-
-    :param value: the binary value to convert to BCD. (required, no default)
-    """
-    return value + 6 * (value // 10)
+# Table based conversions shared with lib/mcp7940.py (see lib/bcd.py)
+from bcd import bcd2bin as _bcd2bin, bin2bcd as _bin2bcd
 
 
 ALARM_COMPONENT_DISABLED = 0x80
@@ -0,0 +1,62 @@
+#
+# Binary Coded Decimal conversion tables
+# Shared by lib/mcp7940.py and the BCD registers of lib/adafruit_register
+# (i2c_bcd_datetime.py and i2c_bcd_alarm.py).
+#
+# Converting a byte is one table index instead of a chain of arithmetic:
+#   >>> from bcd import bcd2bin, bin2bcd
+#   >>> bcd2bin(0x59)
+#   59
+#   >>> hex(bin2bcd(59))
+#   '0x59'
+#
+# Added by @PaulskPt
+#
+
+# BCD byte -> binary, for all 256 byte values.
+# Codes that are not valid BCD (a nibble > 9) decode as (high nibble * 10) + low nibble.
+BCD2BIN = bytes((b >> 4) * 10 + (b & 0x0F) for b in range(256))
+
+# Binary 0-99 -> BCD byte
+BIN2BCD = bytes(((i // 10) << 4) | (i % 10) for i in range(100))
+
+
+def bcd2bin(value):
+    """Convert a binary coded decimal byte to binary"""
+    return BCD2BIN[value]
+
+
+def bin2bcd(value):
+    """Convert a binary value (0-99) to a binary coded decimal byte"""
+    return BIN2BCD[value]
+
+
+def decode_bcd_into(src, dst, masks, start=0):
+    """Decode the BCD bytes src[start:start+len(masks)] into dst.
+
+    Each source byte is first ANDed with the mask at the same position,
+    to strip control bits that share a register with the BCD value.
+
+    :param src: buffer with the raw register bytes
+    :param dst: mutable sequence receiving len(masks) binary values
+    :param masks: bytes with one mask per register
+    :param int start: index in src of the first register
+    """
+    tbl = BCD2BIN
+    for i in range(len(masks)):
+        dst[i] = tbl[src[start + i] & masks[i]]
+    return dst
+
+
+def encode_bcd_into(src, dst, masks, start=0):
+    """Encode the binary values of src (0-99) into BCD bytes dst[start:start+len(masks)].
+
+    :param src: sequence of binary values
+    :param dst: writable buffer receiving the BCD bytes
+    :param masks: bytes with one mask per register, applied to each BCD byte
+    :param int start: index in dst of the first register
+    """
+    tbl = BIN2BCD
+    for i in range(len(masks)):
+        dst[start + i] = tbl[src[i]] & masks[i]
+    return dst
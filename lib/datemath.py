@@ -0,0 +1,104 @@
+#
+# Integer date arithmetic for the MCP7940 driver (lib/mcp7940.py)
+# Converts between (year, month, date, hours, minutes, seconds) and seconds since 1970-01-01 00:00:00
+# without time.mktime() / time.localtime(), so the result does not depend on a timezone setting
+# and works the same in CircuitPython and in CPython.
+#
+#   >>> from datemath import to_epoch, from_epoch
+#   >>> to_epoch((2023, 11, 1, 15, 6, 0))
+#   1698851160
+#   >>> from_epoch(1698851160)[:7]
+#   (2023, 11, 1, 15, 6, 0, 2)
+#
+# Weekday: 0 = Monday, as time.localtime() and the MCP7940 driver
+#
+# Yearday, weekday and days-in-month are table lookups or closed-form expressions (no loops over the months):
+#   >>> from datemath import yearday, weekday, days_in_month
+#   >>> yearday(2024, 3, 1), weekday(2024, 3, 1), days_in_month(2024, 2)
+#   (61, 4, 29)
+# Years 0-99 are taken as 2000-2099, as the MCP7940 stores them.
+#
+# Added by @PaulskPt
+#
+import time
+
+SECS_PER_DAY = 86400
+
+# Days in each month of a common year, index 1-12
+DAYS_IN_MONTH = bytes((0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31))
+
+# Days of a common year before the first day of each month, index 1-12
+CUM_DAYS = (0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+
+
+def is_leap_year(year):
+    """True for a leap year of the Gregorian calendar"""
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def days_in_month(year, month):
+    """Number of days (28-31) of month (1-12) of year"""
+    if month == 2 and is_leap_year(year):
+        return 29
+    return DAYS_IN_MONTH[month]
+
+
+def valid_date(year, month, date):
+    """True if (year, month, date) is a date of the calendar"""
+    return 1 <= month <= 12 and 1 <= date <= days_in_month(year, month)
+
+
+def yearday(year, month, date):
+    """Day of the year, 1-366"""
+    if year < 100:
+        year += 2000
+    return CUM_DAYS[month] + date + (1 if month > 2 and is_leap_year(year) else 0)
+
+
+def weekday(year, month, date):
+    """Day of the week, 0 = Monday .. 6 = Sunday"""
+    if year < 100:
+        year += 2000
+    return (days_from_civil(year, month, date) + 3) % 7  # 1970-01-01 was a Thursday
+
+
+def days_from_civil(year, month, date):
+    """Days since 1970-01-01 of a date of the (proleptic) Gregorian calendar"""
+    if month <= 2:
+        year -= 1
+        month += 9
+    else:
+        month -= 3
+    era = year // 400
+    yoe = year - era * 400                                  # 0-399
+    doy = (153 * month + 2) // 5 + date - 1                 # 0-365, from March 1st
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy           # 0-146096
+    return era * 146097 + doe - 719468
+
+
+def civil_from_days(days):
+    """(year, month, date) of the day days since 1970-01-01"""
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    date = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    year = yoe + era * 400 + (1 if month <= 2 else 0)
+    return year, month, date
+
+
+def to_epoch(t):
+    """Seconds since 1970-01-01 of t: a time.struct_time or a tuple (year, month, date, hours, minutes, seconds, ...)"""
+    return days_from_civil(t[0], t[1], t[2]) * SECS_PER_DAY + t[3] * 3600 + t[4] * 60 + t[5]
+
+
+def from_epoch(secs):
+    """time.struct_time of secs seconds since 1970-01-01 (tm_isdst -1)"""
+    days, rem = divmod(secs, SECS_PER_DAY)
+    year, month, date = civil_from_days(days)
+    yday = yearday(year, month, date)
+    wday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    return time.struct_time((year, month, date, rem // 3600, (rem // 60) % 60, rem % 60, wday, yday, -1))
@@ -5,15 +5,54 @@
 # # for Circuitpython project with Unexpected Maker ProS3
 # Date 2023-10
 #
-from micropython import const
+try:
+    from micropython import const
+except ImportError:  # CPython, e.g. with the simulator in lib/mcp7940_sim.py
+    def const(x):
+        return x
 
-# Added by @PaulskPt from CPY > Frozen > adafruit_register > example register_rwbit.py
-from board import SCL, SDA
-from busio import I2C
 import time
+from collections import namedtuple
+from bcd import BCD2BIN, BIN2BCD, encode_bcd_into
+import datemath
+from datemath import to_epoch, from_epoch
 
 my_debug = False
 
+# Monotonic clock in nanoseconds (boards without long integers lack time.monotonic_ns())
+try:
+    _ticks_ns = time.monotonic_ns
+except AttributeError:
+    def _ticks_ns():
+        return int(time.monotonic() * 1_000_000_000)
+
+# Sleep used while waiting for the I2C bus or the oscillator
+# (the simulator in lib/mcp7940_sim.py replaces it to advance its virtual clock instead)
+_sleep = time.sleep
+
+# Raised when the I2C bus could not be locked within MCP7940.lock_timeout seconds
+class I2CLockTimeout(RuntimeError):
+    pass
+
+# Decoded, immutable view of the registers 0x00-0x1F returned by MCP7940.snapshot()
+# time:     (year, month, date, hours, minutes, seconds, weekday) as MCP7940.mcptime
+# alarm1/2: (month, date, hours, minutes, seconds, weekday) as MCP7940.alarm1/alarm2
+# alarm1_pol, alarm2_pol: both the one ALMPOL bit (ALM0WKDAY)
+# pwr_down/pwr_up: (month, date, hours, minutes, weekday) as MCP7940.pwr_updn_dt()
+# regs:     the 32 raw register bytes
+Snapshot = namedtuple("Snapshot", ("time", "alarm1", "alarm2",
+                                   "alarm1_enabled", "alarm2_enabled",
+                                   "alarm1_pol", "alarm1_if", "alarm1_msk",
+                                   "alarm2_pol", "alarm2_if", "alarm2_msk",
+                                   "sqwen", "started", "oscrun", "pwrfail", "vbaten",
+                                   "pwr_down", "pwr_up", "regs"))
+
+# Power-fail time-stamps returned by MCP7940.power_events()
+# pwrfail:  the PWRFAIL bit (before an optional clear)
+# down/up:  seconds since 1970-01-01 of the power-down / power-up stamps (seconds 0, year inferred),
+#           or None when PWRFAIL is not set (the stamps are then cleared) or a stamp is not a valid date
+PowerEvents = namedtuple("PowerEvents", ("pwrfail", "down", "up"))
+
 class MCP7940:
     CLS_NAME = "MCP7940"
     ADDRESS = const(0x6F)  # '11001111'
@@ -51,6 +90,13 @@ class MCP7940:
     ALMxIF_BIT = 3
     ST = 7  # Start Status bit
     VBATEN = 3  # External battery backup supply enable bit
+
+    # Packed word returned by alarm_status(): bits 0-7 alarm1, bits 8-15 alarm2 (status >> 8), bit 16 SQWEN
+    ALM_STATUS_EN = 0x01       # ALMxEN  (CONTROL)
+    ALM_STATUS_POL = 0x02      # ALMPOL  (ALM0WKDAY bit 7, shared by both alarms)
+    ALM_STATUS_IF = 0x04       # ALMxIF  (ALMxWKDAY bit 3)
+    ALM_STATUS_MSK_SHIFT = 4   # ALMxMSK (ALMxWKDAY bits 6-4) in bits 4-6
+    ALM_STATUS_SQWEN = 0x10000
     
     bits_dict = {3: "VBATEN",
                  4: "FAIL",
@@ -70,27 +116,9 @@ class MCP7940:
     POWER_FAIL_TIMESTAMP_END = 0X1F
     SRAM_START = 0X20  # 64 Bytes
     SRAM_END = 0X5F
-    
-    DOW = { 0: "Monday",
-            1: "Tuesday",
-            2: "Wednesday",
-            3: "Thursday",
-            4: "Friday",
-            5: "Saturday",
-            6: "Sunday" }
-    
-    DOM = { 1:31,
-            2:28,
-            3:31,
-            4:30,
-            5:31,
-            6:30,
-            7:31,
-            8:31,
-            9:30,
-            10:31,
-            11:30,
-            12:31}
+    EPOCH_2000 = 946684800  # seconds from 1970-01-01 to 2000-01-01
+    STAMP_12HR = 0x01  # flags byte of write_epoch_to_SRAM(): 12 hour format
+    STAMP_PM = 0x02  # flags byte of write_epoch_to_SRAM(): PM
     
     # From MCP7940 Datasheet DS20005010H-page 15
     """
@@ -120,8 +148,37 @@ class MCP7940:
             11:30,
             12:31}
     
-    def __init__(self, i2c, status=True, battery_enabled=True):
+    # Bits of registers 0x00-0x1F that the MCP7940 changes by itself
+    # (time counters, OSCRUN, PWRFAIL, ALMxIF and the power-fail time-stamps).
+    # These are never served from the register shadow (see _update_reg())
+    _VOLATILE = bytes((0x7F, 0xFF, 0x3F, 0x37, 0xFF, 0xFF, 0xFF,  # 0x00-0x06 RTCSEC..RTCYEAR
+                       0x00, 0x00, 0x00,                          # 0x07-0x09 CONTROL, OSCTRIM, reserved
+                       0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00,  # 0x0A-0x10 ALM0SEC..ALM0MTH, reserved
+                       0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00,  # 0x11-0x17 ALM1SEC..ALM1MTH, reserved
+                       0xFF, 0xFF, 0xFF, 0xFF,                    # 0x18-0x1B PWRDNMIN..PWRDNMTH
+                       0xFF, 0xFF, 0xFF, 0xFF))                   # 0x1C-0x1F PWRUPMIN..PWRUPMTH
+    SHADOW_SIZE = 0x20
+    # Masks of the BCD value bits of RTCSEC..RTCYEAR (ALMxSEC..ALMxMTH use the first six)
+    # Month: bits 4-0; bit 5 of RTCMTH is the LPYR flag
+    TIME_MASKS = b"\x7F\x7F\x3F\x07\x3F\x1F\xFF"
+    # Registers whose edits are collected by transaction(): CONTROL up to and including the alarm registers
+    TXN_FIRST = 0x07
+    TXN_LAST = 0x17
+    # Start registers accepted by read_time_into(); a constant, so the check allocates nothing
+    _READ_START_REGS = (CONTROL_REGISTER, ALARM1_START, ALARM2_START, REGISTER_PWR_FAIL, SRAM_START_ADDRESS)
+
+    # Back-off between two attempts to lock the I2C bus (seconds)
+    LOCK_BACKOFF_MIN = 0.0005
+    LOCK_BACKOFF_MAX = 0.01
+
+    def __init__(self, i2c, status=True, battery_enabled=True, use_shadow=False, lock_timeout=1.0):
         self._i2c = i2c
+        # Bus lock, see _lock()
+        self.lock_timeout = lock_timeout  # seconds. None: wait forever
+        self.lock_contention = 0  # number of times the bus was held by another driver
+        self.lock_wait_ns = 0     # total time spent waiting for the bus
+        self.lock_wait_max_ns = 0 # longest wait for the bus
+        self._held = False        # True while a caller (e.g. AsyncMCP7940) holds the bus for us
         # lines added by @PaulskPt
         self._match_lst = ["ss", "mm", "hh", "dow", "dd", "res", "res", "all"]
         self._match_lst_long = ["second", "minute", "hour", "weekday", "date", "reserved", "reserved", "all"]
@@ -133,10 +190,106 @@ class MCP7940:
         self.gtf = "calling self._mcpget_time() failed"
         self._status = status
         self._battery_enabled = battery_enabled
+        # Optional write-through shadow copy of registers 0x00-0x1F
+        # When use_shadow is True, bit updates are computed from the shadow and cost one write
+        self.use_shadow = use_shadow
+        self._shadow = bytearray(MCP7940.SHADOW_SIZE)
+        self._shadow_valid = 0  # bit n set: self._shadow[n] holds the value of register n
+        # Pending edits collected by transaction(): bits in _txn_mask[n] are to be replaced by those of _txn_val[n]
+        self._txn_depth = 0
+        self._txn_mask = bytearray(MCP7940.SHADOW_SIZE)
+        self._txn_val = bytearray(MCP7940.SHADOW_SIZE)
+        # Preallocated buffers for read_time_into(), so reading the time allocates nothing
+        self._reg_buf = bytearray(1)
+        self._time_buf = bytearray(7)
+        self._time_buf6 = memoryview(self._time_buf)[:6]  # alarm registers: no year
+        self._time_buf2 = bytearray(7)  # second read of the time registers, see read_time_into()
+        self._time_vals = [0] * 7
+        # Rollover-safe time reads, see read_time_into()
+        self.consistent_reads = True  # default of the consistent parameter
+        self.rollover_rereads = 0     # reads repeated because the seconds were 59
+        self._alm_buf = bytearray(14)  # CONTROL..ALM2WKDAY (0x07-0x14), read by alarm_status()
+        self._sec_buf = bytearray(1)  # RTCSEC, read by adjust_seconds() while waiting for a rollover
+        self._adj_buf = bytearray(4)  # register address and RTCSEC..RTCHOUR, written by adjust_seconds()
+        self._sram = None  # MCP7940.Data, created by the sram property
     
+    # Lock the I2C bus for the MCP7940
+    # The bus may be shared, e.g. with the SH1107 display (displayio.I2CDisplay).
+    # While another driver holds it, back off with time.sleep() (which lets
+    # CircuitPython run its background tasks) instead of spinning on try_lock().
+    # Raise I2CLockTimeout if the bus is still locked after self.lock_timeout seconds.
+    # The uncontended path allocates nothing.
+    def _lock(self):
+        if self._held:
+            return  # the caller (e.g. AsyncMCP7940) already holds the bus
+        if self._i2c.try_lock():
+            return
+        self.lock_contention += 1
+        t0 = _ticks_ns()
+        delay = 0
+        while not self._i2c.try_lock():
+            waited = _ticks_ns() - t0
+            if self.lock_timeout is not None and waited > self.lock_timeout * 1_000_000_000:
+                self.lock_wait_ns += waited
+                raise I2CLockTimeout(MCP7940.CLS_NAME+": I2C bus still locked after {} s".format(self.lock_timeout))
+            _sleep(delay)
+            delay = MCP7940.LOCK_BACKOFF_MIN if delay == 0 else min(delay * 2, MCP7940.LOCK_BACKOFF_MAX)
+        waited = _ticks_ns() - t0
+        self.lock_wait_ns += waited
+        if waited > self.lock_wait_max_ns:
+            self.lock_wait_max_ns = waited
+
+    def _unlock(self):
+        if self._held:
+            return
+        self._i2c.unlock()
+
+    # Write out_buf: the address of the first register followed by the register values
+    # Returns the number of registers written or -1 on an I2C error
+    def _write_buf(self, out_buf):
+        TAG = MCP7940.CLS_NAME+"._write_buf(): "
+        self._lock()
+        try:
+            self._i2c.writeto(MCP7940.ADDRESS, out_buf)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            return -1
+        finally:
+            self._unlock()
+        if self.use_shadow and out_buf[0] < MCP7940.SHADOW_SIZE:
+            self._shadow_store(out_buf[0], out_buf, 1)
+        return len(out_buf) - 1
+
+    # Read len(buf) registers, starting at register, into buf in one burst (repeated start)
+    # Returns 0 or -1 on an I2C error
+    def _read_regs(self, register, buf):
+        TAG = MCP7940.CLS_NAME+"._read_regs(): "
+        self._reg_buf[0] = register
+        self._lock()
+        try:
+            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, self._reg_buf, buf)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            return -1
+        finally:
+            self._unlock()
+        if self.use_shadow and register < MCP7940.SHADOW_SIZE:
+            self._shadow_store(register, buf)
+        return 0
+
+    # Return (lock_contention, lock_wait_ns, lock_wait_max_ns) and, if reset is True, clear them
+    def lock_stats(self, reset=False):
+        ret = (self.lock_contention, self.lock_wait_ns, self.lock_wait_max_ns)
+        if reset:
+            self.lock_contention = 0
+            self.lock_wait_ns = 0
+            self.lock_wait_max_ns = 0
+        return ret
+
     # See datasheet: DS20005010H-page 18
+    # False also when the bit could not be read (_read_bit() returns -1)
     def has_power_failed(self):
-        ret = True if self._read_bit(MCP7940.PWR_FAIL_REG, MCP7940.PWRFAIL_BIT) else False
+        ret = self._read_bit(MCP7940.PWR_FAIL_REG, MCP7940.PWRFAIL_BIT) == 1
         if my_debug:
             print(f"MCP7940.has_pwr_failure(): state power failure register: {ret}")
         return ret
@@ -149,39 +302,56 @@ class MCP7940:
                 print(TAG+self.sbf)
         return ret
 
-    def start(self):
+    # Set the ST bit and wait until the oscillator runs (OSCRUN set)
+    # OSCRUN is read every poll_interval seconds, for at most timeout seconds
+    # (the oscillator needs a few ms to start, see MCP7940 DATASHEET: DS20005010H-page 15)
+    # wait=False: only set the ST bit and return 0; check later with osc_running()
+    # Returns the time waited in ms, or -1 on an I2C error or a timeout
+    def start(self, timeout=1.0, poll_interval=0.001, wait=True):
         TAG = MCP7940.CLS_NAME+".start(): "
-        ads = 0x3
-        osc_run_bit = 0
-        self._set_bit(MCP7940.RTCSEC, MCP7940.ST, 1)
-        while True:
-            osc_run_bit = self._read_bit(ads, MCP7940.OSCRUN_BIT)
-            if osc_run_bit == 1:
-                break
-            elif osc_run_bit == -1:
-                if my_debug:
-                    print(TAG+self.rbf)
-                break
-            #if my_debug:
-            #    print(f"MCP7940.start(): osc_run_bit: {osc_run_bit}")
-        return osc_run_bit
+        if self._set_bit(MCP7940.RTCSEC, MCP7940.ST, 1) == -1:
+            print(TAG+self.sbf)
+            return -1
+        if not wait:
+            return 0
+        return self._wait_oscrun(1, timeout, poll_interval, TAG)
     
-    def stop(self):
+    # Clear the ST bit and wait until the oscillator stopped (OSCRUN cleared)
+    # Parameters and return value as start()
+    def stop(self, timeout=1.0, poll_interval=0.001, wait=True):
         TAG = MCP7940.CLS_NAME+".stop(): "
-        ads = 0x3
-        osc_run_bit = 0
-        self._set_bit(MCP7940.RTCSEC, MCP7940.ST, 0)
+        if self._set_bit(MCP7940.RTCSEC, MCP7940.ST, 0) == -1:
+            print(TAG+self.sbf)
+            return -1
+        if not wait:
+            return 0
+        return self._wait_oscrun(0, timeout, poll_interval, TAG)
+
+    # Return the OSCRUN bit: 1 if the oscillator runs, 0 if not, -1 on an I2C error (one I2C read)
+    def osc_running(self):
+        return self._read_bit(MCP7940.RTCWKDAY, MCP7940.OSCRUN_BIT)
+
+    # Read OSCRUN every poll_interval seconds until it equals state
+    # Gives up when timeout seconds passed, or were spent sleeping (this bounds the number of reads)
+    # Returns the time waited in ms, or -1 on an I2C error or on a timeout
+    def _wait_oscrun(self, state, timeout, poll_interval, TAG):
+        t0 = _ticks_ns()
+        slept = 0
         while True:
-            osc_run_bit = self._read_bit(ads, MCP7940.OSCRUN_BIT)
-            # print(TAG+f"osc_run_bit: {osc_run_bit}")
-            if osc_run_bit == 0:
-                break
-            elif osc_run_bit == -1:
-                if not my_debug:
-                    print(TAG+self.rbf)
-                break
-            #if my_debug:
-            #    print(f"MCP7940.stop(): osc_run_bit: {osc_run_bit}")
+            osc_run_bit = self.osc_running()
+            elapsed = (_ticks_ns() - t0) / 1_000_000
+            if osc_run_bit == state:
+                if my_debug:
+                    print(TAG+f"OSCRUN {state} after {elapsed} ms")
+                return elapsed
+            if osc_run_bit == -1:
+                print(TAG+self.rbf)
+                return -1
+            if elapsed > timeout * 1000 or slept >= timeout:
+                print(TAG+f"timeout: OSCRUN not {state} after {timeout} s")
+                return -1
+            _sleep(poll_interval)
+            slept += poll_interval
     
     def _is_started(self):
         TAG = MCP7940.CLS_NAME+"._is_started(): "
@@ -215,99 +385,274 @@ class MCP7940:
         """
         TAG = "MCP7940._set_bit():     "
         mask = 1 << bit
-        #current = self._i2c.readfrom_mem(MCP7940.ADDRESS, register, 1)
+        if my_debug:
+            print(TAG+f"params: register: {register}, bit: {bit}, value: {value}")
+        ret = self._update_reg(register, mask, value << bit)
+        if ret == -1:
+            return ret
+
+    def _update_reg(self, register, mask, value):
+        """ Replace the bits in mask of a register by the same bits of value.
+            With the shadow enabled the new register value is computed from the
+            shadow and written in one transaction. Only when the register also holds
+            bits the MCP7940 changes by itself (time counters, OSCRUN, PWRFAIL), or
+            the shadow does not yet hold the register, it is read first.
+            Without the shadow: read, write and a verify read (three transactions).
+            Returns the value written or -1 on an I2C error.
+        """
+        TAG = "MCP7940._update_reg():  "
+        if self._txn_depth and MCP7940.TXN_FIRST <= register <= MCP7940.TXN_LAST:
+            return self._txn_stage(register, mask, value)
         current = bytearray(1)
-        current2 = bytearray(1)
         reg_buf = bytearray()
         reg_buf.append(register)
         out_buf = bytearray()
         out_buf.append(register)
-        if my_debug:
-            print(TAG+f"params: register: {register}, bit: {bit}, value: {value}")
-        try:
-            while not self._i2c.try_lock():
-                pass
-            
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, current) 
-                            
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-        finally:
-            self._i2c.unlock()
-            #pass
-        
-        if my_debug:
-            print(TAG+f"Current register nr {hex(register)} value from RTC: {hex(current[0])}")      
-        updated = (current[0] & ~mask) | ((value << bit) & mask)
+        shadowed = self.use_shadow and register < MCP7940.SHADOW_SIZE
+        volatile = MCP7940._VOLATILE[register] & ~mask if register < MCP7940.SHADOW_SIZE else 0
+
+        if shadowed and not volatile and self._shadow_valid & (1 << register):
+            current[0] = self._shadow[register]
+        else:
+            self._lock()
+            try:
+                self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, current)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                return -1
+            finally:
+                self._unlock()
 
-        out_buf.append(updated)
         if my_debug:
-            print(TAG+f"writing to RTC register nr {hex(register)} updated value: {out_buf}")
-        lst = list(out_buf)
-        le = len(lst)
+            print(TAG+f"Current register nr {hex(register)} value: {hex(current[0])}")
+        updated = (current[0] & ~mask) | (value & mask)
+        out_buf.append(updated)
         if my_debug:
-            print(TAG+f"lst: {lst}, le: {le}")
-            print(TAG+f"writing to RTC register nr {hex(register)} updated value: ", end='')
-            for _ in range(le):
-                print("0x{:02x} ".format(lst[_]), end='')
-            print()
-        
-            print(TAG+f"first call to self._i2c.writeto(). Address to write to: {hex(MCP7940.ADDRESS)}")
-        
+            print(TAG+f"writing to RTC register nr {hex(register)} updated value: 0x{updated:02x}")
+
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
-        
             self._i2c.writeto(MCP7940.ADDRESS, out_buf)  # send data
         except OSError as e:
             print(TAG+f"Error: {e}")
+            self._shadow_valid &= ~(1 << register)
+            return -1
         finally:
-            self._i2c.unlock()
-            #pass       
+            self._unlock()
+
+        if shadowed:
+            self._shadow_store(register, out_buf, 1)
+            return updated
 
         # Check the result:
-        if my_debug:
-            print(TAG+"second call to self._i2c.writeto()")
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, current2)
+            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, current)
         except OSError as e:
             print(TAG+f"Error: {e}")
         finally:
-            self._i2c.unlock()
-            #pass       
-    
+            self._unlock()
+
         if my_debug:
-            print(TAG+f"received (updated bits) from RTC: {hex(current2[0])}")      
-        
+            print(TAG+f"received (updated bits) from RTC: {hex(current[0])}")
+        return updated
 
     def _read_bit(self, register, bit):
         TAG="MCP7940._read_bit():    "
-        register_val = bytearray(1)
-        reg_buf = bytearray()
-        reg_buf.append(register)
         if bit in MCP7940.bits_dict.keys():
             sb = MCP7940.bits_dict[bit]
         else:
             sb = bit
         if my_debug:
             print(TAG+f"params: register: {register}, bit: {sb}")
+        if self._txn_depth and register < MCP7940.SHADOW_SIZE and self._txn_mask[register] & (1 << bit):
+            return (self._txn_val[register] >> bit) & 1  # edit pending in a transaction
+        if (self.use_shadow and register < MCP7940.SHADOW_SIZE and
+                self._shadow_valid & (1 << register) and
+                not MCP7940._VOLATILE[register] & (1 << bit)):
+            return (self._shadow[register] >> bit) & 1
+        register_val = bytearray(1)
+        reg_buf = bytearray()
+        reg_buf.append(register)
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
             self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, register_val)
 
         except OSError as e:
             print(TAG+f"Error: {e}")
+            if register < MCP7940.SHADOW_SIZE:
+                self._shadow_valid &= ~(1 << register)  # the shadow may no longer match the MCP7940
+            return -1
         finally:
-            self._i2c.unlock()
+            self._unlock()
         
+        if self.use_shadow:
+            self._shadow_store(register, register_val, 0)
         ret = (register_val[0] & (1 << bit)) >> bit
         if my_debug:
             print(TAG+f"received from RTC register: {hex(register)}, bit nr: {bit}, (register_val[0]): {register_val[0]}. func return value: {ret}")
         return ret
 
+    # Copy register values, just read from or written to the MCP7940, into the shadow.
+    # buf[start:] holds the values of the registers from register onwards
+    def _shadow_store(self, register, buf, start=0):
+        for i in range(start, len(buf)):
+            if register >= MCP7940.SHADOW_SIZE:
+                break
+            v = buf[i]
+            if register in (MCP7940.REGISTER_ALM1WKDAY, MCP7940.REGISTER_ALM2WKDAY):
+                v &= 0xF7  # Writing to ALMxWKDAY always clears ALMxIF
+            self._shadow[register] = v
+            self._shadow_valid |= 1 << register
+            register += 1
+
+    # Read registers 0x00-0x1F in one burst into the shadow
+    # The shadow is only refreshed on demand: call this after another
+    # master has changed the configuration of the MCP7940
+    def refresh_shadow(self):
+        TAG = MCP7940.CLS_NAME+".refresh_shadow(): "
+        reg_buf = bytearray(1)  # start at register 0x00
+        self._lock()
+        try:
+            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, self._shadow)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            self._shadow_valid = 0
+            return -1
+        finally:
+            self._unlock()
+        self._shadow_valid = 0xFFFFFFFF
+        return 0
+
+    # Forget the contents of the shadow. Registers are read again on first use
+    def invalidate_shadow(self):
+        self._shadow_valid = 0
+
+    # Collect edits of the registers 0x07-0x17 (CONTROL and the alarm registers)
+    # and send them to the MCP7940 as one sequential-address burst write on exit,
+    # followed by one verification read if verify is True:
+    #
+    #   with mcp.transaction() as t:
+    #       mcp.alarm1 = (11, 1, 15, 7, 0, 2)
+    #       mcp._clr_ALMxIF_bit(1)
+    #       mcp._set_ALMxMSK_bits(1, 1)
+    #       mcp._set_ALMPOL_bit(1)
+    #       mcp.alarm_enable(1, True)
+    #   if t.result == -1: ...
+    #
+    # Bit reads inside the block return the pending values.
+    # Edits of the timekeeping registers (0x00-0x06) are not collected, they go to the MCP7940 at once.
+    # If the block raises an exception, the collected edits are discarded.
+    def transaction(self, verify=True):
+        return MCP7940.Transaction(self, verify)
+
+    # Record a pending edit of a register within a transaction
+    def _txn_stage(self, register, mask, value):
+        self._txn_mask[register] |= mask
+        self._txn_val[register] = (self._txn_val[register] & ~mask) | (value & mask)
+        return self._txn_val[register]
+
+    def _txn_discard(self):
+        for _ in range(MCP7940.SHADOW_SIZE):
+            self._txn_mask[_] = 0
+
+    # Write the edits collected by a transaction
+    # Registers between two edited registers are rewritten with their current value,
+    # except an untouched ALMxWKDAY register, because writing it would clear its ALMxIF bit.
+    # Return the number of registers written, or -1 on an I2C error or a failed verification
+    def _txn_commit(self, verify=True):
+        TAG = MCP7940.CLS_NAME+"._txn_commit(): "
+        lo = hi = -1
+        for _ in range(MCP7940.TXN_FIRST, MCP7940.TXN_LAST+1):
+            if self._txn_mask[_]:
+                if lo == -1:
+                    lo = _
+                hi = _
+        if lo == -1:
+            return 0
+
+        # Current register values, needed where not every bit is edited
+        need_read = False
+        for _ in range(lo, hi+1):
+            if self._txn_mask[_] != 0xFF and not (self.use_shadow and self._shadow_valid & (1 << _)):
+                need_read = True
+        n = hi - lo + 1
+        buf = bytearray(n)
+        reg_buf = bytearray()
+        reg_buf.append(lo)
+        if need_read:
+            self._lock()
+            try:
+                self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, buf)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                self._txn_discard()
+                return -1
+            finally:
+                self._unlock()
+        else:
+            buf[:] = self._shadow[lo:hi+1]
+        for _ in range(n):
+            m = self._txn_mask[lo+_]
+            buf[_] = (buf[_] & ~m) | (self._txn_val[lo+_] & m)
+
+        # Split the burst at untouched ALMxWKDAY registers
+        segments = []
+        start = lo
+        for _ in range(lo, hi+1):
+            if not self._txn_mask[_] and _ in (MCP7940.REGISTER_ALM1WKDAY, MCP7940.REGISTER_ALM2WKDAY):
+                if start < _:
+                    segments.append((start, _-1))
+                start = _+1
+        segments.append((start, hi))
+
+        ret = 0
+        self._lock()
+        try:
+            for first, last in segments:
+                out_buf = bytearray()
+                out_buf.append(first)
+                out_buf.extend(buf[first-lo:last-lo+1])
+                if my_debug:
+                    print(TAG+f"writing registers {hex(first)}-{hex(last)}: {list(out_buf[1:])}")
+                self._i2c.writeto(MCP7940.ADDRESS, out_buf)
+                ret += last - first + 1
+                if self.use_shadow:
+                    self._shadow_store(first, out_buf, 1)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            self._shadow_valid = 0
+            ret = -1
+        finally:
+            self._unlock()
+
+        if ret != -1 and verify:
+            ck_buf = bytearray(n)
+            self._lock()
+            try:
+                self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, ck_buf)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                ret = -1
+            finally:
+                self._unlock()
+            for _ in range(n):
+                # ALMxIF is set by the hardware; ALMPOL is only implemented in ALM0WKDAY
+                ign = 0x08 if lo+_ == MCP7940.REGISTER_ALM1WKDAY else 0x88 if lo+_ == MCP7940.REGISTER_ALM2WKDAY else 0
+                if ret != -1 and (ck_buf[_] ^ buf[_]) & self._txn_mask[lo+_] & ~ign:
+                    print(TAG+f"verification failed for register {hex(lo+_)}: wrote 0x{buf[_]:02x}, read 0x{ck_buf[_]:02x}")
+                    self._shadow_valid = 0
+                    ret = -1
+        self._txn_discard()
+        return ret
+
+    # Sequence view of the SRAM, see MCP7940.Data: e.g. mcp.sram[0:8], mcp.sram[3] = 1
+    @property
+    def sram(self):
+        if self._sram is None:
+            self._sram = MCP7940.Data(self)
+        return self._sram
+
     @property
     def mcptime(self):
         return self._mcpget_time()
@@ -322,6 +667,164 @@ class MCP7940:
             (2019, 6, 3, 13, 12, 44, 0, 154)
             # 1:12:44pm on Monday (0) the 3 Jun 2019 (154th day of the year)
         """
+        out_buf = self._time_out_buf(t_in)
+
+        # Note that some fields will be overwritten that are important!
+        # fixme!  From @PaulskPt 2023-10-07: fixed.
+        # --------------------------------------------------------------------------------------
+        # SET THE TIMEKEEPING DATA to THE MCP7940 RTC SHIELD
+        # --------------------------------------------------------------------------------------
+        self.stop()  # See:  MCP7940 DATASHEET: DS20005010H-page 15
+
+        if self._write_buf(out_buf) == -1:
+            self._shadow_valid = 0
+            
+        self.start()
+
+        # correct the fact that setting a new time clears the 12/24hr bit
+        if self._is_12hr:
+            self.set_12hr(self._is_12hr)
+        # --------------------------------------------------------------------------------------
+
+    # Seconds since 1970-01-01 00:00:00 (as time.time()) of the time of the MCP7940
+    # Computed with integer arithmetic (lib/datemath.py), not with time.mktime(): no timezone is applied.
+    # For seconds since 2000-01-01 subtract MCP7940.EPOCH_2000. Returns -1 on an I2C error
+    @property
+    def epoch(self):
+        t = self._time_vals
+        if self.read_time_into(t) == -1:
+            return -1
+        t[3] = self._hours24(self._time_buf[MCP7940.RTCHOUR])
+        return to_epoch(t)
+
+    # Set the MCP7940 to secs seconds since 1970-01-01; the weekday is computed from the date
+    @epoch.setter
+    def epoch(self, secs):
+        self.mcptime = from_epoch(secs)
+
+    # time.struct_time of the MCP7940 time, with tm_wday and tm_yday computed from the date
+    # Returns None on an I2C error
+    @property
+    def struct_time(self):
+        secs = self.epoch
+        if secs == -1:
+            return None
+        return from_epoch(secs)
+
+    # Set the MCP7940 to t: a time.struct_time or a tuple (year, month, date, hours, minutes, seconds, ...)
+    # The weekday is computed from the date; a weekday in t is ignored
+    @struct_time.setter
+    def struct_time(self, t):
+        self.mcptime = from_epoch(to_epoch(t))
+
+    # Shift the time of the MCP7940 by delta seconds (negative: back) without stopping the oscillator
+    # The mcptime setter stops the oscillator, writes all seven registers and starts it again:
+    # dozens of I2C transactions, and the fraction of the current second is lost.
+    # This waits for the next rollover of the seconds register and, right after it, writes only the
+    # registers that change (RTCSEC with the ST bit kept set, RTCMIN, RTCHOUR) in one transaction.
+    # RTCWKDAY (with VBATEN) is not touched. RTCSEC is read every poll_interval seconds: the write
+    # then lands at most poll_interval after the rollover, well before the next one, and a call
+    # costs one read of the time, at most 1 / poll_interval + 1 reads of RTCSEC and one write
+    # (at most 7 I2C transactions with the default 0.25 s; the mcptime setter needs 11).
+    # align=False: write at once, without waiting (2 I2C transactions). A rollover of the seconds
+    # between the read and the write is then lost (about once in 1000 calls at 100 kHz).
+    # When the date changes, or the oscillator is stopped, the mcptime setter is used instead.
+    # Returns the number of registers written (0 if delta is 0),
+    # or -1 on an I2C error or when no rollover was seen within timeout seconds
+    def adjust_seconds(self, delta, timeout=1.5, poll_interval=0.25, align=True):
+        TAG = MCP7940.CLS_NAME+".adjust_seconds(): "
+        return self._adjust(delta, self.epoch, timeout, poll_interval, align, TAG)
+
+    # Set the MCP7940 to t (as for the mcptime setter) by adjust_seconds() when t differs
+    # from the time of the MCP7940 only in RTCSEC..RTCHOUR, e.g. for a small NTP correction
+    # t is taken as the time at the moment of the call. Returns as adjust_seconds()
+    def set_time_fast(self, t, timeout=1.5, poll_interval=0.25, align=True):
+        TAG = MCP7940.CLS_NAME+".set_time_fast(): "
+        e0 = self.epoch
+        if e0 == -1:
+            return -1
+        return self._adjust(to_epoch(t) - e0, e0, timeout, poll_interval, align, TAG)
+
+    # e0: the epoch just read by self.epoch; self._time_buf holds its raw registers
+    def _adjust(self, delta, e0, timeout, poll_interval, align, TAG):
+        if e0 == -1:
+            print(TAG+"failed to read the time")
+            return -1
+        if delta == 0:
+            return 0
+        tb = self._time_buf
+        if not tb[MCP7940.RTCSEC] & 0x80:  # ST cleared: the seconds do not roll over
+            self.mcptime = from_epoch(e0 + delta)
+            return 7
+        sec0 = tb[MCP7940.RTCSEC] & 0x7F
+        hour_raw = tb[MCP7940.RTCHOUR]
+        buf = self._sec_buf
+        buf[0] = sec0
+        # Wait for the seconds to roll over: a write right after it lands at least 1 - poll_interval
+        # seconds before the next increment
+        t_end = _ticks_ns() + int(timeout * 1_000_000_000)
+        slept = 0
+        while align:
+            if self._read_regs(MCP7940.RTCSEC, buf) == -1:
+                return -1
+            if buf[0] & 0x7F != sec0:
+                break
+            if _ticks_ns() > t_end or slept >= timeout:
+                print(TAG+f"timeout: no seconds rollover within {timeout} s")
+                return -1
+            _sleep(poll_interval)
+            slept += poll_interval
+        now = e0 + (BCD2BIN[buf[0] & 0x7F] - BCD2BIN[sec0]) % 60
+        new = now + delta
+        if new // datemath.SECS_PER_DAY != now // datemath.SECS_PER_DAY:
+            # The date changes: RTCWKDAY..RTCYEAR too, with the oscillator stopped
+            if my_debug:
+                print(TAG+"date changes, setting the time with stop()/start()")
+            self.mcptime = from_epoch(new)
+            return 7
+        # out[r+1]: the new value of register r (RTCSEC..RTCHOUR)
+        out = self._adj_buf
+        first = last = -1
+        for r in range(3):
+            v = self._time_reg_val(r, new, hour_raw)
+            out[r+1] = v
+            if v != self._time_reg_val(r, now, hour_raw):
+                if first == -1:
+                    first = r
+                last = r
+        out[first] = first  # register address, just before the value of the first changed register
+        if self._write_buf(memoryview(out)[first:last+2]) == -1:
+            self._shadow_valid = 0
+            return -1
+        if my_debug:
+            print(TAG+f"shifted by {delta} s, wrote registers {first}..{last}")
+        return last - first + 1
+
+    # Value of register r (RTCSEC, RTCMIN or RTCHOUR) for the epoch secs
+    # The ST bit is set; hour_raw: the current RTCHOUR byte, for the 12/24 hour format
+    @staticmethod
+    def _time_reg_val(r, secs, hour_raw):
+        rem = secs % datemath.SECS_PER_DAY
+        if r == MCP7940.RTCSEC:
+            return 0x80 | BIN2BCD[rem % 60]
+        if r == MCP7940.RTCMIN:
+            return BIN2BCD[(rem // 60) % 60]
+        hours = rem // 3600
+        if hour_raw & 0x40:  # 12 hour format: bit 5 is PM
+            return 0x40 | (0x20 if hours >= 12 else 0) | BIN2BCD[hours % 12 or 12]
+        return BIN2BCD[hours]
+
+    # Hours 0-23 of a raw RTCHOUR register byte, in 12 or 24 hour format (bit 6)
+    @staticmethod
+    def _hours24(raw):
+        if raw & 0x40:  # 12 hour format: bit 5 is AM/PM
+            return BCD2BIN[raw & 0x1F] % 12 + (12 if raw & 0x20 else 0)
+        return BCD2BIN[raw & 0x3F]
+
+    # Build the buffer to write the time t_in (year, month, date, hours, minutes, seconds, weekday)
+    # to the timekeeping registers: register address 0x00 followed by RTCSEC..RTCYEAR
+    def _time_out_buf(self, t_in):
+        TAG = MCP7940.CLS_NAME+".mcptime() setter: "
         if my_debug:
             print(TAG+f"setter: param t_in: {t_in}. len(t_in): {len(t_in)}")
         t_in = t_in[:7]  # Slice off too many bytes
@@ -352,40 +855,12 @@ class MCP7940:
             )
         
         #print(time_reg)
-        reg_filter = (0x7F, 0x7F, 0x3F, 0x07, 0x3F, 0x3F, 0xFF)
-        
-        out_buf = bytearray()
-        out_buf.append(MCP7940.CONTROL_REGISTER)
-        t = [(self.int_to_bcd(reg) & filt) for reg, filt in zip(time_reg, reg_filter)]
-        for _ in range(len(t)):
-            out_buf.append(t[_])
-        in_buf = bytearray(len(out_buf)-1)
+        out_buf = bytearray(8)
+        out_buf[0] = MCP7940.CONTROL_REGISTER
+        encode_bcd_into(time_reg, out_buf, MCP7940.TIME_MASKS, 1)
         if my_debug:
             print(TAG+f"to send to MCP7940, buffer: {out_buf}, len(buffer): {len(out_buf)}")
-
-        # Note that some fields will be overwritten that are important!
-        # fixme!  From @PaulskPt 2023-10-07: fixed.
-        # --------------------------------------------------------------------------------------
-        # SET THE TIMEKEEPING DATA to THE MCP7940 RTC SHIELD
-        # --------------------------------------------------------------------------------------
-        self.stop()  # See:  MCP7940 DATASHEET: DS20005010H-page 15
-
-        try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto(MCP7940.ADDRESS, out_buf)
-    
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-        finally:
-            self._i2c.unlock()
-            
-        self.start()
-
-        # correct the fact that setting a new time clears the 12/24hr bit
-        if self._is_12hr:
-            self.set_12hr(self._is_12hr)
-        # --------------------------------------------------------------------------------------
+        return out_buf
         
     # Return state of the self.time_is_set flag
     # Function added to be useful for calling scripts
@@ -483,6 +958,41 @@ class MCP7940:
             print(TAG+self.sbf)
         return ret
     
+    # Read CONTROL (0x07), ALM1WKDAY (0x0D) and ALM2WKDAY (0x14) in one burst of 0x07-0x14
+    # and return the enable, polarity, interrupt flag and mask bits of both alarms packed in an int:
+    #   alarm1: status & 0xFF, alarm2: (status >> 8) & 0xFF, each with the bits
+    #   ALM_STATUS_EN, ALM_STATUS_POL, ALM_STATUS_IF and the mask in bits 4-6 (ALM_STATUS_MSK_SHIFT);
+    #   ALMPOL only exists in ALM0WKDAY and is shared by both alarms: it is reported for both.
+    #   bit 16 (ALM_STATUS_SQWEN): the SQWEN bit. See alarm_fields() to unpack one alarm.
+    # One I2C transaction, no allocation. Returns -1 on an I2C error
+    def alarm_status(self):
+        TAG = MCP7940.CLS_NAME+".alarm_status(): "
+        buf = self._alm_buf
+        if self._read_regs(MCP7940.RTCC_CONTROL_REGISTER, buf) == -1:
+            print(TAG+"failed to read the alarm registers")
+            return -1
+        ctrl = buf[0]
+        wk1 = buf[MCP7940.REGISTER_ALM1WKDAY - MCP7940.RTCC_CONTROL_REGISTER]
+        wk2 = buf[MCP7940.REGISTER_ALM2WKDAY - MCP7940.RTCC_CONTROL_REGISTER]
+        ret = ((ctrl >> MCP7940.SQWEN_BIT & 1) << 16
+               | self._alm_status_bits(ctrl >> MCP7940.ALARM0EN_BIT, wk1, wk1)
+               | self._alm_status_bits(ctrl >> MCP7940.ALARM1EN_BIT, wk2, wk1) << 8)
+        if my_debug:
+            print(TAG+f"status: {ret:017b}")
+        return ret
+
+    # Status byte of one alarm: en (bit 0 the ALMxEN bit), wk the ALMxWKDAY register,
+    # wk_pol the ALM0WKDAY register (ALMPOL)
+    @staticmethod
+    def _alm_status_bits(en, wk, wk_pol):
+        return (en & 1) | (wk_pol >> MCP7940.ALMPOL_BIT & 1) << 1 | (wk >> MCP7940.ALMxIF_BIT & 1) << 2 | (wk & 0x70)
+
+    # Unpack alarm alarm_nr (1 or 2) of a word returned by alarm_status(): (enabled, pol, if, msk)
+    @staticmethod
+    def alarm_fields(status, alarm_nr):
+        b = status >> (8 if alarm_nr == 2 else 0)
+        return (b & 1, b >> 1 & 1, b >> 2 & 1, b >> MCP7940.ALM_STATUS_MSK_SHIFT & 7)
+
     # Check if alarm x is enabled
     def alarm_is_enabled(self, alarm_nr=None):
         TAG = MCP7940.CLS_NAME+"alarm_is_enabled(): "
@@ -519,20 +1029,27 @@ class MCP7940:
             month, date, hours, minutes, seconds, weekday = t
         # Reorder
         time_reg = [seconds, minutes, hours, weekday, date, month]
-        reg_filter = (0x7F, 0x7F, 0x3F, 0x07, 0x3F, 0x3F)  # No year field for alarms
-        out_buf = bytearray()
-        out_buf.append(MCP7940.ALARM1_START)
-        t = [(self.int_to_bcd(reg) & filt) for reg, filt in zip(time_reg, reg_filter)]
-        for _ in range(len(t)):
-            out_buf.append(t[_])
+        out_buf = bytearray(7)
+        out_buf[0] = MCP7940.ALARM1_START
+        encode_bcd_into(time_reg, out_buf, MCP7940.TIME_MASKS[:6], 1)  # No year field for alarms
+        if self._txn_depth:
+            for _ in range(1, len(out_buf)):
+                self._txn_stage(MCP7940.ALARM1_START + _ - 1, 0xFF, out_buf[_])
+            return
         
-        while not self._i2c.try_lock():
-            pass
         if my_debug:
             print(TAG+f"writing to alarm1: {list(out_buf)}")
-        self._i2c.writeto(MCP7940.ADDRESS, out_buf) 
-
-        self._i2c.unlock()
+        self._lock()
+        try:
+            self._i2c.writeto(MCP7940.ADDRESS, out_buf)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            self._shadow_valid = 0
+            return
+        finally:
+            self._unlock()
+        if self.use_shadow:
+            self._shadow_store(MCP7940.ALARM1_START, out_buf, 1)  # also clears ALMPOL and ALM1MSK in the shadow
     
     @property
     def alarm2(self):
@@ -550,72 +1067,67 @@ class MCP7940:
             month, date, hours, minutes, seconds, weekday = t
         # Reorder
         time_reg = [seconds, minutes, hours, weekday, date, month]
-        reg_filter = (0x7F, 0x7F, 0x3F, 0x07, 0x3F, 0x3F)  # No year field for alarms
-        out_buf = bytearray()
-        out_buf.append(MCP7940.ALARM2_START)
-        t = [(self.int_to_bcd(reg) & filt) for reg, filt in zip(time_reg, reg_filter)]
-        for _ in range(len(t)):
-            out_buf.append(t[_])
-            
-        while not self._i2c.try_lock():
-            pass
+        out_buf = bytearray(7)
+        out_buf[0] = MCP7940.ALARM2_START
+        encode_bcd_into(time_reg, out_buf, MCP7940.TIME_MASKS[:6], 1)  # No year field for alarms
+        if self._txn_depth:
+            for _ in range(1, len(out_buf)):
+                self._txn_stage(MCP7940.ALARM2_START + _ - 1, 0xFF, out_buf[_])
+            return
+        
         if my_debug:
             print(TAG+f"writing to alarm2: {list(out_buf)}")
-        self._i2c.writeto(MCP7940.ADDRESS, out_buf) 
-        
-        self._i2c.unlock()
+        self._lock()
+        try:
+            self._i2c.writeto(MCP7940.ADDRESS, out_buf)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            self._shadow_valid = 0
+            return
+        finally:
+            self._unlock()
+        if self.use_shadow:
+            self._shadow_store(MCP7940.ALARM2_START, out_buf, 1)  # also clears ALMPOL and ALM2MSK in the shadow
 
-    def bcd_to_int(self, bcd):
+    @staticmethod
+    def bcd_to_int(bcd):
         """ Expects a byte encoded with 2x 4bit BCD values. """
-        # Alternative using conversions: int(str(hex(bcd))[2:])
-        ret = (bcd & 0xF) + (bcd >> 4) * 10
-        if my_debug:
-            print(MCP7940.CLS_NAME+"bcd_to_int(): "+"bcd: {:2d}, int: {:02d}".format(bcd, ret))
-        return ret
+        return BCD2BIN[bcd]  # see lib/bcd.py
 
-    def int_to_bcd(self, i):
-        ret = (i // 10 << 4) + (i % 10)
-        if my_debug:
-            print(MCP7940.CLS_NAME+"int_to_bcd(): "+"int: {:2d}, bcd: {:02d}".format(i, ret))
-        return ret
+    @staticmethod
+    def int_to_bcd(i):
+        return BIN2BCD[i]
 
     """ https://stackoverflow.com/questions/725098/leap-year-calculation """
     def is_leap_year(self, year):
-        if (year % 4 == 0 and year % 100 != 0) or year % 400 == 0:
-            return True
-        return False
+        return datemath.is_leap_year(year)
     
-    # Return the weekday as an integeradded by @Paulskpt """
-    def weekday_N(self):
+    # Return the weekday as an integer (0 = Monday) added by @Paulskpt
+    # dt: optional (year, month, date, ...): the weekday is then computed from that date, without an I2C read
+    def weekday_N(self, dt=None):
         TAG = MCP7940.CLS_NAME+".weekday_N(): "
-        if my_debug:
-            print(TAG+f"self.mcptime = {self.mcptime}")
-        dt = self._mcpget_time()
-        le = len(dt)
-        if le < 2:
+        if dt is not None:
+            return datemath.weekday(dt[0], dt[1], dt[2])
+        t = self._time_vals
+        if self.read_time_into(t) == -1:
             if my_debug:
                 print(TAG+self.gtf)
             return -1
-        if my_debug:
-            print(TAG+f"dt: {dt}")
-        # Year, month, mday, hour, minute, second, weekday, yearday, is_12hr, isPM
-        weekday = dt[6]   # slice off not needed values
-        #_, _, _, _, _, _, weekday = dt # we don't need: year, month, date, hour, minute, second
-        
+        weekday = t[6]
         if my_debug:
             print(TAG+f"weekday: {weekday}")
-
         return weekday
     
     # Return the weekday as a string
-    def weekday_S(self):
+    # dt: optional (year, month, date, ...), see weekday_N()
+    def weekday_S(self, dt=None):
         TAG = MCP7940.CLS_NAME+".weekday_S(): "
         wd_s = ""
-        wd_n = self.weekday_N()
+        wd_n = self.weekday_N(dt)
         if wd_n == -1:
             if my_debug:
                 print(TAG+"calling self.weekday_N() failed")
-                return wd_s
+            return wd_s
         if wd_n in MCP7940.DOW:
             wd_s = MCP7940.DOW[wd_n]
             if my_debug:
@@ -623,37 +1135,26 @@ class MCP7940:
         return wd_s
     
     
-    # Calculate the yearday
+    # Calculate the yearday (1-366) with a table lookup (lib/datemath.py)
+    # dt0: optional (year, month, date, ...); without it the date is read from the MCP7940
     def yearday(self, dt0=None):
         TAG = MCP7940.CLS_NAME+".yearday(): "
         if my_debug:
             print(TAG+f"param dt0: {dt0}")
 
         if dt0 is not None: 
-            # Prevent 'hang' when called fm self._mcpget_time(),
-            # by having self._mcpget_time() furnish dt stamp
-            # Slicing [:3]. We need only year, month and mday
-            dt = dt0[:3]
+            dt = dt0
         else:
-            dt = self._mcpget_time()[:3]
-            le = len(dt)
-            if le < 2:
+            dt = self._time_vals
+            if self.read_time_into(dt) == -1:
                 if my_debug:
                     print(TAG+self.gtf)
-                    return -1
-        ndays = 0
-        curr_yr = dt[0]
-        curr_mo = dt[1]
-        curr_date = dt[2]
-        for _ in range(1, curr_mo):
-            try:
-                ndays += MCP7940.DOM[_]
-                if _ == 2 and self.is_leap_year(curr_yr):
-                    ndays += 1
-            except KeyError:
-                pass
-        ndays += curr_date
-        return ndays
+                return -1
+        if not datemath.valid_date(dt[0], dt[1], dt[2]):
+            if my_debug:
+                print(TAG+f"invalid date: {dt[:3]}")
+            return -1
+        return datemath.yearday(dt[0], dt[1], dt[2])
     
     # See datasheet: DS20005010H-page 18
     def _is_pwr_failure(self):
@@ -706,26 +1207,22 @@ class MCP7940:
                     1: "IF",
                     2: "MSK"}
         
-        if alarm_nr == 1:
+        if alarm_nr == 1 or itm == 0:  # ALMPOL: only in ALM0WKDAY, shared by both alarms
             ads = MCP7940.REGISTER_ALM1WKDAY
         elif alarm_nr == 2:
             ads = MCP7940.REGISTER_ALM2WKDAY
         
         num_registers = 1
-        reg_buf = bytearray()
-        reg_buf.append(ads)
         current = bytearray(num_registers)
-        try:
-            while not self._i2c.try_lock():
-                pass
-            #current = self._i2c.readfrom_mem(MCP7940.ADDRESS, ads, num_registers)
-            self._i2c.writeto(MCP7940.ADDRESS, reg_buf)  # send request for register ...
-            self._i2c.readfrom_into(MCP7940.ADDRESS, current)
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-            return -1
-        finally:
-            self._i2c.unlock()
+        itm_mask = (0x80, 0x08, 0x70)[itm]
+        if self._txn_depth and self._txn_mask[ads] & itm_mask == itm_mask:
+            current[0] = self._txn_val[ads]  # edit pending in a transaction
+        elif self.use_shadow and itm != 1 and self._shadow_valid & (1 << ads):
+            current[0] = self._shadow[ads]  # ALMPOL and ALMxMSK only change when written
+        else:
+            # One transaction with a repeated start (also stores the shadow)
+            if self._read_regs(ads, current) == -1:
+                return -1
         if my_debug:
             print(TAG+f"ALM{alarm_nr}{itm_dict[itm]}_bit current: {current}")
         if itm == 0:
@@ -791,63 +1288,11 @@ class MCP7940:
         elif alarm_nr == 2:
             ads = 0x14
 
-        current = bytearray(1)
-        reg_buf = bytearray()
-        reg_buf.append(ads)
-        out_buf = bytearray()
-        out_buf.append(ads)
-
-        try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, current)
-        except OSError as e:
-            print(TAG+f"Error: {e}")
+        updated = self._update_reg(ads, 0x08, 0x00)  # clear the ALMxIF bit
+        if updated == -1:
             return 0
-        finally:
-            self._i2c.unlock()
-            #pass
-        
-        if my_debug:
-            print(TAG+"received ALM{:d} weekday value register: lst(current): {}, value: 0x{:0x}, in binary: b\'{:08b}\'". \
-                format(alarm_nr, list(current), current[0], current[0]))
-        updated = current[0]
-        updated = updated & 0xF7 # clear the ALMxIF bit
-        out_buf.append(updated)
-        
         if my_debug:
-            print(TAG+"writing value, hex: 0x{:02x}, binary: b\'{:08b}\'".format(updated, updated) )
-            
-        try:
-            while not self._i2c.try_lock():
-                pass 
-            self._i2c.writeto(MCP7940.ADDRESS, out_buf)  # send data
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-            return 0
-        finally:
-            self._i2c.unlock()
-            #pass
-        reg_buf = bytearray()
-        reg_buf.append(ads)
-        ck_buf = bytearray(1)
-        try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, ck_buf)
-            ck_if_bit = ck_buf[0]
-            ck_if_bit2 = ck_if_bit & 0x7F # isolate b3
-            ck_if_bit2 = ck_if_bit2 >> 3  # shift b3 to b0
-            if my_debug:
-                print(TAG+"check weekday value register rcvd 2nd time: 0x{:02x}, IF bit: hex: 0x{:x}, binary: b\'{:b}\'". \
-                    format(ck_if_bit, ck_if_bit2, ck_if_bit2))
-                print()
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-            return 0
-        finally:
-            self._i2c.unlock()
-            #pass
+            print(TAG+"ALM{:d} weekday value register written, hex: 0x{:02x}, binary: b\'{:08b}\'".format(alarm_nr, updated, updated))
     
     
     # Set the alarm mask (= alarm match) bits for alarm x
@@ -868,168 +1313,248 @@ class MCP7940:
         else:
             mask = 0x00 << 4 # seconds
         
-        current = bytearray(1)
-        reg_buf = bytearray()
-        reg_buf.append(ads)
-        out_buf = bytearray()
-        out_buf.append(ads)
-        
-        try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, current)
-        except OSError as e:
-            print(TAG+f"Error: {e}")
+        updated = self._update_reg(ads, 0x70, mask)  # replace bits b6-b4
+        if updated == -1:
             return 0
-        finally:
-            self._i2c.unlock()
-            #pass
-            
         if my_debug:
-            print(TAG+"received ALM{:d}MSK_bits: lst(current): {}, value: 0x{:x}, binary: b\'{:b}\'". \
-                format(alarm_nr, list(current), current[0], current[0]))
-        updated = current[0]
-        updated &= 0x8F  # mask bits b6-b4
-        updated |= mask  # set for minutes
-        out_buf.append(updated)
-        if my_debug:
-            print(TAG+"writing value: {:02x}, binary: b\'{:b}\'".format(updated, updated))
+            print(TAG+"written value: {:02x}, binary: b\'{:b}\'".format(updated, updated))
             new_match_value = updated & 0x70 # isolate bits 6-4
             new_match_value = new_match_value >> 4
             print(TAG+f"= new_match_value: {new_match_value} = {self._match_lst[new_match_value]}")
-            
-        try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto(MCP7940.ADDRESS, out_buf)  # send data
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-            return 0
-        finally:
-            self._i2c.unlock()
-            #pass
-        reg_buf = bytearray()
-        reg_buf.append(ads)
-        ck_buf = bytearray(1)
-        try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, ck_buf)
-            if my_debug:
-                print(TAG+"check: list(ck_buf) {}, ck_buf[0] value: 0x{:02x}, binary: b\'{:08b}\'". \
-                    format(list(ck_buf), ck_buf[0], ck_buf[0]))
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-            return 0
-        finally:
-            self._i2c.unlock()
-            #pass
         if my_debug and match_type >= 0 and match_type <= 7:
             print(TAG+"match type value set: 0x{:02x}, type of match: {:s}". \
                 format(match_type, self._match_lst[match_type]))
             print()
-
     # Get time for:
     # a) timekeeping registers
     # b) SRAM registers
     # c) alarm1
     # d) alarm2
     # e) power fail
-    def _mcpget_time(self, start_reg = 0x00):
+    def _mcpget_time(self, start_reg = 0x00, consistent=None):
         TAG = "MCP7940._get_time():   "
         num_registers = 7 if start_reg == 0x00 else 6
-        time_reg = bytearray(num_registers)  # added by @PaulskPt
-        reg_buf = bytearray()
-    
-        if start_reg == MCP7940.CONTROL_REGISTER:
-            r = "control"
-            reg_buf.append(MCP7940.CONTROL_REGISTER)
-        
-        elif start_reg == MCP7940.SRAM_START_ADDRESS:
-            r = "sram"
-            time_reg[0] = MCP7940.SRAM_START_ADDRESS
-        
-        elif start_reg == MCP7940.ALARM1_START:
-            r = "alarm0"
-            reg_buf.append(MCP7940.ALARM1_START)
-        
-        elif start_reg == MCP7940.ALARM2_START:
-            r = "alarm1"
-            reg_buf.append(MCP7940.ALARM2_START)
-        
-        elif start_reg == MCP7940.REGISTER_PWR_FAIL:
-            r = "prw_fail"
-            reg_buf.append(MCP7940.REGISTER_PWR_FAIL) 
-        
+        t = self._time_vals
+        if self.read_time_into(t, start_reg, consistent) == -1:
+            return (0,)
+        if num_registers == 7:
+            t3 = (t[0], t[1], t[2], t[3], t[4], t[5], t[6])
         else:
-            r = "default"
-            reg_buf.append(MCP7940.CONTROL_REGISTER)  # default
-        
+            t3 = (t[0], t[1], t[2], t[3], t[4], t[5])
+        # now = (2019, 7, 16, 15, 29, 14, 6, 167)  # Sunday 2019/7/16 3:29:14pm (yearday=167)
+        # year, month, date, hours, minutes, seconds, weekday, yearday = t
+        # time_reg = [seconds, minutes, hours, weekday, date, month, year % 100]
+
         if my_debug:
-            print(TAG+f"using the MCP7940 {r} register")
-            print(TAG+f"reg_buf: {reg_buf}, list(reg_buf): ", end='')
-            lst = list(reg_buf)
-            le = len(lst)
-            print("[", end='')
-            for _ in range(le):
-                print(f"{hex(lst[_])}", end='')
-                if _ < le-1:
-                    print(", ", end='')
-            print("]", end='\n')
-            print(TAG+f"time_reg: {time_reg}, list(time_reg): {list(time_reg)}")
-            
+            print(TAG+f"returning result t3: {t3}")
+        return t3
+
+    # Read the timekeeping registers (start_reg 0x00) or the registers of
+    # alarm1 (0x0A) or alarm2 (0x11) and decode them in place into buf.
+    # buf: a mutable sequence of at least 7 items, e.g. [0] * 7 or array.array('H', [0] * 7)
+    # Filled as for self.mcptime: year, month, date, hours, minutes, seconds, weekday
+    # or, for an alarm: month, date, hours, minutes, seconds, weekday
+    # Uses preallocated buffers only: in steady state a call allocates no memory.
+    # consistent (default: self.consistent_reads): when the seconds read as 59, a carry into the
+    # minutes, hours or date may have happened during the burst (RTCSEC is read first), so date and
+    # time could disagree, e.g. around midnight. The registers are then read once more: if that read
+    # shows a later second, it was taken after the carry and is used; if it shows 59 again, the carry
+    # had not happened yet when it started, so the first read is consistent and is kept (the second
+    # one may be the torn one). Other seconds values cost one read.
+    # Returns buf, or -1 on an I2C error
+    def read_time_into(self, buf, start_reg=0x00, consistent=None):
+        TAG = "MCP7940.read_time_into(): "
+        if start_reg in MCP7940._READ_START_REGS:
+            self._reg_buf[0] = start_reg
+        else:
+            self._reg_buf[0] = MCP7940.CONTROL_REGISTER  # default
+        if start_reg == 0x00:
+            time_reg = self._time_buf
+        else:
+            time_reg = self._time_buf6
+        if my_debug:
+            print(TAG+f"using start register: {hex(self._reg_buf[0])}")
         # --------------------------------------------------------------------------------------
         # GET THE TIMEKEEPING DATA FROM THE MCP7940 RTC SHIELD
         # --------------------------------------------------------------------------------------
+        if consistent is None:
+            consistent = self.consistent_reads
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, time_reg)
+            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, self._reg_buf, time_reg)
         except OSError as e:
             print(TAG+f"Error: {e}")
-            return (0,)
+            return -1
         finally:
-            self._i2c.unlock()
-            #pass
+            self._unlock()
+        if consistent and start_reg == 0x00 and time_reg[MCP7940.RTCSEC] & 0x7F == 0x59:
+            self.rollover_rereads += 1
+            if my_debug:
+                print(TAG+"seconds 59: reading again")
+            buf2 = self._time_buf2
+            self._lock()
+            try:
+                self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, self._reg_buf, buf2)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                return -1
+            finally:
+                self._unlock()
+            if buf2[MCP7940.RTCSEC] & 0x7F != 0x59:  # read after the carry: use it
+                for _ in range(len(buf2)):
+                    time_reg[_] = buf2[_]
         # --------------------------------------------------------------------------------------
+        if self.use_shadow and self._reg_buf[0] < MCP7940.SHADOW_SIZE:
+            self._shadow_store(self._reg_buf[0], time_reg)
         if my_debug:
-            print(TAG+"received following datetime data from MCP7940:")
-            print(f"{time_reg}, list(time_reg): {list(time_reg)}")  # note this contains bcd coded values
-            print()
-        
-        reg_filter = (0x7F, 0x7F, 0x3F, 0x07, 0x3F, 0x3F, 0xFF)[:num_registers]
+            print(TAG+f"received following datetime data from MCP7940: {list(time_reg)}")  # note this contains bcd coded values
 
-        if my_debug:
-            print(TAG+f"time_reg: {time_reg}")
-            print(TAG+f"reg_filter: {reg_filter}")
-        t = [self.bcd_to_int(reg & filt) for reg, filt in zip(time_reg, reg_filter)]
-        
-        if my_debug:
-            print(TAG+f"t: {t}")
-            
-        hh = t[MCP7940.RTCHOUR]
-        if my_debug:
-            print(TAG+f"self._is_12hr: {self._is_12hr}")
-            print(TAG+"hh: {:2d}, b\'{:08b}\'".format(hh, hh))
+        return self._decode_time(self._time_buf, 0, buf, start_reg == 0x00)
+
+    # Decode the BCD time (or alarm) registers src[ofs:ofs+7] into buf
+    # with_year True:  year, month, date, hours, minutes, seconds, weekday
+    # with_year False: month, date, hours, minutes, seconds, weekday
+    def _decode_time(self, src, ofs, buf, with_year=True):
+        tbl = BCD2BIN
+        i = 0
+        if with_year:
+            buf[0] = tbl[src[ofs+MCP7940.RTCYEAR]] + 2000
+            i = 1
+        buf[i] = tbl[src[ofs+MCP7940.RTCMTH] & 0x1F]  # mask the LPYR bit
+        buf[i+1] = tbl[src[ofs+MCP7940.RTCDATE] & 0x3F]
+        hh = tbl[src[ofs+MCP7940.RTCHOUR] & 0x3F]
         if self._is_12hr:
             hh &= 0x1F  # mask 12/24 bit and mask AM/PM bit
-            #if hh >= 12:
-            #    hh -= 12
-        
-        if my_debug:
-            print(TAG+"hh (bits 7-5 masked): {:2d}, b\'{:08b}\'".format(hh, hh))
-            print(TAG+f"length t: {t}")
-        t2 = (t[MCP7940.RTCMTH], t[MCP7940.RTCDATE], hh, t[MCP7940.RTCMIN], t[MCP7940.RTCSEC], t[MCP7940.RTCWKDAY])
-        t3 = (t[MCP7940.RTCYEAR] + 2000,) + t2 if num_registers == 7 else t2
-        # now = (2019, 7, 16, 15, 29, 14, 6, 167)  # Sunday 2019/7/16 3:29:14pm (yearday=167)
-        # year, month, date, hours, minutes, seconds, weekday, yearday = t
-        # time_reg = [seconds, minutes, hours, weekday, date, month, year % 100]
+        buf[i+2] = hh
+        buf[i+3] = tbl[src[ofs+MCP7940.RTCMIN] & 0x7F]
+        buf[i+4] = tbl[src[ofs+MCP7940.RTCSEC] & 0x7F]
+        buf[i+5] = src[ofs+MCP7940.RTCWKDAY] & 0x07
+        return buf
+
+    # Decode a power-down (ofs 0x18) or power-up (ofs 0x1C) time-stamp of the registers in src
+    # Returns (month, date, hours, minutes, weekday)
+    def _decode_pwr_stamp(self, src, ofs):
+        tbl = BCD2BIN
+        b = src[ofs+MCP7940.PWRMTH]
+        hh = src[ofs+MCP7940.PWRHOUR]
+        # weekday in bits 7-5, month in bits 4-0; hours as RTCHOUR: in 12 hour format bit 5 is AM/PM
+        return (tbl[b & 0x1F], tbl[src[ofs+MCP7940.PWRDATE] & 0x3F],
+                tbl[hh & 0x1F] if hh & 0x40 else tbl[hh & 0x3F], tbl[src[ofs+MCP7940.PWRMIN] & 0x7F], b >> 5)
+
+    # Seconds since 1970-01-01 of the power-fail stamp at src[ofs:ofs+4], which has no year:
+    # the year is that of the latest moment not after the epoch secs_max. None if not a valid date
+    @staticmethod
+    def _pwr_stamp_epoch(src, ofs, secs_max):
+        tbl = BCD2BIN
+        month = tbl[src[ofs+MCP7940.PWRMTH] & 0x1F]
+        date = tbl[src[ofs+MCP7940.PWRDATE] & 0x3F]
+        t = [from_epoch(secs_max)[0], month, date,
+             MCP7940._hours24(src[ofs+MCP7940.PWRHOUR]), tbl[src[ofs+MCP7940.PWRMIN] & 0x7F], 0]
+        if not 1 <= month <= 12 or not 1 <= date <= 31:
+            return None
+        for _ in range(8):  # February 29th: back to the previous leap year
+            if datemath.valid_date(t[0], month, date):
+                secs = to_epoch(t)
+                if secs <= secs_max:
+                    return secs
+            t[0] -= 1
+        return None
 
+    # Read all 32 timekeeping, control, alarm and power-fail registers (0x00-0x1F)
+    # in one burst and return them decoded as an immutable Snapshot (see top of this file)
+    # Use it where several of mcptime, alarm1, alarm2, alarm_is_enabled(),
+    # _read_ALM_POL_IF_MSK_bits(), has_power_failed() and pwr_updn_dt() are needed at once.
+    # consistent: as for read_time_into()
+    # Returns None on an I2C error
+    def snapshot(self, consistent=None):
+        TAG = MCP7940.CLS_NAME+".snapshot(): "
+        regs = bytearray(MCP7940.SHADOW_SIZE)
+        reg_buf = bytearray(1)  # start at register 0x00
+        if consistent is None:
+            consistent = self.consistent_reads
+        for _ in range(2):
+            if _:
+                # Seconds 59 (see read_time_into()): read again, keep the first read if it shows 59 again
+                regs2 = bytearray(MCP7940.SHADOW_SIZE)
+                self.rollover_rereads += 1
+            else:
+                regs2 = regs
+            self._lock()
+            try:
+                self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, regs2)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                return None
+            finally:
+                self._unlock()
+            if not consistent or regs2[MCP7940.RTCSEC] & 0x7F != 0x59:
+                regs = regs2
+                break
+        if self.use_shadow:
+            self._shadow_store(0x00, regs)
         if my_debug:
-            print(TAG+f"returning result t3: {t3}")
-        return t3
+            print(TAG+f"registers 0x00-0x1F: {list(regs)}")
+
+        t = self._decode_time(regs, MCP7940.CONTROL_REGISTER, [0] * 7, True)
+        a1 = self._decode_time(regs, MCP7940.ALARM1_START, [0] * 6, False)
+        a2 = self._decode_time(regs, MCP7940.ALARM2_START, [0] * 6, False)
+        ctrl = regs[MCP7940.RTCC_CONTROL_REGISTER]
+        wk1 = regs[MCP7940.REGISTER_ALM1WKDAY]
+        wk2 = regs[MCP7940.REGISTER_ALM2WKDAY]
+        wkday = regs[MCP7940.RTCWKDAY]
+        return Snapshot(
+            tuple(t), tuple(a1), tuple(a2),
+            (ctrl >> MCP7940.ALARM0EN_BIT) & 1,
+            (ctrl >> MCP7940.ALARM1EN_BIT) & 1,
+            (wk1 >> MCP7940.ALMPOL_BIT) & 1, (wk1 >> MCP7940.ALMxIF_BIT) & 1, (wk1 & 0x70) >> 4,
+            (wk1 >> MCP7940.ALMPOL_BIT) & 1, (wk2 >> MCP7940.ALMxIF_BIT) & 1, (wk2 & 0x70) >> 4,  # one ALMPOL, in ALM0WKDAY
+            (ctrl >> MCP7940.SQWEN_BIT) & 1,
+            (regs[MCP7940.RTCSEC] >> MCP7940.ST) & 1,
+            (wkday >> MCP7940.OSCRUN_BIT) & 1,
+            (wkday >> MCP7940.PWRFAIL_BIT) & 1,
+            (wkday >> MCP7940.VBATEN) & 1,
+            self._decode_pwr_stamp(regs, MCP7940.PWRDN_ADDRESS),
+            self._decode_pwr_stamp(regs, MCP7940.PWRUP_ADDRESS),
+            bytes(regs))
     
+    # Read the current time, PWRFAIL and both power-fail time-stamps (0x00-0x1F) in one burst
+    # and return them as PowerEvents (see top of this file): epochs of the power-down and power-up,
+    # with the year inferred (power-up not after the current time, power-down not after power-up).
+    # clear: also clear PWRFAIL if it was set (one write). This clears the stamps in the MCP7940.
+    # Returns None on an I2C error
+    def power_events(self, clear=False):
+        TAG = MCP7940.CLS_NAME+".power_events(): "
+        regs = bytearray(MCP7940.SHADOW_SIZE)
+        reg_buf = bytearray(1)  # start at register 0x00
+        self._lock()
+        try:
+            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, regs)
+        except OSError as e:
+            print(TAG+f"Error: {e}")
+            return None
+        finally:
+            self._unlock()
+        if self.use_shadow:
+            self._shadow_store(0x00, regs)
+        wkday = regs[MCP7940.RTCWKDAY]
+        pwrfail = (wkday >> MCP7940.PWRFAIL_BIT) & 1
+        if not pwrfail:
+            return PowerEvents(0, None, None)
+        t = self._decode_time(regs, MCP7940.RTCSEC, [0] * 7, True)
+        t[3] = self._hours24(regs[MCP7940.RTCHOUR])
+        up = self._pwr_stamp_epoch(regs, MCP7940.PWRUP_ADDRESS, to_epoch(t))
+        down = None if up is None else self._pwr_stamp_epoch(regs, MCP7940.PWRDN_ADDRESS, up)
+        if my_debug:
+            print(TAG+f"power down: {down}, power up: {up}")
+        if clear:
+            # Written back as read; OSCRUN is read-only
+            if self._write_buf(bytearray((MCP7940.RTCWKDAY, wkday & ~(1 << MCP7940.PWRFAIL_BIT)))) == -1:
+                print(TAG+"failed to clear the PWRFAIL bit")
+        return PowerEvents(1, down, up)
+
     # Read the datetime stamps of the pwr down / pwr up events
+    # Returns (month, date, hours, minutes, weekday), with "AM" or "PM" added in 12 hour format
+    # To read both stamps, and the year, in one I2C transaction use power_events()
     def pwr_updn_dt(self, pwr_updn=True): # power up is default
         TAG="get_pwr_up_dt():         "
         reg_buf = bytearray()
@@ -1040,9 +1565,8 @@ class MCP7940:
         num_registers = 4
         time_reg = bytearray(num_registers)
         
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
             
             self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, time_reg)
             if my_debug:
@@ -1053,43 +1577,16 @@ class MCP7940:
             print(TAG+f"Error: {e}")
             return 0
         finally:
-            self._i2c.unlock()
+            self._unlock()
             #pass
-        #             min   hr    date  wd/month
-        reg_filter = (0x7F, 0x3F, 0x3F, 0xFF)[:num_registers]
         if my_debug:
             print(TAG+f"time_reg: {time_reg}")
-            print(TAG+f"reg_filter: {reg_filter}")
-        t = [self.bcd_to_int(reg & filt) for reg, filt in zip(time_reg, reg_filter)]
-
-        # extract 12/24  flag (True = 12, False = 24)
-        _12hr = t[MCP7940.PWRMIN] & 0x40 # (0x40 = 0100 0000)
-        _12hr = _12hr >> 6 # move b01000000 to b00000001
-        # print(TAG+"{:s} hour format".format("12" if _12hr else "24")))
-        # AM/PM flag (True = PM, False = AM)
-        _AMPM = t[MCP7940.PWRMIN] & 0x20 # (0x20 = 0010 0000)
-        _AMPM = _AMPM >> 5 # move b00100000 to b00000001
-        #if _12hr:
-        #    print("time: {:s}".format("PM" if _AMPM else "AM"))
-        
-        # extract weekday:
-        wd  = t[MCP7940.PWRMTH] & 0xE0  # (0xE0 = b1110 0000)
-        wd = wd >> 5  # move b11100000 to b00000111
-        # extract month
-        mth = t[MCP7940.PWRMTH] & 0x1F  # (0x1F = b0001 1111)
-        if my_debug:
-            print(TAG+f"t: {t}")
-        # Reorder
-        t2 = (mth, t[MCP7940.PWRDATE], t[MCP7940.PWRHOUR], t[MCP7940.PWRMIN], wd)
-       
-        if _12hr:
-            t3 = "PM" if _AMPM else "AM"
-            t2 += (t3,) 
-        else:
-            t3 = ""
-            
+        t2 = self._decode_pwr_stamp(time_reg, 0)
+        hh = time_reg[MCP7940.PWRHOUR]
+        if hh & 0x40:  # 12 hour format: bit 5 is AM/PM
+            t2 += ("PM" if hh & 0x20 else "AM",)
         if my_debug:
-            print(TAG+f"result: {t2} {t3}")
+            print(TAG+f"result: {t2}")
 
         return t2
         
@@ -1102,31 +1599,33 @@ class MCP7940:
             out_buf.append(0x0)
         if my_debug:
             print(TAG+f"length data to write to clear SRAM data: {hex(len(out_buf)-1)}")
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
         
             self._i2c.writeto(MCP7940.ADDRESS, out_buf) 
         except OSError as e:
             print(TAG+f"Error: {e}")
         finally:
-            self._i2c.unlock()
+            self._unlock()
             
+    # Read len(buf) bytes of SRAM, from offset (0-63), into buf in one burst
+    # buf: any writable buffer, e.g. a bytearray or a memoryview slice of one
+    # Allocates nothing. Returns the number of bytes read or -1
+    def sram_readinto(self, buf, offset=0):
+        return self.sram.readinto(buf, offset)
+
+    # Write the bytes of buf to SRAM, from offset (0-63), in one burst
+    # buf: any buffer, e.g. bytes, a bytearray or a memoryview slice of one
+    # Allocates nothing. Returns the number of bytes written or -1
+    def sram_write(self, buf, offset=0):
+        return self.sram.write(buf, offset)
+
     # Print contents of the 64 bytes of SRAM space
     def show_SRAM(self):
         TAG = "show_SRAM(): "
-        reg_buf = bytearray()
-        reg_buf.append(MCP7940.SRAM_START_ADDRESS)
         in_buf = bytearray(0x40) # 0x5F-0x20+1)
-        try:
-            while not self._i2c.try_lock():
-                pass      
-            self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, in_buf)
-        except OSError as e:
-            print(TAG+f"Error: {e}")
-        finally:
-            self._i2c.unlock()
-        
+        self.sram_readinto(in_buf)
+
         print(TAG+"Contents of SRAM:")
         le = len(in_buf)
         for _ in range(le):
@@ -1201,16 +1700,14 @@ class MCP7940:
         if my_debug:
             print(TAG+f"out_buf: {out_buf}, type: {type(out_buf)}, number of bytes to be written: {nr_bytes}")
             print(TAG+f"writing to SRAM: list(out_buf): {list(out_buf)}")
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
             self._i2c.writeto(MCP7940.ADDRESS, out_buf)   # Write the data to SRAM
         except OSError as e:
             print(TAG+f"Error: {e}")
-            self._i2c.unlock()
             return -1
         finally:
-            self._i2c.unlock()
+            self._unlock()
             #pass
         return nr_bytes  # return nr_bytes to show command was successful
     
@@ -1222,15 +1719,14 @@ class MCP7940:
         reg_buf.append(MCP7940.SRAM_START_ADDRESS)
         if my_debug:
             print(TAG+f"\nbefore reading from SRAM, dt: {dt} = list(dt): {list(dt)}")
+        self._lock()
         try:
-            while not self._i2c.try_lock():
-                pass
             self._i2c.writeto_then_readfrom(MCP7940.ADDRESS, reg_buf, dt) 
         except OSError as e:
             print(TAG+f"Error: {e}")
             return dt
         finally:
-            self._i2c.unlock()
+            self._unlock()
             #pass
     
         if not dt:
@@ -1259,54 +1755,211 @@ class MCP7940:
             print()
         return dt2
     
+    # Write a datetime stamp to SRAM as 32-bit epoch seconds (since 1970), little-endian,
+    # optionally followed by a flags byte (STAMP_12HR, STAMP_PM): 4 or 5 bytes instead of the 8 or 10 of write_to_SRAM()
+    # dt: epoch seconds, a time.struct_time or a tuple (year, month, date, hours, minutes, seconds, ...)
+    # offset: first SRAM byte (0-63) of the stamp
+    # Returns the number of bytes written or -1
+    def write_epoch_to_SRAM(self, dt, offset=0, flags=None):
+        TAG = MCP7940.CLS_NAME+".write_epoch_to_SRAM(): "
+        n = 4 if flags is None else 5
+        if offset < 0 or offset + n > MCP7940.SRAM_END - MCP7940.SRAM_START + 1:
+            print(TAG+f"stamp of {n} bytes does not fit at SRAM offset {offset}")
+            return -1
+        secs = dt if isinstance(dt, int) else to_epoch(dt)
+        out_buf = bytearray(n+1)
+        out_buf[0] = MCP7940.SRAM_START + offset
+        for _ in range(4):
+            out_buf[1+_] = (secs >> (8 * _)) & 0xFF
+        if flags is not None:
+            out_buf[5] = flags
+        if my_debug:
+            print(TAG+f"writing epoch {secs}, flags: {flags} to SRAM offset {offset}")
+        if self._write_buf(out_buf) == -1:
+            return -1
+        return n
+
+    # Read a stamp written by write_epoch_to_SRAM()
+    # Returns the epoch seconds, or (epoch seconds, flags) if with_flags is True, or -1 on an I2C error
+    # Use datemath.from_epoch() or MCP7940.stamp_to_struct_time() to get a time.struct_time
+    def read_epoch_fm_SRAM(self, offset=0, with_flags=False):
+        TAG = MCP7940.CLS_NAME+".read_epoch_fm_SRAM(): "
+        n = 5 if with_flags else 4
+        if offset < 0 or offset + n > MCP7940.SRAM_END - MCP7940.SRAM_START + 1:
+            print(TAG+f"stamp of {n} bytes does not fit at SRAM offset {offset}")
+            return -1
+        in_buf = bytearray(n)
+        if self._read_regs(MCP7940.SRAM_START + offset, in_buf) == -1:
+            return -1
+        secs = in_buf[0] | (in_buf[1] << 8) | (in_buf[2] << 16) | (in_buf[3] << 24)
+        if with_flags:
+            return secs, in_buf[4]
+        return secs
+
+    # Convert epoch seconds (and the flags byte) of a stamp to a time.struct_time
+    # With STAMP_12HR in flags the hours are returned in 12 hour format (1-12)
+    @staticmethod
+    def stamp_to_struct_time(secs, flags=0):
+        t = from_epoch(secs)
+        if flags & MCP7940.STAMP_12HR:
+            hours = t[3] % 12
+            t = time.struct_time((t[0], t[1], t[2], 12 if hours == 0 else hours) + tuple(t[4:9]))
+        return t
+
+    # Flags byte of a stamp, from the hours (0-23) of the time stamped
+    def stamp_flags(self, hours):
+        flags = MCP7940.STAMP_12HR if self._is_12hr == 1 else 0  # -1: format not set yet
+        if hours >= 12:
+            flags |= MCP7940.STAMP_PM
+        return flags
+
     def pr_regs(self):
         # display the device values for the bits
-        print(f"pr_regs(): {list(self.dt_sram)}")
+        print(f"pr_regs(): {list(self.sram[:])}")
+
+
+    # Context manager returned by MCP7940.transaction()
+    class Transaction:
+        def __init__(self, mcp, verify=True):
+            self._mcp = mcp
+            self._verify = verify
+            self.result = 0
 
+        def __enter__(self):
+            self._mcp._txn_depth += 1
+            return self
 
+        def __exit__(self, exc_type, exc_value, traceback):
+            mcp = self._mcp
+            mcp._txn_depth -= 1
+            if mcp._txn_depth == 0:
+                if exc_type is None:
+                    self.result = mcp._txn_commit(self._verify)
+                else:
+                    mcp._txn_discard()
+            return False
+
+    # Sequence view of the 64 bytes of SRAM (registers 0x20-0x5F), also available as mcp.sram:
+    #   mcp.sram[0]                      one byte
+    #   mcp.sram[0:10]                   bytearray, one burst read
+    #   mcp.sram[0:10:2]                 bytearray, one burst read of the bytes 0-8
+    #   mcp.sram[5] = 0x7F               one write
+    #   mcp.sram[0:4] = b"\x01\x02\x03\x04" one burst write
+    #   mcp.sram[0:10:3] = b"abcd"       one burst read and one burst write of the bytes 0-9
+    #   mcp.sram.readinto(memoryview(buf)[2:10], 0)  reads into the caller's buffer, no allocation
+    #   mcp.sram.write(memoryview(buf)[2:10], 0)     writes from the caller's buffer, no allocation
+    # Indexes are SRAM offsets 0-63; negative indexes count from the end.
+    # Item access raises IndexError/ValueError on bad arguments and OSError on an I2C error;
+    # readinto() and write() print the error and return -1, as the other methods of the driver.
     class Data:
-        def __init__(self, i2c, address):
-            self._i2c = i2c
-            self._address = address
-            self._memory_start = MCP7940.SRAM_START_ADDRESS
+        SIZE = 0x40
 
-        def __getitem__(self, key):
-            
-            reg_buf = bytearray()
-            reg_buf.append(self._memory_start)
-            
-            get_byte = bytearray(1)
-            
+        def __init__(self, mcp):
+            self._mcp = mcp
+            self._reg_buf = bytearray(1)
+            self._out_buf = bytearray(MCP7940.Data.SIZE + 1)  # register address + data, reused by every write
+
+        def __len__(self):
+            return MCP7940.Data.SIZE
+
+        # Read len(buf) bytes from SRAM offset into buf (bytearray or memoryview) in one burst
+        def _read(self, offset, buf):
+            self._reg_buf[0] = MCP7940.SRAM_START + offset
+            mcp = self._mcp
+            mcp._lock()
             try:
-            
-                while not self._i2c.try_lock():
-                    pass
-            
-                get_byte = lambda x: (self._i2c.writeto_then_readfrom(self.memory_start + x, get_byte), get_byte)(x)
-                print(f"Data._getitem_(): get_byte: {get_byte}")
-            except OSError as e:
-                print(f"Data.__getitem__(): Error {e}")
+                mcp._i2c.writeto_then_readfrom(MCP7940.ADDRESS, self._reg_buf, buf)
             finally:
-                self._i2c.unlock()
-                #pass
-            
-            if type(key) is int:
-                if my_debug:
-                    print('key: {}'.format(key))
-                return get_byte(key)
-            elif type(key) is slice:
-                if my_debug:
-                    print('start: {} stop: {} step: {}'.format(key.start, key.stop, key.step))
-                # fixme: Could be more efficient if we check for a contiguous block
-                # Loop over range(64)[slice]
-                return [get_byte(i) for i in range(64)[key]]
+                mcp._unlock()
 
-        def __setitem__(self, key, value):
-            if type(key) is int:
-                if my_debug:
-                    print('key: {}'.format(key))
-            elif type(key) is slice:
-                if my_debug:
-                    print('start: {} stop: {} step: {}'.format(key.start, key.stop, key.step))
+        # Write the bytes of data to SRAM offset in one burst
+        def _write(self, offset, data):
+            n = len(data)
+            out_buf = self._out_buf
+            out_buf[0] = MCP7940.SRAM_START + offset
+            for _ in range(n):
+                out_buf[1+_] = data[_]
+            mcp = self._mcp
+            mcp._lock()
+            try:
+                mcp._i2c.writeto(MCP7940.ADDRESS, out_buf, end=n+1)
+            finally:
+                mcp._unlock()
+
+        def _index(self, key):
+            if key < 0:
+                key += MCP7940.Data.SIZE
+            if not 0 <= key < MCP7940.Data.SIZE:
+                raise IndexError("SRAM index out of range")
+            return key
+
+        def __getitem__(self, key):
+            if isinstance(key, int):
+                buf = bytearray(1)
+                self._read(self._index(key), buf)
+                return buf[0]
+            r = range(MCP7940.Data.SIZE)[key]
+            if not len(r):
+                return bytearray()
+            lo = min(r[0], r[-1])
+            buf = bytearray(max(r[0], r[-1]) - lo + 1)
+            self._read(lo, buf)  # one burst from the lowest to the highest index
+            if r.step == 1:
+                return buf
             if my_debug:
-                print(value)
+                print(f"Data.__getitem__(): {len(r)} bytes of a burst of {len(buf)} bytes")
+            return bytearray(buf[i - lo] for i in r)
+
+        def __setitem__(self, key, value):
+            if isinstance(key, int):
+                self._write(self._index(key), (value,))
+                return
+            r = range(MCP7940.Data.SIZE)[key]
+            if len(value) != len(r):
+                raise ValueError("SRAM slice assignment: {} bytes for {} indexes".format(len(value), len(r)))
+            if not len(r):
+                return
+            if r.step == 1:
+                self._write(r[0], value)
+                return
+            lo = min(r[0], r[-1])
+            hi = max(r[0], r[-1])
+            if len(r) <= 2:  # cheaper than a read and a write of the bytes in between
+                for i in range(len(r)):
+                    self._write(r[i], (value[i],))
+                return
+            buf = bytearray(hi - lo + 1)
+            self._read(lo, buf)
+            for i in range(len(r)):
+                buf[r[i] - lo] = value[i]
+            self._write(lo, buf)
+
+        # Read len(buf) SRAM bytes, from offset, into buf (a bytearray or memoryview) in one burst
+        # Returns the number of bytes read or -1
+        def readinto(self, buf, offset=0):
+            TAG = "Data.readinto(): "
+            n = len(buf)
+            if offset < 0 or offset + n > MCP7940.Data.SIZE:
+                print(TAG+f"{n} bytes from offset {offset} exceed the SRAM")
+                return -1
+            try:
+                self._read(offset, buf)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                return -1
+            return n
+
+        # Write the bytes of buf (a bytes, bytearray or memoryview) to SRAM, from offset, in one burst
+        # Returns the number of bytes written or -1
+        def write(self, buf, offset=0):
+            TAG = "Data.write(): "
+            n = len(buf)
+            if offset < 0 or offset + n > MCP7940.Data.SIZE:
+                print(TAG+f"{n} bytes from offset {offset} exceed the SRAM")
+                return -1
+            try:
+                self._write(offset, buf)
+            except OSError as e:
+                print(TAG+f"Error: {e}")
+                return -1
+            return n
@@ -0,0 +1,201 @@
+#
+# asyncio variant of the MCP7940 driver (lib/mcp7940.py)
+# For firmware that runs sensors, WiFi and the display as asyncio tasks.
+#
+# Every bus access is an awaitable that:
+# - waits for the I2C bus with "await asyncio.sleep(0)" instead of blocking
+#   when another task or driver holds it;
+# - yields to the event loop after each I2C transaction;
+# - waits for the oscillator (OSCRUN) with "await asyncio.sleep()" in start()/stop().
+#
+# Usage:
+#   import asyncio, board
+#   from mcp7940_async import AsyncMCP7940
+#
+#   amcp = AsyncMCP7940(board.STEMMA_I2C())
+#
+#   async def clock():
+#       while True:
+#           print(await amcp.get_time())
+#           await asyncio.sleep(1)
+#
+#   async def alarms():
+#       async for alarm_nr in amcp.alarm_events():
+#           print(f"alarm{alarm_nr} fired")
+#
+# The synchronous driver remains available as amcp.mcp for everything else,
+# e.g.: await amcp.run(amcp.mcp.alarm_enable, 1, True)
+#
+# Added by @PaulskPt
+#
+import asyncio
+from mcp7940 import MCP7940, I2CLockTimeout, _ticks_ns
+from mcp7940_events import fired_alarms
+
+my_debug = False
+
+
+class AsyncMCP7940:
+    CLS_NAME = "AsyncMCP7940"
+
+    def __init__(self, i2c, status=True, battery_enabled=True, use_shadow=False, lock_timeout=1.0):
+        self.mcp = MCP7940(i2c, status, battery_enabled, use_shadow, lock_timeout)
+
+    # Wait for the I2C bus without blocking the event loop
+    async def _acquire(self):
+        mcp = self.mcp
+        if not mcp._i2c.try_lock():
+            mcp.lock_contention += 1
+            t0 = _ticks_ns()
+            while not mcp._i2c.try_lock():
+                waited = _ticks_ns() - t0
+                if mcp.lock_timeout is not None and waited > mcp.lock_timeout * 1_000_000_000:
+                    mcp.lock_wait_ns += waited
+                    raise I2CLockTimeout(AsyncMCP7940.CLS_NAME+": I2C bus still locked after {} s".format(mcp.lock_timeout))
+                await asyncio.sleep(0)
+            waited = _ticks_ns() - t0
+            mcp.lock_wait_ns += waited
+            if waited > mcp.lock_wait_max_ns:
+                mcp.lock_wait_max_ns = waited
+        mcp._held = True
+
+    def _release(self):
+        mcp = self.mcp
+        mcp._held = False
+        mcp._i2c.unlock()
+
+    # Run a method of the synchronous driver while holding the bus, then yield to the event loop
+    # Use it for single-transaction calls; e.g. await amcp.run(amcp.mcp.alarm_enable, 1, True)
+    async def run(self, fn, *args):
+        await self._acquire()
+        try:
+            ret = fn(*args)
+        finally:
+            self._release()
+        await asyncio.sleep(0)
+        return ret
+
+    # ---- time -------------------------------------------------------------
+
+    # Awaitable equivalent of: mcp.mcptime
+    async def get_time(self):
+        return await self.run(self.mcp._mcpget_time)
+
+    # Awaitable equivalent of: mcp.mcptime = t_in
+    async def set_time(self, t_in):
+        mcp = self.mcp
+        out_buf = mcp._time_out_buf(t_in)
+        await self.stop()  # See:  MCP7940 DATASHEET: DS20005010H-page 15
+        ret = await self.run(mcp._write_buf, out_buf)
+        await self.start()
+        # correct the fact that setting a new time clears the 12/24hr bit
+        if mcp._is_12hr:
+            mcp.set_12hr(mcp._is_12hr)
+        return ret
+
+    # Awaitable equivalent of: mcp.alarm1 / mcp.alarm2
+    async def get_alarm(self, alarm_nr):
+        start_reg = MCP7940.ALARM1_START if alarm_nr == 1 else MCP7940.ALARM2_START
+        return await self.run(self.mcp._mcpget_time, start_reg)
+
+    # Awaitable equivalent of: mcp.alarm1 = t / mcp.alarm2 = t
+    async def set_alarm(self, alarm_nr, t):
+        mcp = self.mcp
+        if alarm_nr == 1:
+            await self.run(setattr, mcp, "alarm1", t)
+        elif alarm_nr == 2:
+            await self.run(setattr, mcp, "alarm2", t)
+
+    # ---- oscillator -------------------------------------------------------
+
+    # Set the ST bit and wait, without blocking the event loop, for OSCRUN to be set
+    # Returns the time waited for the oscillator in ms, or -1 on an I2C error or after timeout seconds
+    async def start(self, timeout=1.0, poll_interval=0.001):
+        if await self.run(self.mcp._set_bit, MCP7940.RTCSEC, MCP7940.ST, 1) == -1:
+            print(AsyncMCP7940.CLS_NAME+".start(): "+self.mcp.sbf)
+            return -1
+        return await self._wait_oscrun(1, timeout, poll_interval)
+
+    # Clear the ST bit and wait, without blocking the event loop, for OSCRUN to be cleared
+    # Returns the time waited for the oscillator in ms, or -1 on an I2C error or after timeout seconds
+    async def stop(self, timeout=1.0, poll_interval=0.001):
+        if await self.run(self.mcp._set_bit, MCP7940.RTCSEC, MCP7940.ST, 0) == -1:
+            print(AsyncMCP7940.CLS_NAME+".stop(): "+self.mcp.sbf)
+            return -1
+        return await self._wait_oscrun(0, timeout, poll_interval)
+
+    async def _wait_oscrun(self, state, timeout, poll_interval):
+        TAG = AsyncMCP7940.CLS_NAME+"._wait_oscrun(): "
+        t0 = _ticks_ns()
+        while True:
+            osc_run_bit = await self.run(self.mcp._read_bit, MCP7940.RTCWKDAY, MCP7940.OSCRUN_BIT)
+            elapsed = (_ticks_ns() - t0) / 1_000_000
+            if osc_run_bit == state:
+                return elapsed
+            if osc_run_bit == -1:
+                print(TAG+self.mcp.rbf)
+                return -1
+            if elapsed > timeout * 1000:
+                print(TAG+f"timeout: OSCRUN not {state} after {timeout} s")
+                return -1
+            await asyncio.sleep(poll_interval)
+
+    # ---- SRAM -------------------------------------------------------------
+
+    # Awaitable equivalent of: mcp.clr_SRAM()
+    async def clr_SRAM(self):
+        return await self.run(self.mcp.clr_SRAM)
+
+    # Awaitable equivalent of: mcp.write_to_SRAM(dt)
+    async def write_to_SRAM(self, dt):
+        return await self.run(self.mcp.write_to_SRAM, dt)
+
+    # Awaitable equivalent of: mcp.read_fm_SRAM()
+    async def read_fm_SRAM(self):
+        return await self.run(self.mcp.read_fm_SRAM)
+
+    # ---- alarms -----------------------------------------------------------
+
+    # Asynchronous stream of alarm events:
+    #   async for alarm_nr in amcp.alarm_events():
+    # Yields 1 or 2 each time an enabled alarm fired; its ALMxIF bit is cleared before it is yielded.
+    # Every interval seconds CONTROL..ALM2WKDAY (0x07-0x14) are read in one burst.
+    # With an edge source of the MFP line (see lib/mcp7940_events.py) the registers are only read
+    # after an edge; then interval is how often the edge source is checked:
+    #   async for alarm_nr in amcp.alarm_events(0.05, CountioEdges(board.IO15)):
+    def alarm_events(self, interval=1.0, source=None):
+        return AlarmEvents(self, interval, source)
+
+
+# Asynchronous iterator returned by AsyncMCP7940.alarm_events()
+class AlarmEvents:
+    def __init__(self, amcp, interval=1.0, source=None):
+        self._amcp = amcp
+        self._interval = interval
+        self._edges = None if source is None else source.edges if hasattr(source, "edges") else source
+        self._primed = False  # the first check does not wait for an edge
+        self._buf = bytearray(MCP7940.REGISTER_ALM2WKDAY - MCP7940.RTCC_CONTROL_REGISTER + 1)
+        self._pending = 0  # alarm nrs found but not yet yielded, as bits
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        amcp = self._amcp
+        mcp = amcp.mcp
+        while not self._pending:
+            if self._edges is None or not self._primed or self._edges():
+                # After a failed read check again without waiting for an edge: the edge is used up
+                # and MFP stays asserted until ALMxIF is cleared, so no new edge would come
+                ok = await amcp.run(mcp._read_regs, MCP7940.RTCC_CONTROL_REGISTER, self._buf) == 0
+                self._primed = ok
+                if ok:
+                    self._pending = fired_alarms(self._buf)
+            if not self._pending:
+                await asyncio.sleep(self._interval)
+        alarm_nr = 1 if self._pending & 1 else 2
+        self._pending &= ~alarm_nr
+        await amcp.run(mcp._clr_ALMxIF_bit, alarm_nr)
+        if my_debug:
+            print(AsyncMCP7940.CLS_NAME+f".alarm_events(): alarm{alarm_nr} fired")
+        return alarm_nr
@@ -0,0 +1,203 @@
+#
+# Cached clock for the MCP7940 driver (lib/mcp7940.py)
+# Reading mcp.mcptime costs an I2C transaction on every call. CachedClock reads the MCP7940 once,
+# at the moment its seconds register rolls over, and from then on serves the time from
+# time.monotonic_ns() plus an offset: a query costs no I2C traffic.
+#
+# Anchoring (sync()) finds the seconds rollover:
+# - by polling: the seconds register (1 byte) is read every poll_interval seconds until it changes.
+#   This takes up to one second and about 1/poll_interval short I2C reads;
+# - or with an edge source (see lib/mcp7940_events.py) on the 1 Hz square wave output of the MFP pin
+#   (SQWEN set, SQWFS = 1 Hz). The edges are counted without I2C traffic.
+# The uncertainty of the anchor is kept in anchor_error_ns.
+#
+# The clock re-anchors itself every resync seconds. With check_interval set, now() also compares
+# the cached time with one read of the MCP7940 every check_interval seconds, and re-anchors
+# when they differ by more than the error bound (drift detected).
+# After a failed sync() now() does not try again for retry_interval seconds: it keeps serving the
+# time from the last anchor (or returns -1 if there is none) instead of blocking for timeout.
+# The waits of sync() go through the sleep hook of the driver (mcp7940._sleep).
+#
+# Error bound of now_ns(): error_bound_ns() = anchor_error_ns + elapsed time since the anchor * max_drift_ppm / 1e6
+# (max_drift_ppm: the combined tolerance of the MCU clock and the 32.768 kHz crystal of the MCP7940)
+#
+# Usage:
+#   from mcp7940_clock import CachedClock
+#
+#   clock = CachedClock(mcp, resync=3600)
+#   clock.sync()
+#   while True:
+#       print(clock.now())          # epoch seconds, as mcp.epoch
+#       print(clock.struct_time())  # time.struct_time
+#
+# Added by @PaulskPt
+#
+import mcp7940
+from mcp7940 import MCP7940, _ticks_ns
+from datemath import from_epoch
+
+my_debug = False
+
+
+class CachedClock:
+    CLS_NAME = "CachedClock"
+
+    def __init__(self, mcp, resync=3600, check_interval=None, poll_interval=0.002,
+                 edge_source=None, max_drift_ppm=100, timeout=1.5, retry_interval=60):
+        self._mcp = mcp
+        self.resync = resync
+        self.check_interval = check_interval
+        self.poll_interval = poll_interval
+        self._edges = None if edge_source is None else edge_source.edges if hasattr(edge_source, "edges") else edge_source
+        self.max_drift_ppm = max_drift_ppm
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._sec_buf = bytearray(1)
+        self._anchor_ticks = None  # _ticks_ns() at the seconds rollover
+        self._anchor_ns = 0        # epoch in ns at the seconds rollover
+        self._last_check = 0
+        self._failed_ticks = None  # _ticks_ns() of the last failed sync()
+        self.anchor_error_ns = 0
+        self.drift_ppm = None      # measured at the last re-anchor: + means the MCP7940 runs faster than the MCU clock
+        self.syncs = 0
+        self.drift_resyncs = 0
+
+    # Anchor the clock at a rollover of the seconds register of the MCP7940
+    # Returns 0, or -1 on an I2C error or when no rollover was seen within timeout seconds
+    def sync(self):
+        TAG = CachedClock.CLS_NAME+".sync(): "
+        if self._edges is not None:
+            ret = self._sync_edge()
+        else:
+            ret = self._sync_poll()
+        if ret == -1:
+            print(TAG+"failed to find a seconds rollover")
+            self._failed_ticks = _ticks_ns()
+            return -1
+        self._failed_ticks = None
+        ticks, err, secs = ret
+        new_ns = secs * 1_000_000_000
+        if self._anchor_ticks is not None:
+            elapsed = ticks - self._anchor_ticks
+            if elapsed > 0:
+                predicted = self._anchor_ns + elapsed
+                self.drift_ppm = (new_ns - predicted) * 1_000_000 / elapsed
+        self._anchor_ticks = ticks
+        self._anchor_ns = new_ns
+        self.anchor_error_ns = err
+        self._last_check = ticks
+        self.syncs += 1
+        if my_debug:
+            print(TAG+f"anchored at epoch {secs}, error: {err} ns, drift: {self.drift_ppm} ppm")
+        return 0
+
+    # Read the seconds register until it changes, for at most timeout seconds (measured, or slept)
+    # Returns (ticks of the rollover, uncertainty in ns, epoch seconds at the rollover) or -1
+    def _sync_poll(self):
+        mcp = self._mcp
+        buf = self._sec_buf
+        t_end = _ticks_ns() + int(self.timeout * 1_000_000_000)
+        slept = 0
+        s_prev = _ticks_ns()
+        if mcp._read_regs(MCP7940.RTCSEC, buf) == -1:
+            return -1
+        sec0 = buf[0] & 0x7F
+        while True:
+            mcp7940._sleep(self.poll_interval)
+            slept += self.poll_interval
+            s = _ticks_ns()
+            if mcp._read_regs(MCP7940.RTCSEC, buf) == -1:
+                return -1
+            f = _ticks_ns()
+            if buf[0] & 0x7F != sec0:
+                # The register was sampled during each read: the rollover lies between the start of
+                # the previous read and the end of this one
+                return self._anchor_epoch((s_prev + f) // 2, (f - s_prev) // 2, buf[0] & 0x7F)
+            if f > t_end or slept >= self.timeout:
+                return -1
+            s_prev = s
+
+    # Wait for an edge of the 1 Hz square wave, then read the time once
+    def _sync_edge(self):
+        t_end = _ticks_ns() + int(self.timeout * 1_000_000_000)
+        slept = 0
+        self._edges()  # discard edges counted before
+        s_prev = _ticks_ns()
+        while True:
+            mcp7940._sleep(self.poll_interval)
+            slept += self.poll_interval
+            f = _ticks_ns()
+            if self._edges():
+                return self._anchor_epoch((s_prev + f) // 2, (f - s_prev) // 2, None)
+            if f > t_end or slept >= self.timeout:
+                return -1
+            s_prev = f
+
+    # Read the full time right after the rollover; sec: the BCD seconds seen at the rollover, or None
+    def _anchor_epoch(self, ticks, err, sec):
+        secs = self._mcp.epoch
+        if secs == -1:
+            return -1
+        if sec is not None:
+            # If the seconds rolled over again since (a slow bus), step back to the rollover that was seen
+            now_sec = self._mcp._time_buf[MCP7940.RTCSEC] & 0x7F
+            if now_sec != sec:
+                secs -= (MCP7940.bcd_to_int(now_sec) - MCP7940.bcd_to_int(sec)) % 60
+        return ticks, err, secs
+
+    # Current time as epoch nanoseconds, from the monotonic clock
+    # Re-anchors (I2C traffic) when resync seconds passed or when a drift check fails, but not within
+    # retry_interval seconds of a failed sync()
+    # Returns -1 if the clock was never anchored and sync() fails
+    def now_ns(self):
+        t = _ticks_ns()
+        if self._anchor_ticks is None or t - self._anchor_ticks > self.resync * 1_000_000_000:
+            if self._failed_ticks is None or t - self._failed_ticks > self.retry_interval * 1_000_000_000:
+                self.sync()
+                t = _ticks_ns()
+            if self._anchor_ticks is None:
+                return -1
+        elif self.check_interval is not None and t - self._last_check > self.check_interval * 1_000_000_000:
+            self.check()
+            t = _ticks_ns()
+        return self._anchor_ns + (t - self._anchor_ticks)
+
+    # Current time as epoch seconds, as mcp.epoch
+    def now(self):
+        ns = self.now_ns()
+        return -1 if ns == -1 else ns // 1_000_000_000
+
+    # Current time as a time.struct_time, as mcp.struct_time
+    def struct_time(self):
+        secs = self.now()
+        return None if secs == -1 else from_epoch(secs)
+
+    # Maximum error of now_ns() in ns at this moment
+    def error_bound_ns(self):
+        if self._anchor_ticks is None:
+            return None
+        return self.anchor_error_ns + (_ticks_ns() - self._anchor_ticks) * self.max_drift_ppm // 1_000_000
+
+    # Compare the cached time with one read of the MCP7940 and re-anchor if they disagree
+    # Returns True if drift was detected, False if not, or -1 on an I2C error
+    def check(self):
+        TAG = CachedClock.CLS_NAME+".check(): "
+        if self._anchor_ticks is None:
+            return self.sync()
+        s = _ticks_ns()
+        secs = self._mcp.epoch
+        f = _ticks_ns()
+        self._last_check = f
+        if secs == -1:
+            return -1
+        # The MCP7940 showed secs at some moment between s and f
+        bound = self.error_bound_ns()
+        lo = self._anchor_ns + (s - self._anchor_ticks) - bound
+        hi = self._anchor_ns + (f - self._anchor_ticks) + bound
+        if hi < secs * 1_000_000_000 or lo >= (secs + 1) * 1_000_000_000:
+            if my_debug:
+                print(TAG+f"drift detected: MCP7940 epoch {secs}, cached {lo // 1_000_000_000}..{hi // 1_000_000_000}")
+            self.drift_resyncs += 1
+            self.sync()
+            return True
+        return False
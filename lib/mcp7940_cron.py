@@ -0,0 +1,246 @@
+#
+# Cron-style schedules for the alarms of the MCP7940 driver (lib/mcp7940.py)
+#
+# Cron(expr) compiles a cron expression with five fields: minute hour day-of-month month day-of-week
+#   *  a,b  a-b  */n  a-b/n  a/n (a up to the last value, step n)
+#   months JAN..DEC, weekdays SUN..SAT (0 or 7 = Sunday, 1 = Monday, as cron)
+#   When both day-of-month and day-of-week are restricted, a day matching either one fires (as cron);
+#   when either field starts with * (e.g. "*/2"), a day must match both.
+# The jobs fire at second 0.
+#
+# Hardware: the alarm mask (ALMxMSK) of the MCP7940 repeats an alarm by itself; once programmed,
+# such an alarm fires again and again without the MCU re-arming it. Cron.hardware_match() tells
+# whether an expression is one of these:
+#   "* * * * *"   every minute           seconds match, second 0
+#   "m * * * *"   every hour at minute m  minutes match
+#   "0 h * * *"   every day at h:00       hours match
+#   "0 0 d * *"   every month on day d    date match, at midnight
+#   "0 0 * * w"   every week on weekday w weekday match, at midnight
+# arm_hardware(mcp, cron) programs such an expression into a hardware alarm; after that only the
+# ALMxIF bit needs clearing (AlarmWatcher in lib/mcp7940_events.py does that).
+# An alarm fires as soon as its masked field matches: armed at 15:06, "0 15 * * *" would fire at
+# 15:07:00 instead of tomorrow at 15:00. While the field matches, arm_hardware() returns ARM_LATER
+# without programming the alarm; arm it again at arm_after(cron, now), when that period is over.
+# Other expressions ("*/15 * * * *", "0 7 * * MON") need the next fire time computed after
+# each firing: Cron.next_fire(epoch), with integer date math (lib/datemath.py).
+# AlarmScheduler.cron() (lib/mcp7940_sched.py) does that for any number of cron jobs.
+#
+# Usage:
+#   from mcp7940_cron import ARM_LATER, Cron, arm_after, arm_hardware
+#
+#   c = Cron("*/15 * * * *")
+#   c.next_fire(mcp.epoch)            # epoch of the next quarter hour
+#   arm_hardware(mcp, Cron("30 * * * *"), alarm_nr=2)  # each hour at :30, no re-arming needed
+#   c = Cron("0 7 * * *")
+#   if arm_hardware(mcp, c) == ARM_LATER:    # it is 7:xx now
+#       sched.at(arm_after(c, mcp.epoch), lambda job: arm_hardware(mcp, c))
+#
+# Added by @PaulskPt
+#
+from datemath import SECS_PER_DAY, civil_from_days, days_in_month, from_epoch, weekday
+from mcp7940_sched import MATCH_SEC, MATCH_MIN, MATCH_HOUR, MATCH_DATE, program_alarm
+
+my_debug = False
+
+MATCH_DOW = 3  # ALMxMSK weekday match, see MCP7940._match_lst
+
+ARM_LATER = -2  # arm_hardware(): the masked field matches now, see arm_after()
+
+_MONTHS = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+_DAYS = ("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT")
+
+# (lowest, highest value, names) of the five fields
+_FIELDS = ((0, 59, None), (0, 23, None), (1, 31, None), (1, 12, _MONTHS), (0, 7, _DAYS))
+
+_MAX_DAYS = 5 * 366  # next_fire() gives up after this many days (e.g. "0 0 30 2 *" never fires)
+
+
+def _value(text, lo, names):
+    if names is not None:
+        u = text.upper()
+        if u in names:
+            return names.index(u) + lo
+    return int(text)
+
+
+# Bit mask of the values (bit n: value n) of one field
+def _parse_field(text, lo, hi, names):
+    mask = 0
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, s = part.split("/")
+            step = int(s)
+            if step < 1:
+                raise ValueError("cron: step must be at least 1: {!r}".format(text))
+        if part == "*":
+            a, b = lo, hi
+        elif "-" in part:
+            a, b = part.split("-")
+            a, b = _value(a, lo, names), _value(b, lo, names)
+        else:
+            a = _value(part, lo, names)
+            b = hi if step > 1 else a
+        if not lo <= a <= b <= hi:
+            raise ValueError("cron: {!r} out of range {}-{}".format(text, lo, hi))
+        for v in range(a, b + 1, step):
+            mask |= 1 << v
+    return mask
+
+
+# The value of a mask with exactly one bit set, else -1
+def _single(mask):
+    if mask and not mask & (mask - 1):
+        return mask.bit_length() - 1 if hasattr(mask, "bit_length") else len(bin(mask)) - 3
+    return -1
+
+
+class Cron:
+    CLS_NAME = "Cron"
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError("cron: 5 fields expected (minute hour day month weekday): {!r}".format(expr))
+        self.expr = expr
+        masks = [_parse_field(f, *_FIELDS[i]) for i, f in enumerate(fields)]
+        self.minutes, self.hours, self.days, self.months, dow = masks
+        if dow & 0x80:  # 7 = Sunday
+            dow = (dow | 1) & 0x7F
+        self.weekdays = dow
+        # As cron: a day field starting with * only selects AND instead of OR (see _day_ok());
+        # its mask still applies ("*/2" is every other day)
+        self._dom_star = fields[2][0] == "*"
+        self._dow_star = fields[4][0] == "*"
+        self._dom_any = self.days == (1 << 32) - 2     # 1-31
+        self._dow_any = self.weekdays == (1 << 7) - 1  # 0-6
+
+    def __repr__(self):
+        return "Cron({!r})".format(self.expr)
+
+    def _day_ok(self, year, month, date):
+        dom = self.days >> date & 1
+        dow = self.weekdays >> ((weekday(year, month, date) + 1) % 7) & 1  # datemath: 0 = Monday
+        if self._dom_star or self._dow_star:
+            return dom and dow
+        return dom or dow
+
+    # Epoch of the first fire time after the epoch after, or None if there is none within 5 years
+    def next_fire(self, after):
+        t = after - after % 60 + 60
+        days = t // SECS_PER_DAY
+        mod = (t % SECS_PER_DAY) // 60  # minute of the day to start from
+        end = days + _MAX_DAYS
+        while days < end:
+            year, month, date = civil_from_days(days)
+            if not self.months >> month & 1:
+                # Jump to the first day of the next month
+                days += days_in_month(year, month) - date + 1
+                mod = 0
+                continue
+            if self._day_ok(year, month, date):
+                for hh in range(mod // 60, 24):
+                    if self.hours >> hh & 1:
+                        for mm in range(mod % 60 if hh == mod // 60 else 0, 60):
+                            if self.minutes >> mm & 1:
+                                return days * SECS_PER_DAY + hh * 3600 + mm * 60
+            days += 1
+            mod = 0
+        return None
+
+    # (match_type, minutes, hours, date, weekday) when one alarm mask repeats this expression
+    # by itself (see the top of this file), else None. weekday: as cron, 0 = Sunday
+    def hardware_match(self):
+        all_min = (1 << 60) - 1
+        all_hr = (1 << 24) - 1
+        all_months = ((1 << 13) - 1) & ~1
+        if self.months != all_months:
+            return None
+        both = self._dom_star or self._dow_star  # a day must match both fields, see _day_ok()
+        if both:
+            day_any = self._dom_any and self._dow_any
+        else:
+            day_any = self._dom_any or self._dow_any
+        if day_any and self.hours == all_hr:
+            if self.minutes == all_min:
+                return (MATCH_SEC, 0, 0, 1, 0)
+            m = _single(self.minutes)
+            if m != -1:
+                return (MATCH_MIN, m, 0, 1, 0)
+            return None
+        if _single(self.minutes) != 0:
+            return None
+        h = _single(self.hours)
+        if day_any and h != -1:
+            return (MATCH_HOUR, 0, h, 1, 0)
+        if h != 0:
+            return None
+        if not both:
+            return None
+        if self._dow_any:
+            d = _single(self.days)
+            return None if d == -1 else (MATCH_DATE, 0, 0, d, 0)
+        if self._dom_any:
+            w = _single(self.weekdays)
+            return None if w == -1 else (MATCH_DOW, 0, 0, 1, w)
+        return None
+
+
+# Epoch from which cron can be armed in hardware: now, or the end of the minute, hour or day in
+# which the masked field of Cron.hardware_match() matches the time now (epoch), because the alarm
+# would fire at once. ("* * * * *" is never late: second 0 is a fire time itself.)
+# None if cron does not map onto one alarm mask
+def arm_after(cron, now):
+    hw = cron.hardware_match()
+    if hw is None:
+        return None
+    match_type, minutes, hours, date, wd = hw
+    if match_type == MATCH_SEC:
+        return now
+    t = from_epoch(now)
+    if match_type == MATCH_MIN:
+        return now - now % 60 + 60 if t[4] == minutes else now
+    if match_type == MATCH_HOUR:
+        return now - now % 3600 + 3600 if t[3] == hours else now
+    if match_type == MATCH_DATE:
+        busy = t[2] == date
+    else:
+        busy = (t[6] + 1) % 7 == wd  # datemath: 0 = Monday, cron: 0 = Sunday
+    return now - now % SECS_PER_DAY + SECS_PER_DAY if busy else now
+
+
+# Program cron into hardware alarm alarm_nr (1 or 2) when one alarm mask repeats it (see
+# Cron.hardware_match()): from then on it fires without the MCU re-arming it.
+# pol: the ALMPOL bit, shared by both alarms. Returns the match type, None if cron needs re-arming after each firing
+# (use AlarmScheduler.cron()), ARM_LATER if the masked field matches now (nothing is programmed;
+# call again at arm_after(cron, now)), or -1 on an I2C error
+def arm_hardware(mcp, cron, alarm_nr=1, pol=1):
+    TAG = "arm_hardware(): "
+    hw = cron.hardware_match()
+    if hw is None:
+        if my_debug:
+            print(TAG+f"{cron} does not map onto one alarm mask")
+        return None
+    match_type, minutes, hours, date, wd = hw
+    secs = mcp.epoch
+    if secs == -1:
+        print(TAG+"failed to read the time of the MCP7940")
+        return -1
+    if arm_after(cron, secs) != secs:
+        if my_debug:
+            print(TAG+f"{cron} matches now: arm it at {arm_after(cron, secs)}")
+        return ARM_LATER
+    wk_reg = 1
+    if match_type == MATCH_DOW:
+        # ALMxWKDAY is compared with the weekday counter in RTCWKDAY, which counts 1-7 from
+        # whatever value it was set to: take the target relative to today's counter value
+        cur = mcp._time_buf[mcp.RTCWKDAY] & 0x07 or 7  # 0 counts on to 1, as 7 does
+        y, m, d = civil_from_days(secs // SECS_PER_DAY)
+        today = (weekday(y, m, d) + 1) % 7  # cron numbering, 0 = Sunday
+        wk_reg = (cur - 1 + wd - today) % 7 + 1
+    if program_alarm(mcp, alarm_nr, (1, date, hours, minutes, 0, wk_reg), match_type, pol) == -1:
+        print(TAG+"failed to program alarm{}".format(alarm_nr))
+        return -1
+    if my_debug:
+        print(TAG+f"{cron}: alarm{alarm_nr}, match: {mcp._match_lst[match_type]}")
+    return match_type
@@ -0,0 +1,196 @@
+#
+# Edge-triggered alarm delivery for the MCP7940 driver (lib/mcp7940.py)
+#
+# Polling the ALMxIF bits costs I2C transactions in every loop, also when no alarm fired.
+# The MCP7940 already signals a fired alarm on its MFP pin, so watch that line instead:
+# the I2C bus is only used after an edge on the MFP line, to find out which alarm fired
+# and to clear its ALMxIF bit. While no alarm fires there is no I2C traffic at all.
+#
+# MFP level (see MCP7940 DATASHEET: DS20005010H, Table 5-10, alarm output truth table):
+# - one alarm enabled, ALMPOL = 1: MFP goes high when the alarm fires  -> rising edge
+# - one alarm enabled, ALMPOL = 0: MFP goes low when the alarm fires   -> falling edge
+# - both alarms enabled: use ALMPOL = 0; MFP goes low when either alarm fires.
+#   (with ALMPOL = 1 MFP only goes high when both ALMxIF bits are set)
+# The MFP level stays asserted until the ALMxIF bit is cleared.
+#
+# Edge sources. Any object with a method edges(), returning the number of edges since
+# the previous call without blocking, can be used; a plain function works too:
+#   CountioEdges(pin)    counts edges in hardware with countio.Counter
+#   KeypadEdges(pin)     uses the keypad module (debounced, event queue in the background)
+#   LevelEdges(dio)      samples an already configured digitalio.DigitalInOut
+#                        (no edge is lost because the MFP level stays asserted until cleared)
+#
+# Usage:
+#   import board, mcp7940
+#   from mcp7940_events import AlarmWatcher, CountioEdges
+#
+#   mcp = mcp7940.MCP7940(board.STEMMA_I2C())
+#   watcher = AlarmWatcher(mcp, CountioEdges(board.IO15))
+#   while True:
+#       fired = watcher.poll()  # bit 0: alarm1, bit 1: alarm2, -1 on an I2C error
+#       if fired > 0 and fired & 1:
+#           print("alarm1 fired")
+#       ...
+#
+# Added by @PaulskPt
+#
+from mcp7940 import MCP7940
+
+my_debug = False
+
+_ALM_FIRST = MCP7940.RTCC_CONTROL_REGISTER  # 0x07, CONTROL
+_ALM1WKDAY_OFS = MCP7940.REGISTER_ALM1WKDAY - _ALM_FIRST
+_ALM2WKDAY_OFS = MCP7940.REGISTER_ALM2WKDAY - _ALM_FIRST
+_ALMxIF = 0x08
+
+
+# Return the enabled alarms with their ALMxIF bit set: bit 0 alarm1, bit 1 alarm2
+# buf holds the registers CONTROL..ALM2WKDAY (0x07-0x14)
+def fired_alarms(buf):
+    ctrl = buf[0]
+    ret = 0
+    if ctrl & (1 << MCP7940.ALARM0EN_BIT) and buf[_ALM1WKDAY_OFS] & _ALMxIF:
+        ret |= 1
+    if ctrl & (1 << MCP7940.ALARM1EN_BIT) and buf[_ALM2WKDAY_OFS] & _ALMxIF:
+        ret |= 2
+    return ret
+
+
+# Edges counted by the countio module (hardware pulse counter)
+# edge: "rise", "fall" or "both"
+class CountioEdges:
+    def __init__(self, pin, edge="rise", pull=None):
+        import countio
+        edges = {"rise": countio.Edge.RISE,
+                 "fall": countio.Edge.FALL,
+                 "both": countio.Edge.RISE_AND_FALL}
+        self._counter = countio.Counter(pin, edge=edges[edge], pull=pull)
+        self._last = 0
+
+    def edges(self):
+        c = self._counter.count
+        n = c - self._last
+        self._last = c
+        return n
+
+    def deinit(self):
+        self._counter.deinit()
+
+
+# Edges reported by the keypad module; a "pressed" event is the line becoming active_level
+class KeypadEdges:
+    def __init__(self, pin, active_level=True, pull=False):
+        import keypad
+        self._keys = keypad.Keys((pin,), value_when_pressed=active_level, pull=pull)
+        self._event = keypad.Event()
+
+    def edges(self):
+        n = 0
+        while self._keys.events.get_into(self._event):
+            if self._event.pressed:
+                n += 1
+        return n
+
+    def deinit(self):
+        self._keys.deinit()
+
+
+# Edges found by sampling an input (e.g. a digitalio.DigitalInOut) on each call of edges()
+# Counts the transitions to active_level. Reading a GPIO does not use the I2C bus.
+class LevelEdges:
+    def __init__(self, dio, active_level=True):
+        self._dio = dio
+        self._active = bool(active_level)
+        self._prev = not self._active
+
+    def edges(self):
+        v = bool(self._dio.value)
+        n = 1 if v == self._active and self._prev != self._active else 0
+        self._prev = v
+        return n
+
+    def deinit(self):
+        pass
+
+
+# Deliver alarm events of an MCP7940 driven by the edges of its MFP line
+# source:   an edge source (see above) or a function returning the number of new edges
+# callback: optional function called with the alarm nr (1 or 2) of each fired alarm
+class AlarmWatcher:
+    CLS_NAME = "AlarmWatcher"
+
+    def __init__(self, mcp, source, callback=None):
+        self._mcp = mcp
+        self._source = source
+        self._edges = source.edges if hasattr(source, "edges") else source
+        self.callback = callback
+        self._buf = bytearray(MCP7940.REGISTER_ALM2WKDAY - _ALM_FIRST + 1)
+        self._out1 = bytearray(2)  # one ALMxWKDAY register
+        self._out2 = bytearray(MCP7940.REGISTER_ALM2WKDAY - MCP7940.REGISTER_ALM1WKDAY + 2)  # ALM1WKDAY..ALM2WKDAY
+        self._primed = False
+        self.edge_count = 0  # edges seen
+        self.bus_checks = 0  # I2C reads done by check()
+        self.spurious = 0    # edges after which no fired alarm was found
+
+    # Return the fired alarms (bit 0: alarm1, bit 1: alarm2) when the MFP line had an edge since
+    # the previous call, else 0 without any I2C traffic. Returns -1 on an I2C error: test
+    # fired > 0 before the bits (-1 & 1 is 1).
+    # The first call always checks the MCP7940: an alarm that fired before the watcher
+    # was created keeps MFP asserted and would not produce an edge. After an I2C error the
+    # next call checks again, so the edge that was consumed does not lose the alarm.
+    def poll(self):
+        n = self._edges()
+        if n:
+            self.edge_count += n
+        elif self._primed:
+            return 0
+        fired = self.check()
+        self._primed = fired != -1
+        if n and fired == 0:
+            self.spurious += 1
+        return fired
+
+    # Read CONTROL..ALM2WKDAY (0x07-0x14) in one burst, clear the ALMxIF bit of the
+    # enabled alarms that fired and call the callback for each of them
+    # Returns the fired alarms (bit 0: alarm1, bit 1: alarm2) or -1 on an I2C error
+    def check(self):
+        TAG = AlarmWatcher.CLS_NAME+".check(): "
+        mcp = self._mcp
+        buf = self._buf
+        self.bus_checks += 1
+        if mcp._read_regs(_ALM_FIRST, buf) == -1:
+            return -1
+        fired = fired_alarms(buf)
+        if fired and self._clear(fired) == -1:
+            print(TAG+"failed to clear the ALMxIF bit(s)")
+            return -1
+        if my_debug and fired:
+            print(TAG+f"fired: {fired:02b}")
+        if self.callback is not None:
+            if fired & 1:
+                self.callback(1)
+            if fired & 2:
+                self.callback(2)
+        return fired
+
+    # Clear the ALMxIF bit(s) of fired with one write, built from the registers just read
+    # Writing ALMxWKDAY clears its ALMxIF bit; the other bits are written back unchanged.
+    def _clear(self, fired):
+        buf = self._buf
+        if fired == 3:
+            out = self._out2
+            out[0] = MCP7940.REGISTER_ALM1WKDAY
+            for _ in range(len(out) - 1):
+                out[1+_] = buf[_ALM1WKDAY_OFS+_]
+            out[1] &= ~_ALMxIF
+            out[-1] &= ~_ALMxIF
+        else:
+            ofs = _ALM1WKDAY_OFS if fired == 1 else _ALM2WKDAY_OFS
+            out = self._out1
+            out[0] = _ALM_FIRST + ofs
+            out[1] = buf[ofs] & ~_ALMxIF
+        return self._mcp._write_buf(out)
+
+    def deinit(self):
+        if hasattr(self._source, "deinit"):
+            self._source.deinit()
@@ -0,0 +1,289 @@
+#
+# Recurring-alarm scheduler for the MCP7940 driver (lib/mcp7940.py)
+# The MCP7940 has two hardware alarms. AlarmScheduler keeps any number of software alarms
+# (jobs) in a heap ordered by their deadline and programs only the nearest deadline into
+# one hardware alarm. The MCU can sleep (or do other work without polling the I2C bus)
+# until the MFP pin signals the alarm; then the due jobs run and the next deadline is armed
+# with one batched write (MCP7940.transaction()).
+#
+# Match type: the alarm registers are compared with the time under a mask (ALMxMSK).
+# The coarsest mask that fires exactly at the deadline is used:
+#   seconds match  deadline less than a minute ahead
+#   minutes match  deadline at hh:mm:00, less than an hour ahead
+#   hours match    deadline at hh:00:00, less than a day ahead
+#   date match     deadline at 00:00:00, at most 28 days ahead
+# When no mask fires exactly at the deadline (e.g. 10:07:30, two hours ahead), an earlier
+# wake-up is armed with the coarsest mask (here: an hours match at 10:00:00) and the
+# deadline is re-armed from there with a finer mask. The weekday and the "all" match are
+# not used: they depend on the weekday numbering in RTCWKDAY.
+# The RTC must run in 24 hour format.
+#
+# Usage:
+#   import board, mcp7940
+#   from mcp7940_events import AlarmWatcher, CountioEdges
+#   from mcp7940_sched import AlarmScheduler
+#
+#   mcp = mcp7940.MCP7940(board.STEMMA_I2C())
+#   sched = AlarmScheduler(mcp, alarm_nr=1)
+#   sched.every(3600, ntp_sync)                  # hourly
+#   sched.every(86400, daily_report, start=...)  # daily, first run at the epoch start
+#   sched.every(60, sample)                      # each minute
+#   sched.arm()
+#   watcher = AlarmWatcher(mcp, CountioEdges(board.IO15), callback=sched.on_alarm)
+#   while True:
+#       watcher.poll()   # no I2C traffic until the MFP pin has an edge
+#       ...              # or sleep until the MFP pin changes (alarm.pin.PinAlarm)
+#
+# Callbacks are called with the job as argument (job.name, job.deadline, job.period, job.missed).
+#
+# Added by @PaulskPt
+#
+from datemath import SECS_PER_DAY, from_epoch
+
+try:
+    from heapq import heappush, heappop
+except ImportError:  # no heapq module in this build: keep the list sorted instead
+    def heappush(heap, item):
+        lo = 0
+        hi = len(heap)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if heap[mid] < item:
+                lo = mid + 1
+            else:
+                hi = mid
+        heap.insert(lo, item)
+
+    def heappop(heap):
+        return heap.pop(0)
+
+my_debug = False
+
+# Match types (ALMxMSK), see MCP7940._match_lst
+MATCH_SEC = 0
+MATCH_MIN = 1
+MATCH_HOUR = 2
+MATCH_DATE = 4
+
+_MAX_DATE_AHEAD = 28 * SECS_PER_DAY  # a date of the month does not recur within 28 days
+
+
+# Return (wake, match_type): the epoch at which to fire the hardware alarm and its match type
+# for the deadline (epoch) seen from now (epoch). wake == deadline when one mask fires exactly at
+# the deadline, else wake is an earlier wake-up, as late as possible
+def alarm_match(now, deadline):
+    if deadline - now < 60:
+        return max(deadline, now + 1), MATCH_SEC
+    d = deadline
+    n = from_epoch(now)
+    best = None
+    for match_type, w in ((MATCH_DATE, d - d % SECS_PER_DAY),
+                          (MATCH_HOUR, d - d % 3600),
+                          (MATCH_MIN, d - d % 60)):
+        if w <= now or (best is not None and w <= best[0]):
+            continue
+        t = from_epoch(w)
+        # The first moment after now at which the masked field matches must be w
+        if match_type == MATCH_MIN:
+            ok = w - now < 3600 and t[4] != n[4]
+        elif match_type == MATCH_HOUR:
+            ok = w - now < SECS_PER_DAY and t[3] != n[3]
+        else:
+            ok = w - now <= _MAX_DATE_AHEAD and t[2] != n[2]
+        if ok:
+            best = (w, match_type)
+    if best is None:  # more than 28 days ahead: wake up at midnight 27 days from now
+        w = now - now % SECS_PER_DAY + 27 * SECS_PER_DAY
+        best = (w, MATCH_DATE)
+    return best
+
+
+# Program hardware alarm alarm_nr (1 or 2) in one batched write (MCP7940.transaction()):
+# alm: (month, date, hours, minutes, seconds, weekday) as for mcp.alarm1, match_type: ALMxMSK,
+# pol: the ALMPOL bit; it is in ALM0WKDAY only and shared by both alarms.
+# Writing ALMxWKDAY also clears ALMxIF. Returns -1 on an I2C error
+def program_alarm(mcp, alarm_nr, alm, match_type, pol=1):
+    with mcp.transaction() as txn:
+        if alarm_nr == 1:
+            mcp.alarm1 = alm
+        else:
+            mcp.alarm2 = alm
+        mcp._set_ALMxMSK_bits(alarm_nr, match_type)
+        if pol:
+            mcp._set_ALMPOL_bit(alarm_nr)
+        else:
+            mcp._clr_ALMPOL_bit(alarm_nr)
+        mcp.alarm_enable(alarm_nr, True)
+    return txn.result
+
+
+# A software alarm: runs callback at deadline (epoch), then every period seconds (None: once)
+# period may also be a schedule with a method next_fire(epoch), e.g. a Cron (lib/mcp7940_cron.py)
+class Job:
+    def __init__(self, deadline, period, callback, name=None):
+        self.deadline = deadline
+        self.period = period
+        self.callback = callback
+        self.name = name
+        self.active = True
+        self.runs = 0
+        self.missed = 0  # periods skipped because the job ran late
+
+    def __repr__(self):
+        return "Job({}, deadline={}, period={})".format(self.name, self.deadline, self.period)
+
+
+# Multiplex any number of jobs onto hardware alarm alarm_nr (1 or 2) of the MCP7940
+# pol: the ALMPOL bit to program (1: MFP goes high when the alarm fires, see lib/mcp7940_events.py).
+# There is one ALMPOL bit for both alarms: a scheduler on alarm2 also sets the polarity of alarm1
+class AlarmScheduler:
+    CLS_NAME = "AlarmScheduler"
+
+    def __init__(self, mcp, alarm_nr=1, pol=1):
+        if alarm_nr not in (1, 2):
+            raise ValueError(AlarmScheduler.CLS_NAME+": alarm_nr must be 1 or 2")
+        self._mcp = mcp
+        self.alarm_nr = alarm_nr
+        self.pol = pol
+        self._heap = []   # (deadline, seq, job)
+        self._seq = 0     # tie-breaker: jobs with the same deadline run in the order they were added
+        self._armed = None  # (wake, match_type) programmed in the MCP7940
+        self.arms = 0       # batched writes done by arm()
+        self.wakeups = 0    # alarms handled by run_due()
+
+    # Add a recurring job: callback(job) every period seconds, the first time at start (epoch).
+    # Default start: the next multiple of period since 1970-01-01, so every(60, ...) runs at second 0
+    # and every(3600, ...) at minute 0: these deadlines need one wake-up each (see alarm_match()).
+    # Returns the Job. Call arm() (or run_due()) afterwards.
+    def every(self, period, callback, start=None, name=None):
+        if period < 1:
+            raise ValueError(AlarmScheduler.CLS_NAME+": period must be at least 1 second")
+        if start is None:
+            now = self._now()
+            start = now - now % period + period
+        return self._push(Job(start, period, callback, name))
+
+    # Add a one-shot job: callback(job) at epoch. Returns the Job
+    def at(self, epoch, callback, name=None):
+        return self._push(Job(epoch, None, callback, name))
+
+    # Add a job following a cron expression (see lib/mcp7940_cron.py), e.g. "*/15 * * * *"
+    # or "0 7 * * MON"; the fire times are computed with integer date math. Returns the Job
+    def cron(self, expr, callback, name=None):
+        from mcp7940_cron import Cron
+        c = Cron(expr)
+        deadline = c.next_fire(self._now())
+        if deadline is None:
+            raise ValueError(AlarmScheduler.CLS_NAME+": {!r} never fires".format(expr))
+        return self._push(Job(deadline, c, callback, name))
+
+    # Remove job; it is dropped from the heap when it reaches the top
+    def cancel(self, job):
+        job.active = False
+
+    def __len__(self):
+        n = 0
+        for entry in self._heap:
+            if entry[2].active:
+                n += 1
+        return n
+
+    # Deadline (epoch) of the next active job, or None
+    def next_deadline(self):
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    # Epoch at which the hardware alarm will fire, or None if it is not armed
+    def next_wake(self):
+        return None if self._armed is None else self._armed[0]
+
+    def _push(self, job):
+        self._seq += 1
+        heappush(self._heap, (job.deadline, self._seq, job))
+        return job
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        while heap and not heap[0][2].active:
+            heappop(heap)
+
+    def _now(self):
+        secs = self._mcp.epoch
+        if secs == -1:
+            raise OSError(AlarmScheduler.CLS_NAME+": failed to read the time of the MCP7940")
+        return secs
+
+    # Program the nearest deadline into the hardware alarm (one batched write),
+    # or disable the alarm when there are no jobs. now: the current epoch (default: read the MCP7940)
+    # Returns the wake-up epoch, None if no job is left, or -1 on an I2C error
+    def arm(self, now=None):
+        TAG = AlarmScheduler.CLS_NAME+".arm(): "
+        mcp = self._mcp
+        n = self.alarm_nr
+        self._drop_cancelled()
+        if not self._heap:
+            if self._armed is not None:
+                mcp.alarm_enable(n, False)
+                self._armed = None
+            return None
+        if now is None:
+            now = self._now()
+        wake, match_type = alarm_match(now, self._heap[0][0])
+        if self._armed == (wake, match_type):
+            return wake  # already programmed
+        t = from_epoch(wake)
+        if program_alarm(mcp, n, (t[1], t[2], t[3], t[4], t[5], t[6]), match_type, self.pol) == -1:
+            print(TAG+"failed to program alarm{}".format(n))
+            self._armed = None
+            return -1
+        self._armed = (wake, match_type)
+        self.arms += 1
+        if my_debug:
+            print(TAG+f"alarm{n} at {t[:6]}, match: {mcp._match_lst[match_type]}, deadline: {self._heap[0][0]}")
+        return wake
+
+    # Run the jobs that are due at now (default: read the MCP7940), reschedule the recurring
+    # ones and arm the next deadline. A recurring job that is more than one period late runs once;
+    # the skipped periods are counted in job.missed (not for cron jobs). Returns the number of jobs run
+    # The time is read again after each callback: jobs that fell due while callbacks ran run too,
+    # and the next deadlines and the alarm are computed from the time after the callbacks
+    def run_due(self, now=None):
+        if now is None:
+            now = self._now()
+        heap = self._heap
+        ran = 0
+        while heap and heap[0][0] <= now:
+            job = heappop(heap)[2]
+            if not job.active:
+                continue
+            job.runs += 1
+            ran += 1
+            job.callback(job)
+            secs = self._mcp.epoch
+            if secs != -1:  # on an I2C error keep the time from before the callback
+                now = secs
+            if job.period is not None and job.active and hasattr(job.period, "next_fire"):
+                job.deadline = job.period.next_fire(now)  # fire times missed while late are skipped
+                if job.deadline is None:
+                    job.active = False
+                else:
+                    self._push(job)
+            elif job.period is not None and job.active:
+                job.deadline += job.period
+                if job.deadline <= now:
+                    skipped = (now - job.deadline) // job.period + 1
+                    job.missed += skipped
+                    job.deadline += skipped * job.period
+                self._push(job)
+            else:
+                job.active = False
+        if self._armed is not None and self._armed[0] <= now:
+            self._armed = None  # fired: program again, also when the wake-up is the same
+        self.arm(now)
+        return ran
+
+    # Callback for AlarmWatcher (lib/mcp7940_events.py): AlarmWatcher(mcp, source, callback=sched.on_alarm)
+    def on_alarm(self, alarm_nr):
+        if alarm_nr == self.alarm_nr:
+            self.wakeups += 1
+            self.run_due()
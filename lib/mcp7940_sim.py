@@ -0,0 +1,438 @@
+#
+# Software model of the MCP7940 RTC and a stand-in for busio.I2C
+# For host-side (Linux) testing and benchmarking of lib/mcp7940.py
+# without a board on the desk.
+#
+# Usage:
+#   >>> from mcp7940_sim import SimI2C
+#   >>> import mcp7940
+#   >>> i2c = SimI2C()
+#   >>> i2c.rtc.set_datetime(2023, 11, 1, 15, 6, 0)
+#   >>> mcp = mcp7940.MCP7940(i2c)
+#   >>> mcp.mcptime
+#   (2023, 11, 1, 15, 6, 0, 2)
+#   >>> i2c.advance(61)  # let the virtual clock run for 61 seconds
+#
+# See MCP7940 Datasheet DS20005010H
+#
+import datetime
+
+ADDRESS = 0x6F
+
+# Register addresses (see DS20005010H-page 11, Table 5-1)
+RTCSEC = 0x00
+RTCMIN = 0x01
+RTCHOUR = 0x02
+RTCWKDAY = 0x03
+RTCDATE = 0x04
+RTCMTH = 0x05
+RTCYEAR = 0x06
+CONTROL = 0x07
+OSCTRIM = 0x08
+ALM0SEC = 0x0A
+ALM0WKDAY = 0x0D
+ALM1SEC = 0x11
+ALM1WKDAY = 0x14
+PWRDNMIN = 0x18
+PWRUPMIN = 0x1C
+SRAM_START = 0x20
+SRAM_END = 0x5F
+
+# Bits
+ST_BIT = 7        # RTCSEC
+OSCRUN_BIT = 5    # RTCWKDAY
+PWRFAIL_BIT = 4   # RTCWKDAY
+VBATEN_BIT = 3    # RTCWKDAY
+LPYR_BIT = 5      # RTCMTH
+OUT_BIT = 7       # CONTROL
+SQWEN_BIT = 6     # CONTROL
+ALM0EN_BIT = 4    # CONTROL
+ALM1EN_BIT = 5    # CONTROL
+ALMPOL_BIT = 7    # ALM0WKDAY only
+ALMxIF_BIT = 3    # ALMxWKDAY
+
+# Bits the hardware owns: writes to them are ignored
+_READ_ONLY = {RTCWKDAY: 1 << OSCRUN_BIT,
+              RTCMTH: 1 << LPYR_BIT,
+              ALM1WKDAY: 1 << ALMPOL_BIT}  # ALMPOL is unimplemented in ALM1WKDAY
+
+
+def _bcd(v):
+    return ((v // 10) << 4) | (v % 10)
+
+
+def _int(b):
+    return (b >> 4) * 10 + (b & 0x0F)
+
+
+class SimMCP7940:
+    """Register-level model of the MCP7940N.
+
+    The register file (0x00-0x1F) and the 64 bytes of SRAM (0x20-0x5F) are
+    kept in one bytearray. The clock only advances when :meth:`advance` is
+    called, either by the test itself or by :class:`SimI2C` charging the
+    duration of each bus transaction to the virtual clock.
+
+    :param float osc_start_delay: virtual seconds between setting ST and OSCRUN going high
+    :param float osc_stop_delay: virtual seconds between clearing ST and OSCRUN going low
+    """
+
+    def __init__(self, osc_start_delay=0.002, osc_stop_delay=0.001):
+        self.regs = bytearray(SRAM_END + 1)
+        self.osc_start_delay = osc_start_delay
+        self.osc_stop_delay = osc_stop_delay
+        self.now = 0.0           # virtual seconds since the model was created
+        self._frac = 0.0         # fraction of the current RTC second
+        self._osc_change_at = None
+        self._match = [False, False]
+        self._mfp = self.mfp
+        self.mfp_edges = 0       # rising + falling edges seen on MFP
+        self.mfp_rising = 0
+        self.edge_callbacks = []  # called with the new MFP level on every edge
+        self.ptr = 0             # internal address pointer
+
+    # ---- convenience setters / getters (no bus traffic) -------------------
+
+    def set_datetime(self, year, month, date, hours=0, minutes=0, seconds=0, weekday=None, start=True):
+        """Load the timekeeping registers directly, as if written by a previous session."""
+        if weekday is None:
+            weekday = datetime.date(year, month, date).weekday()  # 0 = Monday, as used by the driver
+        r = self.regs
+        r[RTCSEC] = _bcd(seconds) | (r[RTCSEC] & 0x80)
+        r[RTCMIN] = _bcd(minutes)
+        r[RTCHOUR] = _bcd(hours)
+        r[RTCWKDAY] = (r[RTCWKDAY] & 0xF8) | (weekday & 0x07)
+        r[RTCDATE] = _bcd(date)
+        r[RTCMTH] = _bcd(month) | (self._lpyr(year) << LPYR_BIT)
+        r[RTCYEAR] = _bcd(year % 100)
+        self._frac = 0.0
+        if start:
+            r[RTCSEC] |= 1 << ST_BIT
+            r[RTCWKDAY] |= 1 << OSCRUN_BIT
+            self._osc_change_at = None
+
+    def datetime(self):
+        """Return the current register time as a ``datetime.datetime``."""
+        r = self.regs
+        return datetime.datetime(2000 + _int(r[RTCYEAR]), _int(r[RTCMTH] & 0x1F), _int(r[RTCDATE] & 0x3F),
+                                 _int(r[RTCHOUR] & 0x3F), _int(r[RTCMIN] & 0x7F), _int(r[RTCSEC] & 0x7F))
+
+    @property
+    def oscrun(self):
+        return (self.regs[RTCWKDAY] >> OSCRUN_BIT) & 1
+
+    @property
+    def mfp(self):
+        """Logic level of the MFP pin (Table 5-10 of the datasheet)."""
+        r = self.regs
+        ctrl = r[CONTROL]
+        if ctrl & (1 << SQWEN_BIT):
+            return 1 if self._frac < 0.5 else 0  # 1 Hz square wave
+        en0 = ctrl & (1 << ALM0EN_BIT)
+        en1 = ctrl & (1 << ALM1EN_BIT)
+        pol = (r[ALM0WKDAY] >> ALMPOL_BIT) & 1
+        if0 = (r[ALM0WKDAY] >> ALMxIF_BIT) & 1
+        if1 = (r[ALM1WKDAY] >> ALMxIF_BIT) & 1
+        if not en0 and not en1:
+            return (ctrl >> OUT_BIT) & 1
+        if en0 and en1:
+            if pol:
+                return 1 if (if0 and if1) else 0
+            return 0 if (if0 or if1) else 1
+        flag = if0 if en0 else if1
+        return flag if pol else 1 - flag
+
+    def power_fail(self, seconds):
+        """Simulate a loss of Vcc lasting ``seconds`` virtual seconds."""
+        r = self.regs
+        if not r[RTCWKDAY] & (1 << VBATEN_BIT):
+            # No backup supply: everything is lost
+            for i in range(len(r)):
+                r[i] = 0
+            self._frac = 0.0
+            self.now += seconds
+            self._check_mfp()
+            return
+        self._stamp(PWRDNMIN)
+        self.advance(seconds)
+        self._stamp(PWRUPMIN)
+        r[RTCWKDAY] |= 1 << PWRFAIL_BIT
+
+    def _stamp(self, ads):
+        r = self.regs
+        r[ads] = r[RTCMIN]
+        r[ads + 1] = r[RTCHOUR]
+        r[ads + 2] = r[RTCDATE]
+        r[ads + 3] = ((r[RTCWKDAY] & 0x07) << 5) | (r[RTCMTH] & 0x1F)
+
+    # ---- virtual time ------------------------------------------------------
+
+    def advance(self, seconds):
+        """Let ``seconds`` of virtual time elapse."""
+        end = self.now + seconds
+        while True:
+            if self._osc_change_at is not None and self._osc_change_at <= end:
+                self._run(self._osc_change_at - self.now)
+                if self.regs[RTCSEC] & (1 << ST_BIT):
+                    self.regs[RTCWKDAY] |= 1 << OSCRUN_BIT
+                else:
+                    self.regs[RTCWKDAY] &= ~(1 << OSCRUN_BIT) & 0xFF
+                self._osc_change_at = None
+                continue
+            self._run(end - self.now)
+            break
+
+    def _run(self, dt):
+        self.now += dt
+        if not self.oscrun:
+            return
+        self._frac += dt
+        while self._frac >= 1.0:
+            self._frac -= 1.0
+            self._tick()
+        self._check_mfp()
+
+    def _tick(self):
+        r = self.regs
+        t = self.datetime() + datetime.timedelta(seconds=1)
+        r[RTCSEC] = (r[RTCSEC] & 0x80) | _bcd(t.second)
+        r[RTCMIN] = _bcd(t.minute)
+        r[RTCHOUR] = (r[RTCHOUR] & 0xC0) | _bcd(t.hour)
+        if t.day != _int(r[RTCDATE] & 0x3F):
+            wd = r[RTCWKDAY] & 0x07
+            wd = wd + 1 if wd < 7 else 1  # the weekday counter runs 1..7
+            r[RTCWKDAY] = (r[RTCWKDAY] & 0xF8) | wd
+        r[RTCDATE] = _bcd(t.day)
+        r[RTCMTH] = _bcd(t.month) | (self._lpyr(t.year) << LPYR_BIT)
+        r[RTCYEAR] = _bcd(t.year % 100)
+        self._check_alarms()
+
+    @staticmethod
+    def _lpyr(year):
+        return 1 if (year % 4 == 0 and year % 100 != 0) or year % 400 == 0 else 0
+
+    def _check_alarms(self):
+        r = self.regs
+        for n, (base, en_bit) in enumerate(((ALM0SEC, ALM0EN_BIT), (ALM1SEC, ALM1EN_BIT))):
+            if not r[CONTROL] & (1 << en_bit):
+                self._match[n] = False
+                continue
+            wk = r[base + 3]
+            msk = (wk >> 4) & 0x07
+            sec = (r[base] & 0x7F) == (r[RTCSEC] & 0x7F)
+            mnt = (r[base + 1] & 0x7F) == (r[RTCMIN] & 0x7F)
+            hr = (r[base + 2] & 0x3F) == (r[RTCHOUR] & 0x3F)
+            wkd = (wk & 0x07) == (r[RTCWKDAY] & 0x07)
+            dte = (r[base + 4] & 0x3F) == (r[RTCDATE] & 0x3F)
+            mth = (r[base + 5] & 0x1F) == (r[RTCMTH] & 0x1F)
+            if msk == 0:
+                m = sec
+            elif msk == 1:
+                m = mnt
+            elif msk == 2:
+                m = hr
+            elif msk == 3:
+                m = wkd
+            elif msk == 4:
+                m = dte
+            elif msk == 7:
+                m = sec and mnt and hr and wkd and dte and mth
+            else:
+                m = False  # reserved
+            if m and not self._match[n]:
+                r[base + 3] |= 1 << ALMxIF_BIT
+            self._match[n] = m
+
+    def _check_mfp(self):
+        level = self.mfp
+        if level != self._mfp:
+            self._mfp = level
+            self.mfp_edges += 1
+            if level:
+                self.mfp_rising += 1
+            for cb in self.edge_callbacks:
+                cb(level)
+
+    # ---- register access (address pointer auto-increments) -----------------
+
+    def _next(self, ads):
+        # The pointer wraps within the RTCC block and within the SRAM block
+        if ads == 0x1F:
+            return 0x00
+        if ads == SRAM_END:
+            return SRAM_START
+        return ads + 1
+
+    def write(self, data):
+        """Handle a write message: the first byte sets the address pointer."""
+        if not data:
+            return
+        self.ptr = data[0]
+        for b in data[1:]:
+            self._write_reg(self.ptr, b)
+            self.ptr = self._next(self.ptr)
+        self._check_mfp()
+
+    def read(self, n):
+        """Handle a read message of ``n`` bytes from the address pointer."""
+        out = bytearray(n)
+        for i in range(n):
+            out[i] = self.regs[self.ptr] if self.ptr <= SRAM_END else 0
+            self.ptr = self._next(self.ptr)
+        return out
+
+    def _write_reg(self, ads, value):
+        if ads > SRAM_END:
+            return
+        r = self.regs
+        if PWRDNMIN <= ads <= 0x1F:
+            return  # power-fail time-stamps are read-only
+        ro = _READ_ONLY.get(ads, 0)
+        if ads == RTCWKDAY:
+            # PWRFAIL can only be cleared; clearing it also clears the time-stamps
+            pf = 1 << PWRFAIL_BIT
+            ro |= pf
+            if r[ads] & pf and not value & pf:
+                r[ads] &= ~pf & 0xFF
+                for i in range(PWRDNMIN, 0x20):
+                    r[i] = 0
+        new = (r[ads] & ro) | (value & ~ro & 0xFF)
+        if ads in (ALM0WKDAY, ALM1WKDAY):
+            new &= ~(1 << ALMxIF_BIT) & 0xFF  # any write clears ALMxIF (DS20005010H-page 23)
+        if ads == RTCSEC:
+            was = r[ads] & (1 << ST_BIT)
+            now = new & (1 << ST_BIT)
+            if was != now:
+                self._osc_change_at = self.now + (self.osc_start_delay if now else self.osc_stop_delay)
+        r[ads] = new
+
+
+class SimI2C:
+    """Stand-in for ``busio.I2C`` with an MCP7940 model attached at 0x6F.
+
+    Implements the subset of the busio.I2C API used by the driver. Every
+    transaction is counted in :attr:`stats` and its duration on the wire
+    (9 bits per byte plus start/stop) at :attr:`frequency` is charged to the
+    virtual clock of the model.
+
+    :param SimMCP7940 rtc: the device model; a fresh one is created if None
+    :param int frequency: simulated SCL frequency in Hz
+    :param bool advance_clock: charge bus time to the virtual clock
+    """
+
+    def __init__(self, rtc=None, frequency=100_000, advance_clock=True):
+        self.rtc = rtc if rtc is not None else SimMCP7940()
+        self.frequency = frequency
+        self.advance_clock = advance_clock
+        self._locked = False
+        self.stats = {}
+        self.log = None  # set to a list to record (op, address, bytes) per transaction
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"transactions": 0, "bytes_written": 0, "bytes_read": 0, "bus_time_us": 0.0,
+                      "lock_failures": 0}
+
+    def advance(self, seconds):
+        self.rtc.advance(seconds)
+
+    def sleep(self, seconds):
+        """Stand-in for ``time.sleep()``: let ``seconds`` of virtual time elapse.
+
+        Install it with ``mcp7940._sleep = i2c.sleep`` so that waits of the driver
+        (oscillator start/stop, I2C lock back-off) cost no real time."""
+        self.rtc.advance(seconds)
+
+    # ---- busio.I2C surface -------------------------------------------------
+
+    def try_lock(self):
+        if self._locked:
+            self.stats["lock_failures"] += 1
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def deinit(self):
+        self._locked = False
+
+    def scan(self):
+        self._check_lock()
+        return [ADDRESS]
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self._check(address)
+        data = bytes(buffer[start:end])
+        self.rtc.write(data)
+        self._account("w", address, data, len(data), 0, 1)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        self._check(address)
+        end = len(buffer) if end is None else end
+        data = self.rtc.read(end - start)
+        buffer[start:end] = data
+        self._account("r", address, data, 0, len(data), 1)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None):
+        self._check(address)
+        out = bytes(buffer_out[out_start:out_end])
+        in_end = len(buffer_in) if in_end is None else in_end
+        self.rtc.write(out)
+        data = self.rtc.read(in_end - in_start)
+        buffer_in[in_start:in_end] = data
+        self._account("wr", address, out + bytes(data), len(out), len(data), 2)
+
+    # ---- helpers -----------------------------------------------------------
+
+    def _check_lock(self):
+        if not self._locked:
+            raise RuntimeError("Function requires lock")
+
+    def _check(self, address):
+        self._check_lock()
+        if address != ADDRESS:
+            raise OSError(19, "No such device")  # what busio raises on a NACK
+
+    def _account(self, op, address, data, n_out, n_in, n_addr):
+        s = self.stats
+        s["transactions"] += 1
+        s["bytes_written"] += n_out
+        s["bytes_read"] += n_in
+        # 9 clocks per byte (8 data + ACK), one address byte per (repeated) start, ~2 clocks start/stop
+        bits = 9 * (n_out + n_in + n_addr) + 2 * n_addr
+        us = bits * 1_000_000 / self.frequency
+        s["bus_time_us"] += us
+        if self.log is not None:
+            self.log.append((op, address, data))
+        if self.advance_clock:
+            self.rtc.advance(us / 1_000_000)
+
+
+class SimMFPEdges:
+    """Edge source of the simulated MFP pin, for ``AlarmWatcher`` (lib/mcp7940_events.py).
+
+    :param SimMCP7940 rtc: the device model
+    :param str edge: "rise", "fall" or "both"
+    """
+
+    def __init__(self, rtc, edge="rise"):
+        self.rtc = rtc
+        self.edge = edge
+        self._last = self._count()
+
+    def _count(self):
+        rtc = self.rtc
+        if self.edge == "rise":
+            return rtc.mfp_rising
+        if self.edge == "fall":
+            return rtc.mfp_edges - rtc.mfp_rising
+        return rtc.mfp_edges
+
+    def edges(self):
+        c = self._count()
+        n = c - self._last
+        self._last = c
+        return n
@@ -0,0 +1,364 @@
+#
+# Key-value store in the 64 bytes of battery-backed SRAM of the MCP7940 (0x20-0x5F)
+# For small values that must survive a reset or a power cycle, e.g. a boot counter,
+# the epoch of the last NTP sync, a drift estimate and configuration flags.
+#
+# The keys and their types are fixed by a schema. The values are packed one after the other,
+# behind a 3-byte header (magic byte, schema id, payload length):
+#   "u8", "i8", "u16", "i16", "u32", "i32"  fixed size, little-endian
+#   "var"   unsigned varint (LEB128): 1 byte up to 127, 2 bytes up to 16383, ... max 5 bytes
+#   "svar"  signed varint (zigzag): 1 byte for -64..63
+#
+# Updating a value writes only the bytes that changed, in one I2C transaction.
+# The store keeps a copy of its bytes in RAM, so reading a value does not use the I2C bus
+# (after the first access, which reads the store in one burst).
+#
+# Usage:
+#   from mcp7940_sram import SRAMStore
+#
+#   SCHEMA = (("boots", "var"), ("last_sync", "u32"), ("drift_ppm", "svar"), ("flags", "u8", 0x01))
+#   store = SRAMStore(mcp, SCHEMA, offset=0x10)  # SRAM bytes 0x10.. (register 0x30..)
+#   store["boots"] += 1                          # one write of the changed byte(s)
+#   store.update(last_sync=1700000000, drift_ppm=-3)  # several keys, one write
+#
+# When the header does not match the schema (new SRAM, other schema) all keys have their default
+# value (third item of the schema entry, else 0) and store.valid is False until the first write.
+#
+# Added by @PaulskPt
+#
+import struct
+from mcp7940 import MCP7940
+
+my_debug = False
+
+MAGIC = 0xA7
+HEADER_SIZE = 3
+SRAM_SIZE = MCP7940.SRAM_END - MCP7940.SRAM_START + 1  # 64
+
+_FMT = {"u8": "<B", "i8": "<b", "u16": "<H", "i16": "<h", "u32": "<I", "i32": "<i"}
+_VAR_MAX = 5  # bytes of a 32-bit varint
+
+
+# One byte identifying the schema: keys, types and their order
+def schema_id(schema):
+    h = len(schema)
+    for entry in schema:
+        for c in entry[0] + ":" + entry[1]:
+            h = (h * 31 + ord(c)) & 0xFF
+    return h
+
+
+# Write value as an unsigned varint into buf at pos; return the position behind it
+def _put_var(buf, pos, value):
+    if value < 0:
+        raise ValueError("varint: value must be >= 0")
+    while value > 0x7F:
+        buf[pos] = (value & 0x7F) | 0x80
+        value >>= 7
+        pos += 1
+    buf[pos] = value
+    return pos + 1
+
+
+# Read an unsigned varint from buf at pos; return (value, position behind it)
+def _get_var(buf, pos, end):
+    value = 0
+    shift = 0
+    while pos < end:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+    raise ValueError("varint: truncated")
+
+
+class SRAMStore:
+    CLS_NAME = "SRAMStore"
+
+    # schema: sequence of (key, type) or (key, type, default)
+    # offset: first SRAM byte used (0-63); size: SRAM bytes reserved, default the largest encoded size
+    def __init__(self, mcp, schema, offset=0, size=None):
+        self._mcp = mcp
+        self._schema = tuple(schema)
+        self._index = {}
+        max_size = HEADER_SIZE
+        for i, entry in enumerate(self._schema):
+            typ = entry[1]
+            if typ in _FMT:
+                max_size += struct.calcsize(_FMT[typ])
+            elif typ in ("var", "svar"):
+                max_size += _VAR_MAX
+            else:
+                raise ValueError(SRAMStore.CLS_NAME+f": unknown type {typ!r} of key {entry[0]!r}")
+            self._index[entry[0]] = i
+        if size is None:
+            size = max_size
+        if size < max_size or offset < 0 or offset + size > SRAM_SIZE:
+            raise ValueError(SRAMStore.CLS_NAME+f": needs {max_size} bytes, has SRAM bytes {offset}..{offset+size-1}")
+        self.offset = offset
+        self.size = size
+        self._id = schema_id(self._schema)
+        self._values = [entry[2] if len(entry) > 2 else 0 for entry in self._schema]
+        self._image = bytearray(size)  # the bytes in SRAM, as last read or written
+        self._new = bytearray(size)
+        self._loaded = False
+        self.valid = False
+
+    # Read the store from SRAM in one burst. Returns 0 or -1 on an I2C error
+    def load(self):
+        TAG = SRAMStore.CLS_NAME+".load(): "
+        if self._mcp._read_regs(MCP7940.SRAM_START + self.offset, self._image) == -1:
+            return -1
+        self._loaded = True
+        img = self._image
+        self.valid = False
+        if img[0] == MAGIC and img[1] == self._id and img[2] <= self.size - HEADER_SIZE:
+            try:
+                self._decode(img, HEADER_SIZE + img[2])
+                self.valid = True
+            except ValueError as e:
+                print(TAG+f"Error: {e}")
+        if my_debug:
+            print(TAG+f"valid: {self.valid}, values: {self._values}")
+        return 0
+
+    def _decode(self, img, end):
+        pos = HEADER_SIZE
+        values = []
+        for entry in self._schema:
+            typ = entry[1]
+            if typ in _FMT:
+                fmt = _FMT[typ]
+                if pos + struct.calcsize(fmt) > end:
+                    raise ValueError("payload truncated")
+                values.append(struct.unpack_from(fmt, img, pos)[0])
+                pos += struct.calcsize(fmt)
+            else:
+                v, pos = _get_var(img, pos, end)
+                if typ == "svar":
+                    v = (v >> 1) ^ -(v & 1)
+                values.append(v)
+        self._values = values
+
+    # Encode the header and all values into self._new; return the encoded length
+    def _encode(self):
+        buf = self._new
+        buf[0] = MAGIC
+        buf[1] = self._id
+        pos = HEADER_SIZE
+        for i, entry in enumerate(self._schema):
+            typ = entry[1]
+            v = self._values[i]
+            if typ in _FMT:
+                struct.pack_into(_FMT[typ], buf, pos, v)
+                pos += struct.calcsize(_FMT[typ])
+            else:
+                if typ == "svar":
+                    v = (v << 1) if v >= 0 else ((-v) << 1) - 1
+                pos = _put_var(buf, pos, v)
+        buf[2] = pos - HEADER_SIZE
+        return pos
+
+    # Write the bytes that differ from the SRAM contents, first to last changed byte, in one transaction
+    # Returns the number of bytes written (0 when nothing changed) or -1 on an I2C error
+    def flush(self):
+        TAG = SRAMStore.CLS_NAME+".flush(): "
+        if not self._loaded and self.load() == -1:
+            return -1
+        n = self._encode()
+        first = -1
+        for _ in range(n):
+            if self._new[_] != self._image[_]:
+                if first == -1:
+                    first = _
+                last = _
+        if first == -1:
+            self.valid = True
+            return 0
+        out_buf = bytearray(last - first + 2)
+        out_buf[0] = MCP7940.SRAM_START + self.offset + first
+        out_buf[1:] = self._new[first:last+1]
+        if my_debug:
+            print(TAG+f"writing SRAM bytes {self.offset+first}..{self.offset+last}: {list(out_buf[1:])}")
+        if self._mcp._write_buf(out_buf) == -1:
+            return -1
+        self._image[first:last+1] = self._new[first:last+1]
+        self.valid = True
+        return last - first + 1
+
+    def __getitem__(self, key):
+        if not self._loaded:
+            self.load()
+        return self._values[self._index[key]]
+
+    # Set one value and write it to SRAM
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        return self[key] if key in self._index else default
+
+    def keys(self):
+        return [entry[0] for entry in self._schema]
+
+    # Set several values and write them to SRAM with one transaction
+    # Returns the number of bytes written or -1 on an I2C error
+    def update(self, values=None, **kwargs):
+        if not self._loaded:
+            self.load()
+        if values is not None:
+            for key in values:
+                self._values[self._index[key]] = values[key]
+        for key in kwargs:
+            self._values[self._index[key]] = kwargs[key]
+        return self.flush()
+
+    # Set all keys to their default value and write them
+    def reset(self):
+        self._values = [entry[2] if len(entry) > 2 else 0 for entry in self._schema]
+        return self.flush()
+
+
+# Event codes for SRAMJournal (0-255, free to extend)
+EV_BOOT = 1
+EV_ALARM1 = 2
+EV_ALARM2 = 3
+EV_PWRFAIL = 4
+EV_NTP_OK = 5
+EV_NTP_FAIL = 6
+
+
+# Ring buffer of events in SRAM, kept across resets without flash wear
+# Each record is 6 bytes: epoch seconds (4 bytes, little-endian), event code (1 byte) and a
+# sequence number (1-255, 0 = empty slot). An append is one 6-byte write and the sequence
+# number is its last byte: a record only becomes the newest one when it is completely written.
+# The newest record is found from the sequence numbers, so there is no head pointer to update.
+# A write interrupted by a power failure can only damage the oldest record.
+#
+# Usage:
+#   from mcp7940_sram import SRAMJournal, EV_ALARM1
+#
+#   journal = SRAMJournal(mcp, offset=0x1C)  # SRAM bytes 0x1C-0x3F: 6 records
+#   journal.append(EV_ALARM1)               # epoch: mcp.epoch
+#   for epoch, code in journal:              # oldest first, one burst read
+#       print(epoch, code)
+#
+# Call journal.clear() once when the journal is placed in a new part of the SRAM (its power-on content is undefined).
+class SRAMJournal:
+    CLS_NAME = "SRAMJournal"
+    RECORD_SIZE = 6
+
+    def __init__(self, mcp, offset=0, slots=None):
+        self._mcp = mcp
+        if slots is None:
+            slots = (SRAM_SIZE - offset) // SRAMJournal.RECORD_SIZE
+        if slots < 1 or offset < 0 or offset + slots * SRAMJournal.RECORD_SIZE > SRAM_SIZE:
+            raise ValueError(SRAMJournal.CLS_NAME+f": {slots} records do not fit at SRAM byte {offset}")
+        self.offset = offset
+        self.slots = slots
+        self._buf = bytearray(slots * SRAMJournal.RECORD_SIZE)
+        self._out = bytearray(SRAMJournal.RECORD_SIZE + 1)
+        self._newest = -1  # slot of the newest record, -1: empty
+        self._count = 0
+        self._loaded = False
+
+    # Read the ring in one burst and find the newest record. Returns 0 or -1 on an I2C error
+    def load(self):
+        if self._mcp._read_regs(MCP7940.SRAM_START + self.offset, self._buf) == -1:
+            return -1
+        self._loaded = True
+        n = self.slots
+        self._newest = -1
+        for i in range(n):
+            seq = self._seq(i)
+            if seq and self._seq((i + 1) % n) != self._next_seq(seq):
+                self._newest = i
+                break
+        # Count the records, going back from the newest one
+        self._count = 0
+        if self._newest != -1:
+            self._count = 1
+            seq = self._seq(self._newest)
+            while self._count < n:
+                prev = self._seq((self._newest - self._count) % n)
+                if not prev or self._next_seq(prev) != seq:
+                    break
+                seq = prev
+                self._count += 1
+        if my_debug:
+            print(SRAMJournal.CLS_NAME+f".load(): newest slot: {self._newest}, records: {self._count}")
+        return 0
+
+    def _seq(self, slot):
+        return self._buf[slot * SRAMJournal.RECORD_SIZE + 5]
+
+    @staticmethod
+    def _next_seq(seq):
+        return 1 if seq >= 255 else seq + 1
+
+    # Add a record. epoch: seconds, default the MCP7940 time (mcp.epoch, battery-backed:
+    # valid at boot, before the MCU clock is set); code: 0-255
+    # Returns 0 or -1 on an I2C error
+    def append(self, code, epoch=None):
+        if not self._loaded and self.load() == -1:
+            return -1
+        if epoch is None:
+            epoch = self._mcp.epoch
+            if epoch == -1:
+                return -1
+        epoch = int(epoch)
+        slot = (self._newest + 1) % self.slots
+        seq = 1 if self._newest == -1 else self._next_seq(self._seq(self._newest))
+        out = self._out
+        out[0] = MCP7940.SRAM_START + self.offset + slot * SRAMJournal.RECORD_SIZE
+        struct.pack_into("<IBB", out, 1, epoch & 0xFFFFFFFF, code, seq)
+        if self._mcp._write_buf(out) == -1:
+            self._loaded = False  # the slot may be partly written
+            return -1
+        ofs = slot * SRAMJournal.RECORD_SIZE
+        for _ in range(SRAMJournal.RECORD_SIZE):
+            self._buf[ofs + _] = out[1 + _]
+        self._newest = slot
+        if self._count < self.slots:
+            self._count += 1
+        return 0
+
+    # Iterate over the records, oldest first, as (epoch, code). Reads the ring in one burst
+    def __iter__(self):
+        if self.load() == -1:
+            return
+        n = self.slots
+        first = (self._newest - self._count + 1) % n
+        for i in range(self._count):
+            yield struct.unpack_from("<IB", self._buf, ((first + i) % n) * SRAMJournal.RECORD_SIZE)
+
+    def __len__(self):
+        if not self._loaded:
+            self.load()
+        return self._count
+
+    # Return the newest record as (epoch, code), or None when the journal is empty
+    def last(self):
+        if not self._loaded:
+            self.load()
+        if self._newest == -1:
+            return None
+        return struct.unpack_from("<IB", self._buf, self._newest * SRAMJournal.RECORD_SIZE)
+
+    # Empty the journal: one write of zeros over all records. Returns 0 or -1 on an I2C error
+    def clear(self):
+        out_buf = bytearray(len(self._buf) + 1)
+        out_buf[0] = MCP7940.SRAM_START + self.offset
+        if self._mcp._write_buf(out_buf) == -1:
+            return -1
+        for _ in range(len(self._buf)):
+            self._buf[_] = 0
+        self._newest = -1
+        self._count = 0
+        self._loaded = True
+        return 0
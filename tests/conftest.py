@@ -0,0 +1,41 @@
+#
+# Host-side tests of the MCP7940 driver against the simulated MCP7940 (lib/mcp7940_sim.py)
+#   $ python3 -m pytest -q tests
+#
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+import mcp7940  # noqa: E402
+from mcp7940_sim import SimI2C  # noqa: E402
+
+# 2023-11-01 15:06:00, a Wednesday
+EPOCH = 1698851160
+
+
+@pytest.fixture
+def i2c(monkeypatch):
+    bus = SimI2C()
+    bus.rtc.set_datetime(2023, 11, 1, 15, 6, 0)
+    monkeypatch.setattr(mcp7940, "_sleep", bus.sleep)  # waits of the driver run on the virtual clock
+    return bus
+
+
+@pytest.fixture
+def mcp(i2c):
+    return mcp7940.MCP7940(i2c)
+
+
+@pytest.fixture
+def mcp_shadow(i2c):
+    return mcp7940.MCP7940(i2c, use_shadow=True)
+
+
+# Make every writeto_then_readfrom() of the bus raise OSError, as a NACK on the real bus does
+def fail_reads(monkeypatch, bus):
+    def fail(*args, **kwargs):
+        raise OSError(5, "Input/output error")
+    monkeypatch.setattr(bus, "writeto_then_readfrom", fail)
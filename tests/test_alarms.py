@@ -0,0 +1,116 @@
+import pytest
+
+from conftest import EPOCH, fail_reads
+from mcp7940_events import AlarmWatcher
+from mcp7940_sched import MATCH_DATE, MATCH_HOUR, MATCH_MIN, MATCH_SEC, AlarmScheduler, alarm_match
+from mcp7940_sim import SimMFPEdges
+
+
+# Run the virtual clock for seconds, polling the watcher every step seconds
+def run(i2c, watcher, seconds, step=1):
+    for _ in range(seconds // step):
+        i2c.advance(step)
+        watcher.poll()
+
+
+@pytest.mark.parametrize("deadline, match", [
+    (EPOCH + 30, MATCH_SEC),      # 15:06:30
+    (EPOCH + 240, MATCH_MIN),     # 15:10:00
+    (EPOCH + 3240, MATCH_HOUR),   # 16:00:00
+    (EPOCH + 32040, MATCH_DATE),  # 00:00:00 tomorrow
+])
+def test_alarm_match_exact(deadline, match):
+    assert alarm_match(EPOCH + 6, deadline) == (deadline, match)
+
+
+def test_alarm_match_earlier_wakeup():
+    deadline = EPOCH + 2 * 3600 + 90  # 17:07:30
+    wake, match = alarm_match(EPOCH, deadline)
+    assert (wake, match) == (EPOCH + 2 * 3600 - 360, MATCH_HOUR)  # 17:00:00
+    assert alarm_match(wake, deadline) == (deadline - 30, MATCH_MIN)
+
+
+@pytest.mark.parametrize("alarm_nr, pol, edge", [(1, 1, "rise"), (2, 1, "rise"), (2, 0, "fall")])
+def test_scheduler_runs_every_job_on_time(i2c, mcp, alarm_nr, pol, edge):
+    runs = []
+    sched = AlarmScheduler(mcp, alarm_nr=alarm_nr, pol=pol)
+    sched.every(60, lambda job: runs.append((job.name, job.deadline, mcp.epoch)), name="minute")
+    sched.every(300, lambda job: runs.append((job.name, job.deadline, mcp.epoch)), name="5 min")
+    sched.arm()
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, edge), callback=sched.on_alarm)
+    run(i2c, watcher, 900)
+    assert sum(1 for r in runs if r[0] == "minute") == 15
+    assert sum(1 for r in runs if r[0] == "5 min") == 3
+    assert all(now - deadline <= 1 for _, deadline, now in runs)
+    assert sched.wakeups == 15
+
+
+def test_scheduler_cron_job(i2c, mcp):
+    runs = []
+    sched = AlarmScheduler(mcp, alarm_nr=2)
+    sched.cron("*/15 * * * *", lambda job: runs.append(mcp.epoch % 3600 // 60))
+    sched.arm()
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=sched.on_alarm)
+    run(i2c, watcher, 3600, step=5)
+    assert runs == [15, 30, 45, 0]
+
+
+def test_scheduler_one_shot_and_cancel(i2c, mcp):
+    runs = []
+    sched = AlarmScheduler(mcp)
+    sched.at(EPOCH + 100, lambda job: runs.append("once"))
+    job = sched.every(60, lambda job: runs.append("never"))
+    sched.cancel(job)
+    sched.arm()
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=sched.on_alarm)
+    run(i2c, watcher, 300)
+    assert runs == ["once"]
+    assert len(sched) == 0
+    assert sched.next_wake() is None
+
+
+def test_watcher_bus_error_is_not_an_alarm(i2c, mcp, monkeypatch):
+    edges = [0, 1, 0, 0]
+    watcher = AlarmWatcher(mcp, lambda: edges.pop(0))
+    assert watcher.poll() == 0
+    with monkeypatch.context() as m:
+        fail_reads(m, i2c)
+        assert watcher.poll() == -1
+    i2c.reset_stats()
+    assert watcher.poll() == 0  # the next call checks again
+    assert i2c.stats["transactions"] == 1
+    assert watcher.spurious == 0
+
+
+def test_scheduler_slow_callback_does_not_delay_the_next_job(i2c, mcp):
+    runs = []
+
+    def slow(job):
+        runs.append(("slow", mcp.epoch))
+        i2c.advance(15)  # the callback takes 15 s
+
+    sched = AlarmScheduler(mcp)
+    sched.at(EPOCH + 30, slow)
+    sched.at(EPOCH + 40, lambda job: runs.append(("next", mcp.epoch)))
+    sched.cron("* * * * *", lambda job: runs.append(("cron", mcp.epoch)))
+    sched.arm()
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=sched.on_alarm)
+    run(i2c, watcher, 120)
+    assert runs[0] == ("slow", EPOCH + 30)
+    assert [r for r in runs if r[0] == "next"] == [("next", EPOCH + 45)]  # right after the slow callback
+    assert [t for name, t in runs if name == "cron"] == [EPOCH + 60, EPOCH + 120]
+
+
+def test_scheduler_cron_next_fire_after_a_slow_callback(i2c, mcp):
+    runs = []
+
+    def slow(job):
+        runs.append(mcp.epoch)
+        i2c.advance(70)  # past the next fire time
+
+    sched = AlarmScheduler(mcp)
+    sched.cron("* * * * *", slow)
+    sched.arm()
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=sched.on_alarm)
+    run(i2c, watcher, 180)
+    assert runs[:3] == [EPOCH + 60, EPOCH + 180, EPOCH + 300]  # no late run at EPOCH + 130
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from conftest import EPOCH
+from mcp7940 import MCP7940
+from mcp7940_async import AsyncMCP7940
+from mcp7940_sched import MATCH_SEC, program_alarm
+from mcp7940_sim import SimMFPEdges
+
+
+@pytest.fixture
+def amcp(i2c):
+    return AsyncMCP7940(i2c)
+
+
+def test_get_and_set_time(amcp):
+    async def main():
+        t = await amcp.get_time()
+        await amcp.set_time((2024, 2, 29, 23, 59, 58, 3, 0, 0))
+        return t, await amcp.get_time()
+
+    t, t2 = asyncio.run(main())
+    assert tuple(t[:6]) == (2023, 11, 1, 15, 6, 0)
+    assert tuple(t2[:6]) == (2024, 2, 29, 23, 59, 58)
+    assert not amcp.mcp._held
+
+
+def test_alarms(amcp):
+    async def main():
+        await amcp.set_alarm(2, (11, 1, 15, 7, 0, 2))
+        return await amcp.get_alarm(2)
+
+    assert tuple(asyncio.run(main())[:5]) == (11, 1, 15, 7, 0)
+
+
+def test_start_stop(amcp):
+    async def main():
+        return await amcp.stop(), await amcp.start()
+
+    stopped, started = asyncio.run(main())
+    assert stopped >= 0 and started >= 0
+    assert amcp.mcp.osc_running() == 1
+
+
+def test_wait_oscrun_stops_at_a_failed_read(i2c, amcp, monkeypatch):
+    calls = []
+
+    def fail(*args, **kwargs):
+        calls.append(1)
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(i2c, "writeto_then_readfrom", fail)
+    assert asyncio.run(amcp._wait_oscrun(1, 1.0, 0.001)) == -1
+    assert len(calls) == 1
+    assert asyncio.run(amcp.start()) == -1
+
+
+def test_alarm_events_without_edge_source(i2c, amcp):
+    program_alarm(amcp.mcp, 1, (11, 1, 15, 6, 3, 2), MATCH_SEC)
+    i2c.advance(5)
+    assert asyncio.run(asyncio.wait_for(amcp.alarm_events(0).__anext__(), 2)) == 1
+    assert not i2c.rtc.regs[MCP7940.REGISTER_ALM1WKDAY] & 0x08  # ALMxIF cleared
+
+
+def test_alarm_events_survive_a_failed_read_after_an_edge(i2c, amcp, monkeypatch):
+    mcp = amcp.mcp
+    program_alarm(mcp, 1, (11, 1, 15, 6, 5, 2), MATCH_SEC)
+    mfp = SimMFPEdges(i2c.rtc, "rise")
+    read = i2c.writeto_then_readfrom
+    failed = []
+
+    def fail_once(*args, **kwargs):
+        monkeypatch.setattr(i2c, "writeto_then_readfrom", read)
+        failed.append(1)
+        raise OSError(5, "Input/output error")
+
+    # Edge source that lets one second pass per check and breaks the read after the edge
+    def edges():
+        i2c.advance(1)
+        n = mfp.edges()
+        if n:
+            monkeypatch.setattr(i2c, "writeto_then_readfrom", fail_once)
+        return n
+
+    events = amcp.alarm_events(0, edges)
+    assert asyncio.run(asyncio.wait_for(events.__anext__(), 2)) == 1
+    assert failed == [1]
+    assert mcp.epoch - EPOCH < 10
@@ -0,0 +1,28 @@
+from bcd import BCD2BIN, BIN2BCD, bcd2bin, bin2bcd, decode_bcd_into, encode_bcd_into
+from mcp7940 import MCP7940
+
+
+def test_round_trip():
+    for i in range(100):
+        assert bcd2bin(bin2bcd(i)) == i
+        assert BIN2BCD[i] == int(str(i), 16)
+    assert len(BCD2BIN) == 256 and bcd2bin(0x59) == 59
+
+
+def test_decode_strips_the_control_bits():
+    regs = bytes((0xD9, 0x59, 0x23, 0x26, 0x31, 0x32, 0x24))  # ST, VBATEN/OSCRUN and LPYR set
+    dst = [0] * 7
+    decode_bcd_into(regs, dst, MCP7940.TIME_MASKS)
+    assert dst == [59, 59, 23, 6, 31, 12, 24]
+
+
+def test_encode_at_start():
+    dst = bytearray(8)
+    encode_bcd_into((59, 7, 23), dst, b"\x7F\x7F\x3F", 1)
+    assert dst[:4] == b"\x00\x59\x07\x23"
+
+
+def test_month_ignores_lpyr(i2c, mcp):
+    i2c.rtc.set_datetime(2024, 2, 29, 12, 0, 0)  # leap year: LPYR is set in RTCMTH
+    assert i2c.rtc.regs[MCP7940.RTCMTH] & 0x20
+    assert tuple(mcp.mcptime[:3]) == (2024, 2, 29)
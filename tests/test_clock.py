@@ -0,0 +1,63 @@
+from conftest import EPOCH
+from mcp7940_clock import CachedClock
+from mcp7940_sim import CONTROL, SimMFPEdges
+
+
+# Make every writeto_then_readfrom() of the bus raise OSError and count the attempts
+def count_failed_reads(monkeypatch, bus):
+    calls = []
+
+    def fail(*args, **kwargs):
+        calls.append(1)
+        raise OSError(5, "Input/output error")
+    monkeypatch.setattr(bus, "writeto_then_readfrom", fail)
+    return calls
+
+
+def test_sync_polls_on_the_virtual_clock(i2c, mcp):
+    clock = CachedClock(mcp)
+    i2c.reset_stats()
+    assert clock.sync() == 0
+    assert i2c.stats["transactions"] < 600  # one read per poll_interval for one second
+    assert clock.now() == mcp.epoch == EPOCH + 1
+    assert clock.error_bound_ns() is not None
+
+
+def test_sync_with_square_wave_edges(i2c, mcp):
+    i2c.rtc.regs[CONTROL] |= 0x40  # SQWEN, 1 Hz: rises at each rollover
+    i2c.advance(0.75)
+    clock = CachedClock(mcp, edge_source=SimMFPEdges(i2c.rtc, "rise"))
+    i2c.reset_stats()
+    assert clock.sync() == 0
+    assert i2c.stats["transactions"] <= 2  # only the time read at the edge
+    assert clock.now() == EPOCH + 1
+
+
+def test_sync_timeout_counts_the_time_slept(i2c, mcp):
+    assert mcp.stop() >= 0  # the seconds do not roll over
+    clock = CachedClock(mcp, timeout=0.5)
+    i2c.reset_stats()
+    assert clock.sync() == -1
+    assert i2c.stats["transactions"] <= 0.5 / clock.poll_interval + 2
+    assert clock.now() == -1  # no new sync() within retry_interval
+
+
+def test_now_backs_off_after_a_failed_resync(i2c, mcp, monkeypatch):
+    clock = CachedClock(mcp, resync=0)  # a re-anchor is due at every call
+    assert clock.sync() == 0
+    t = clock.now_ns()
+    calls = count_failed_reads(monkeypatch, i2c)
+    assert clock.now_ns() >= t  # served from the last anchor
+    assert clock.now_ns() >= t
+    assert len(calls) == 1
+    clock.retry_interval = 0
+    clock.now_ns()
+    assert len(calls) == 2
+
+
+def test_now_without_anchor(i2c, mcp, monkeypatch):
+    calls = count_failed_reads(monkeypatch, i2c)
+    clock = CachedClock(mcp)
+    assert clock.now() == -1
+    assert clock.struct_time() is None
+    assert len(calls) == 1
@@ -0,0 +1,119 @@
+import pytest
+
+from conftest import EPOCH
+from datemath import from_epoch
+from mcp7940_cron import ARM_LATER, MATCH_DOW, Cron, arm_after, arm_hardware
+from mcp7940_events import AlarmWatcher
+from mcp7940_sched import MATCH_DATE, MATCH_HOUR, MATCH_MIN, MATCH_SEC
+from mcp7940_sim import SimMFPEdges
+
+
+# Fire times of expr after the epoch after, minute by minute, with the day rule of cron
+def brute_force(expr, after, n):
+    c = Cron(expr)
+    fields = expr.split()
+    both = fields[2][0] == "*" or fields[4][0] == "*"
+    out = []
+    t = after - after % 60 + 60
+    while len(out) < n:
+        tm = from_epoch(t)
+        dom = c.days >> tm[2] & 1
+        dow = c.weekdays >> (tm[6] + 1) % 7 & 1
+        day = (dom and dow) if both else (dom or dow)
+        if c.minutes >> tm[4] & 1 and c.hours >> tm[3] & 1 and c.months >> tm[1] & 1 and day:
+            out.append(t)
+        t += 60
+    return out
+
+
+def fire_times(expr, after, n):
+    c = Cron(expr)
+    out = []
+    for _ in range(n):
+        after = c.next_fire(after)
+        out.append(after)
+    return out
+
+
+@pytest.mark.parametrize("expr", [
+    "* * * * *", "*/15 * * * *", "30 * * * *", "0 7 * * MON", "0 0 */2 * *", "* * */2 * *",
+    "0 0 * * */2", "0 12 1-15 * MON", "0 0 13 * FRI", "*/30 6 */3 * 1-5", "5 4 * JAN,JUL SUN",
+    "0 0 * * 7", "10-20/5 8-18/2 * * *",
+])
+def test_next_fire_matches_brute_force(expr):
+    assert fire_times(expr, EPOCH, 8) == brute_force(expr, EPOCH, 8)
+
+
+def test_day_step_is_not_every_day():
+    days = [from_epoch(t)[2] for t in fire_times("0 0 */2 * *", EPOCH, 4)]
+    assert days == [3, 5, 7, 9]
+
+
+def test_never_fires():
+    assert Cron("0 0 30 2 *").next_fire(EPOCH) is None
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "0 0 0 * *", "* * * 13 *"])
+def test_invalid(expr):
+    with pytest.raises(ValueError):
+        Cron(expr)
+
+
+@pytest.mark.parametrize("expr, match", [
+    ("* * * * *", MATCH_SEC),
+    ("30 * * * *", MATCH_MIN),
+    ("0 7 * * *", MATCH_HOUR),
+    ("0 0 5 * *", MATCH_DATE),
+    ("0 0 * * WED", MATCH_DOW),
+    ("0 0 1-31 * *", MATCH_HOUR),
+    ("*/15 * * * *", None),
+    ("0 7 * * MON", None),
+    ("0 0 */2 * *", None),
+    ("0 0 5 * MON", None),
+    ("0 0 * 6 *", None),
+])
+def test_hardware_match(expr, match):
+    hw = Cron(expr).hardware_match()
+    assert (hw[0] if hw else None) == match
+
+
+def test_arm_hardware_repeats_without_rearming(i2c, mcp):
+    assert arm_hardware(mcp, Cron("30 * * * *"), alarm_nr=2) == MATCH_MIN
+    fired = []
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=lambda n: fired.append((n, mcp.epoch)))
+    for _ in range(3 * 3600 // 10):
+        i2c.advance(10)
+        watcher.poll()
+    assert [(n, tuple(from_epoch(t)[3:5])) for n, t in fired] == [(2, (15, 30)), (2, (16, 30)), (2, (17, 30))]
+
+
+@pytest.mark.parametrize("expr, after", [
+    ("0 0 * * WED", EPOCH + 32040),  # Wednesday now: Thursday 00:00
+    ("0 15 * * *", EPOCH + 3240),    # 15:06 now: 16:00
+    ("0 0 1 * *", EPOCH + 32040),    # the 1st now: the 2nd 00:00
+    ("6 * * * *", EPOCH + 60),       # minute 6 now: 15:07
+])
+def test_arm_hardware_waits_while_the_field_matches(i2c, mcp, expr, after):
+    c = Cron(expr)
+    assert arm_after(c, EPOCH) == after
+    assert arm_hardware(mcp, c) == ARM_LATER
+    fired = []
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=fired.append)
+    for _ in range(30):
+        i2c.advance(10)
+        watcher.poll()
+    assert fired == []
+    assert not mcp.alarm_is_enabled(1)
+
+
+def test_arm_hardware_after_the_matching_hour(i2c, mcp):
+    c = Cron("0 15 * * *")
+    i2c.rtc.set_datetime(2023, 11, 1, 16, 0, 0)
+    assert arm_after(c, mcp.epoch) == mcp.epoch
+    assert arm_hardware(mcp, c) == MATCH_HOUR
+    fired = []
+    watcher = AlarmWatcher(mcp, SimMFPEdges(i2c.rtc, "rise"), callback=lambda n: fired.append(mcp.epoch))
+    for _ in range(24 * 60):
+        i2c.advance(60)
+        watcher.poll()
+    assert fired == [c.next_fire(EPOCH)]
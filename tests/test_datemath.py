@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from datemath import (civil_from_days, days_from_civil, days_in_month, from_epoch, is_leap_year,
+                      to_epoch, valid_date, weekday, yearday)
+
+
+@pytest.mark.parametrize("year", [1970, 1999, 2000, 2023, 2024, 2099, 2100])
+def test_tables_match_datetime(year):
+    d = datetime.date(year, 1, 1)
+    while d.year == year:
+        assert yearday(year, d.month, d.day) == d.timetuple().tm_yday
+        assert weekday(year, d.month, d.day) == d.weekday()
+        assert days_from_civil(year, d.month, d.day) == (d - datetime.date(1970, 1, 1)).days
+        d += datetime.timedelta(days=1)
+
+
+def test_leap_years():
+    assert is_leap_year(2000) and is_leap_year(2024)
+    assert not is_leap_year(2100) and not is_leap_year(2023)
+    assert days_in_month(2024, 2) == 29
+    assert days_in_month(2023, 2) == 28
+    assert valid_date(2024, 2, 29) and not valid_date(2023, 2, 29)
+
+
+def test_civil_from_days_roundtrip():
+    for days in range(0, 50000, 37):
+        assert days_from_civil(*civil_from_days(days)) == days
+
+
+def test_epoch_roundtrip():
+    assert to_epoch((2023, 11, 1, 15, 6, 0)) == 1698851160
+    assert tuple(from_epoch(1698851160)[:7]) == (2023, 11, 1, 15, 6, 0, 2)
+    for secs in (0, 951782399, 951782400, 1709164800, 4102444799):
+        assert to_epoch(from_epoch(secs)) == secs
+        assert tuple(from_epoch(secs)[:6]) == datetime.datetime.fromtimestamp(secs, datetime.timezone.utc).timetuple()[:6]
+
+
+def test_two_digit_years():
+    # As the MCP7940 stores them: 0-99 is 2000-2099
+    assert yearday(24, 3, 1) == yearday(2024, 3, 1) == 61
+    assert weekday(23, 11, 1) == weekday(2023, 11, 1) == 2
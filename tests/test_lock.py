@@ -0,0 +1,37 @@
+import pytest
+
+import mcp7940
+from conftest import EPOCH
+from mcp7940 import I2CLockTimeout
+
+
+def test_uncontended_lock(i2c, mcp):
+    assert mcp.epoch == EPOCH
+    assert mcp.lock_contention == 0
+    assert i2c.stats["lock_failures"] == 0
+    assert not i2c._locked  # released after the transaction
+
+
+def test_lock_waits_for_the_other_driver(i2c, mcp, monkeypatch):
+    i2c.try_lock()  # e.g. the display holds the bus
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        if len(delays) == 4:
+            i2c.unlock()
+        i2c.sleep(seconds)
+    monkeypatch.setattr(mcp7940, "_sleep", sleep)
+    assert mcp.epoch == EPOCH
+    assert mcp.lock_contention == 1
+    assert delays == [0, 0.0005, 0.001, 0.002]  # exponential back-off
+    assert mcp.lock_wait_max_ns > 0
+
+
+def test_lock_timeout(i2c):
+    mcp = mcp7940.MCP7940(i2c, lock_timeout=0.05)
+    i2c.try_lock()
+    with pytest.raises(I2CLockTimeout):
+        mcp.epoch
+    assert mcp.lock_contention == 1
+    assert mcp.lock_wait_ns >= 50_000_000
@@ -0,0 +1,100 @@
+import pytest
+
+import mcp7940
+from conftest import fail_reads
+from mcp7940 import MCP7940
+from mcp7940_sim import ALM0WKDAY, ALM1WKDAY, CONTROL
+
+ALARM = (11, 1, 15, 7, 0, 2)
+
+
+def test_transaction_is_one_write_and_one_verify_read(i2c, mcp):
+    i2c.reset_stats()
+    with mcp.transaction() as t:
+        mcp.alarm1 = ALARM
+        mcp._set_ALMxMSK_bits(1, 1)
+        mcp._set_ALMPOL_bit(1)
+        mcp.alarm_enable(1, True)
+    assert t.result > 0
+    assert i2c.stats["transactions"] == 3  # read of the unedited bits, burst write, verify read
+    regs = i2c.rtc.regs
+    assert regs[CONTROL] & 0x10
+    assert regs[ALM0WKDAY] & 0xF0 == 0x90  # ALMPOL, minutes match
+    assert mcp.alarm1[:5] == ALARM[:5]
+
+
+def test_transaction_reads_return_pending_values(mcp):
+    with mcp.transaction():
+        mcp.alarm_enable(2, True)
+        assert mcp.alarm_is_enabled(2) == 1
+        assert not mcp._i2c.rtc.regs[CONTROL] & 0x20
+
+
+def test_transaction_discarded_on_exception(i2c, mcp):
+    with pytest.raises(RuntimeError):
+        with mcp.transaction():
+            mcp.alarm_enable(1, True)
+            raise RuntimeError("abort")
+    assert not i2c.rtc.regs[CONTROL] & 0x10
+
+
+def test_transaction_keeps_untouched_alarm_flags(i2c, mcp):
+    i2c.rtc.regs[ALM1WKDAY] |= 0x08  # alarm2 fired
+    with mcp.transaction():
+        mcp.alarm1 = ALARM
+        mcp.alarm_enable(1, True)
+    assert i2c.rtc.regs[ALM1WKDAY] & 0x08
+
+
+@pytest.mark.parametrize("alarm_nr", [1, 2])
+def test_almpol_is_shared_by_both_alarms(i2c, mcp, alarm_nr):
+    mcp._set_ALMPOL_bit(alarm_nr)
+    assert i2c.rtc.regs[ALM0WKDAY] & 0x80
+    status = mcp.alarm_status()
+    assert mcp.alarm_fields(status, 1)[1] == mcp.alarm_fields(status, 2)[1] == 1
+    assert mcp._read_ALM_POL_IF_MSK_bits(2, 0) == 1
+    assert mcp.snapshot().alarm2_pol == 1
+    mcp._clr_ALMPOL_bit(alarm_nr)
+    assert not i2c.rtc.regs[ALM0WKDAY] & 0x80
+
+
+def test_shadow_saves_the_read_before_a_write(i2c, mcp_shadow):
+    mcp_shadow.alarm_enable(1, True)
+    i2c.reset_stats()
+    mcp_shadow.alarm_enable(2, True)
+    mcp_shadow._clr_SQWEN_bit()
+    assert i2c.stats["transactions"] == 2
+    assert i2c.rtc.regs[CONTROL] & 0x30 == 0x30
+
+
+def test_shadow_not_poisoned_by_a_failed_read(i2c, mcp_shadow, monkeypatch):
+    i2c.rtc.regs[CONTROL] = 0x60
+    with monkeypatch.context() as m:
+        fail_reads(m, i2c)
+        assert mcp_shadow._read_SQWEN_bit() == -1
+    mcp_shadow.alarm_enable(1, True)
+    assert i2c.rtc.regs[CONTROL] == 0x70
+
+
+def test_read_bit_error(i2c, mcp, monkeypatch):
+    fail_reads(monkeypatch, i2c)
+    assert mcp._read_bit(MCP7940.RTCWKDAY, MCP7940.OSCRUN_BIT) == -1
+    assert mcp.osc_running() == -1
+    assert mcp.has_power_failed() is False
+
+
+def test_oscillator_wait_stops_at_the_first_failed_read(i2c, mcp, monkeypatch):
+    assert mcp.stop() >= 0
+    fail_reads(monkeypatch, i2c)
+    i2c.reset_stats()
+    assert mcp._wait_oscrun(1, 1.0, 0.001, "") == -1
+    assert i2c.stats["transactions"] == 0  # the failed read raised before it was counted
+
+
+def test_start_stop_timeout(i2c, mcp):
+    i2c.rtc.osc_start_delay = 10  # no crystal
+    mcp.stop()
+    i2c.reset_stats()
+    assert mcp.start(timeout=0.1, poll_interval=0.01) == -1
+    assert i2c.stats["transactions"] < 20
+    assert mcp7940.MCP7940(i2c).osc_running() == 0
@@ -0,0 +1,137 @@
+import pytest
+
+import mcp7940
+from conftest import EPOCH, fail_reads
+from mcp7940_sram import EV_ALARM1, EV_BOOT, EV_NTP_OK, SRAMJournal, SRAMStore
+
+SCHEMA = (("boots", "var"), ("last_sync", "u32"), ("drift_ppm", "svar"), ("flags", "u8", 0x01))
+
+
+def test_store_defaults_on_new_sram(mcp):
+    store = SRAMStore(mcp, SCHEMA)
+    assert store["boots"] == 0
+    assert store["flags"] == 1
+    assert not store.valid
+
+
+def test_store_survives_a_new_driver(i2c, mcp):
+    store = SRAMStore(mcp, SCHEMA, offset=0x10)
+    store.update(boots=300, last_sync=EPOCH, drift_ppm=-3)
+    again = SRAMStore(mcp7940.MCP7940(i2c), SCHEMA, offset=0x10)
+    assert (again["boots"], again["last_sync"], again["drift_ppm"], again["flags"]) == (300, EPOCH, -3, 1)
+    assert again.valid
+
+
+def test_store_writes_only_changed_bytes(i2c, mcp):
+    store = SRAMStore(mcp, SCHEMA)
+    store.update(boots=5, last_sync=EPOCH)
+    i2c.reset_stats()
+    store["boots"] += 1
+    assert i2c.stats["transactions"] == 1
+    assert i2c.stats["bytes_written"] == 2  # register address and one byte
+    assert store.update(boots=6) == 0
+
+
+def test_store_other_schema_is_invalid(i2c, mcp):
+    SRAMStore(mcp, SCHEMA).update(boots=7)
+    other = SRAMStore(mcp7940.MCP7940(i2c), (("boots", "u16"),))
+    assert other["boots"] == 0
+    assert not other.valid
+
+
+def test_store_rejects_negative_var(mcp):
+    with pytest.raises(ValueError):
+        SRAMStore(mcp, SCHEMA).update(boots=-1)
+
+
+def test_journal_default_epoch_is_the_rtc_time(mcp):
+    journal = SRAMJournal(mcp, offset=0x1C)
+    journal.clear()
+    assert journal.append(EV_BOOT) == 0
+    epoch, code = journal.last()
+    assert code == EV_BOOT
+    assert EPOCH <= epoch <= EPOCH + 1
+
+
+def test_journal_float_epoch(mcp):
+    journal = SRAMJournal(mcp, offset=0x1C)
+    journal.clear()
+    assert journal.append(EV_NTP_OK, EPOCH + 0.75) == 0
+    assert journal.last() == (EPOCH, EV_NTP_OK)
+
+
+def test_journal_ring_wraps(i2c, mcp):
+    journal = SRAMJournal(mcp, offset=0x1C)  # 6 records
+    journal.clear()
+    for i in range(10):
+        journal.append(EV_ALARM1, EPOCH + i)
+    reloaded = SRAMJournal(mcp7940.MCP7940(i2c), offset=0x1C)
+    assert len(reloaded) == 6
+    assert [e for e, _ in reloaded] == [EPOCH + i for i in range(4, 10)]
+
+
+def test_journal_sequence_wraps(mcp):
+    journal = SRAMJournal(mcp, offset=0, slots=4)
+    journal.clear()
+    for i in range(300):  # sequence numbers run 1-255 and start again at 1
+        journal.append(EV_ALARM1, EPOCH + i)
+    journal.load()
+    assert [e for e, _ in journal] == [EPOCH + i for i in range(296, 300)]
+
+
+def test_journal_does_not_fit(mcp):
+    with pytest.raises(ValueError):
+        SRAMJournal(mcp, offset=60, slots=1)
+
+
+def test_data_index_and_slices(i2c, mcp):
+    sram = mcp.sram
+    assert len(sram) == 64
+    sram[0] = 0xA5
+    sram[-1] = 0x5A
+    assert (sram[0], sram[63]) == (0xA5, 0x5A)
+    assert i2c.rtc.regs[0x20] == 0xA5 and i2c.rtc.regs[0x5F] == 0x5A
+    sram[8:12] = b"\x01\x02\x03\x04"
+    i2c.reset_stats()
+    assert sram[8:12] == bytearray(b"\x01\x02\x03\x04")
+    assert i2c.stats["transactions"] == 1  # one burst
+    assert sram[11:7:-1] == bytearray(b"\x04\x03\x02\x01")
+    assert sram[8:12:2] == bytearray(b"\x01\x03")
+    assert sram[5:5] == bytearray()
+
+
+def test_data_extended_slice_assignment(mcp):
+    sram = mcp.sram
+    sram[16:24] = bytes(range(8))
+    sram[16:24:3] = b"\xAA\xBB\xCC"
+    assert sram[16:24] == bytearray(b"\xAA\x01\x02\xBB\x04\x05\xCC\x07")
+
+
+def test_data_errors(mcp):
+    with pytest.raises(IndexError):
+        mcp.sram[64]
+    with pytest.raises(ValueError):
+        mcp.sram[0:4] = b"\x00"
+
+
+def test_sram_readinto_and_write(i2c, mcp):
+    buf = bytearray(16)
+    i2c.reset_stats()
+    assert mcp.sram_write(b"logger", 40) == 6
+    assert mcp.sram_readinto(memoryview(buf)[2:8], 40) == 6
+    assert i2c.stats["transactions"] == 2
+    assert buf[2:8] == b"logger"
+    assert mcp.sram_readinto(buf, 48) == 16  # up to the last byte
+
+
+@pytest.mark.parametrize("n, offset", [(8, 60), (1, 64), (1, -1), (65, 0)])
+def test_sram_bounds(i2c, mcp, n, offset):
+    i2c.reset_stats()
+    assert mcp.sram_readinto(bytearray(n), offset) == -1
+    assert mcp.sram_write(bytes(n), offset) == -1
+    assert i2c.stats["transactions"] == 0
+
+
+def test_sram_readinto_bus_error(i2c, mcp, monkeypatch):
+    fail_reads(monkeypatch, i2c)
+    assert mcp.sram_readinto(bytearray(4)) == -1
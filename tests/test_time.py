@@ -0,0 +1,83 @@
+from conftest import EPOCH
+from datemath import from_epoch
+
+# Raw time registers (RTCSEC..RTCYEAR, ST and OSCRUN set) of 2023-12-31 23:59:59 and 2024-01-01 00:00:00,
+# and a torn read: the seconds sampled before the carry, the rest after it
+R_2359 = bytes((0xD9, 0x59, 0x23, 0x26, 0x31, 0x12, 0x23))
+R_0000 = bytes((0x80, 0x00, 0x00, 0x20, 0x01, 0x01, 0x24))
+R_TORN = bytes((0xD9, 0x00, 0x00, 0x20, 0x01, 0x01, 0x24))
+
+
+# Let the time registers read as reads[0], reads[1], ... (one item per I2C read)
+def script_time_reads(monkeypatch, bus, reads):
+    def read(address, out, into, **kwargs):
+        data = reads.pop(0)
+        into[:] = data[:len(into)]
+    monkeypatch.setattr(bus, "writeto_then_readfrom", read)
+
+
+def test_mcptime_and_epoch(mcp):
+    assert tuple(mcp.mcptime[:7]) == (2023, 11, 1, 15, 6, 0, 2)
+    assert mcp.epoch == EPOCH
+
+
+def test_no_reread_below_59(i2c, mcp):
+    i2c.reset_stats()
+    mcp.read_time_into([0] * 7)
+    assert i2c.stats["transactions"] == 1
+    assert mcp.rollover_rereads == 0
+
+
+def test_torn_read_is_replaced(i2c, mcp, monkeypatch):
+    script_time_reads(monkeypatch, i2c, [R_TORN, R_0000])
+    t = [0] * 7
+    mcp.read_time_into(t)
+    assert t == [2024, 1, 1, 0, 0, 0, 0]
+    assert mcp.rollover_rereads == 1
+
+
+def test_first_read_kept_when_the_reread_shows_59(i2c, mcp, monkeypatch):
+    script_time_reads(monkeypatch, i2c, [R_2359, R_TORN])
+    t = [0] * 7
+    mcp.read_time_into(t)
+    assert t == [2023, 12, 31, 23, 59, 59, 6]
+
+
+def test_snapshot_first_read_kept(i2c, mcp, monkeypatch):
+    pad = bytes(32 - 7)
+    script_time_reads(monkeypatch, i2c, [R_2359 + pad, R_TORN + pad])
+    assert mcp.snapshot().time == (2023, 12, 31, 23, 59, 59, 6)
+
+
+def test_consistent_reads_off(i2c, mcp, monkeypatch):
+    mcp.consistent_reads = False
+    script_time_reads(monkeypatch, i2c, [R_TORN])
+    t = [0] * 7
+    mcp.read_time_into(t)
+    assert t[:6] == [2024, 1, 1, 0, 0, 59]
+
+
+def test_adjust_seconds_cost(i2c, mcp):
+    wkday = i2c.rtc.regs[3]
+    for phase in (0.1, 0.4, 0.9):
+        i2c.advance(phase)
+        i2c.reset_stats()
+        assert mcp.adjust_seconds(30) in (1, 2)  # RTCSEC, and RTCMIN when the minute changes
+        assert i2c.stats["transactions"] <= 7
+    assert mcp.epoch == EPOCH + 90 + int(i2c.rtc.now)
+    assert i2c.rtc.regs[3] == wkday  # RTCWKDAY (VBATEN) is not written
+
+
+def test_adjust_seconds_across_midnight(i2c, mcp):
+    i2c.rtc.set_datetime(2023, 12, 31, 23, 59, 50)
+    assert mcp.adjust_seconds(20) == 7  # the date changes: the mcptime setter is used
+    assert tuple(from_epoch(mcp.epoch)[:3]) == (2024, 1, 1)
+
+
+def test_power_events(i2c, mcp):
+    mcp.battery_backup_enable(1)
+    i2c.rtc.power_fail(3600)
+    ev = mcp.power_events(clear=True)
+    assert ev.pwrfail
+    assert ev.up - ev.down == 3600
+    assert not mcp.has_power_failed()